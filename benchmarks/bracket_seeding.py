@@ -0,0 +1,166 @@
+"""
+Generate first rounds for fields of 8 to 4096 entrants and count the queries.
+
+For every field size and seeding method the benchmark registers the players
+of a fresh tournament, then runs the same steps as the tournament start in
+cogs/tournaments.py inside one transaction: load and order the entrants
+(utils.seeding.seed_entrants), place them on the bracket with byes and log
+the seeding (BracketStore.start), insert the playable matches
+(create_matches) and store the bracket. It reports the time and the number of statements of those steps.
+
+Usage:
+    python benchmarks/bracket_seeding.py [--sizes 8,13,100,4096] [--methods random,record]
+
+Exits with status 1 if a bracket breaks an invariant: a first-round pair
+with two byes, a missing or duplicated entrant, or a match count other than
+the number of pairs with two entrants. The benchmark uses a temporary
+database and never touches tournaments.db.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import AsyncDatabase, ConnectionPool
+from utils.migrations import migrate
+from utils.models import Tournament
+from utils.bracket_engine import Bracket, BracketStore, create_matches
+from utils.seeding import SEEDING_METHODS, MANUAL, seed_entrants, set_manual_seeds
+
+DEFAULT_SIZES = (8, 13, 64, 100, 500, 1000, 2048, 3000, 4096)
+
+
+class CountingTransaction:
+    """Passes statements through to a transaction and counts them."""
+
+    def __init__(self, tx):
+        self._tx = tx
+        self.queries = 0
+
+    def after_commit(self, callback):
+        self._tx.after_commit(callback)
+
+    async def execute(self, sql, params=()):
+        self.queries += 1
+        return await self._tx.execute(sql, params)
+
+    async def execute_many(self, sql, seq_of_params):
+        self.queries += 1
+        return await self._tx.execute_many(sql, seq_of_params)
+
+    async def fetchone(self, sql, params=()):
+        self.queries += 1
+        return await self._tx.fetchone(sql, params)
+
+    async def fetchall(self, sql, params=()):
+        self.queries += 1
+        return await self._tx.fetchall(sql, params)
+
+
+async def register(database: AsyncDatabase, entrants: int, method: str) -> Tournament:
+    """Create a tournament with `entrants` players that have random records."""
+    result = await database.execute(
+        "INSERT INTO tournaments (name, type, max_participants, status, seeding) VALUES (?, ?, ?, ?, ?)",
+        (f"{method}-{entrants}", 'private', entrants, 'approved', method)
+    )
+    tournament_id = result.lastrowid
+    user_ids = [tournament_id * 10000 + n for n in range(entrants)]
+    now = datetime.datetime.now()
+    async with database.transaction() as tx:
+        await tx.execute_many(
+            "INSERT OR IGNORE INTO players (user_id, username, wins, losses) VALUES (?, ?, ?, ?)",
+            [(user_id, f"player{user_id}", random.randint(0, 50), random.randint(0, 50)) for user_id in user_ids]
+        )
+        await tx.execute_many(
+            "INSERT INTO tournament_participants (tournament_id, user_id, join_date) VALUES (?, ?, ?)",
+            [(tournament_id, user_id, now) for user_id in user_ids]
+        )
+        if method == MANUAL:
+            await set_manual_seeds(tx, tournament_id, random.sample(user_ids, len(user_ids) // 2))
+    row = await database.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
+    return Tournament.from_row(row)
+
+
+def check(bracket: Bracket, entrants: list, created: list) -> list:
+    """Return the invariants the generated bracket breaks."""
+    problems = []
+    leaves = bracket.slots[bracket.size:]
+    pairs = list(zip(leaves[::2], leaves[1::2]))
+    if any(side1 is None and side2 is None for side1, side2 in pairs):
+        problems.append("pair with two byes")
+    placed = [leaf for leaf in leaves if leaf is not None]
+    if sorted(placed) != sorted(entrants) or len(set(placed)) != len(placed):
+        problems.append("entrants missing or duplicated")
+    full_pairs = sum(side1 is not None and side2 is not None for side1, side2 in pairs)
+    first_round = [node for node in bracket.round_nodes(1) if bracket.match_ids[node] is not None]
+    if len(first_round) != full_pairs:
+        problems.append(f"{len(first_round)} first-round matches for {full_pairs} pairs")
+    if len(created) < len(first_round):
+        problems.append("created match ids do not cover the first round")
+    return problems
+
+
+async def generate(database: AsyncDatabase, store: BracketStore, tournament: Tournament) -> dict:
+    started = time.perf_counter()
+    async with database.transaction() as tx:
+        counting = CountingTransaction(tx)
+        entrants = await seed_entrants(counting, tournament)
+        bracket = await store.start(counting, tournament.id, entrants, tournament.is_team)
+        created = await create_matches(counting, bracket, bracket.playable())
+        await store.save(counting, bracket)
+    elapsed = time.perf_counter() - started
+    return {
+        'elapsed_ms': elapsed * 1000,
+        'queries': counting.queries,
+        'matches': len(created),
+        'byes': bracket.size - len(entrants),
+        'problems': check(bracket, entrants, created),
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="comma-separated field sizes")
+    parser.add_argument('--methods', default=','.join(SEEDING_METHODS), help="comma-separated seeding methods")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    methods = args.methods.split(',')
+
+    directory = tempfile.mkdtemp(prefix='bracket-seeding-')
+    path = os.path.join(directory, 'seeding.db')
+    with ConnectionPool(path, size=1).connection() as conn:
+        migrate(conn)
+    database = AsyncDatabase(ConnectionPool(path))
+    store = BracketStore()
+    failures = 0
+    try:
+        print(f"{'entrants':>8}  {'method':<14}{'byes':>6}{'matches':>9}{'queries':>9}{'ms':>9}")
+        for size in sizes:
+            for method in methods:
+                tournament = await register(database, size, method)
+                result = await generate(database, store, tournament)
+                print(f"{size:>8}  {method:<14}{result['byes']:>6}{result['matches']:>9}{result['queries']:>9}{result['elapsed_ms']:>9.1f}")
+                for problem in result['problems']:
+                    print(f"    FAIL: {problem}")
+                    failures += 1
+    finally:
+        database.close()
+        database.pool.close_all()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failures:
+        print(f"\nFAIL: {failures} broken invariants")
+        return 1
+    print("\nOK: every bracket has at most one bye per pair and one match per full pair")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+"""
+Measure event loop lag while the bot performs concurrent database writes.
+
+Compares the old approach (synchronous sqlite3 calls made directly from
+coroutines) with the async database layer in utils.db. A heartbeat task
+ticks every few milliseconds and records how late each tick fires, which is
+what the Discord gateway heartbeat experiences while writes are running.
+
+Usage:
+    python benchmarks/event_loop_lag.py [--writes 200] [--interval 0.005]
+
+The benchmark uses a temporary database and never touches tournaments.db.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import AsyncDatabase, ConnectionPool, dict_factory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tournament_matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tournament_id INTEGER,
+    round INTEGER,
+    player1_id INTEGER,
+    player2_id INTEGER,
+    team1_score INTEGER,
+    team2_score INTEGER,
+    completed INTEGER DEFAULT 0,
+    creation_date TIMESTAMP
+)
+"""
+
+INSERT = """
+INSERT INTO tournament_matches (tournament_id, round, player1_id, player2_id, creation_date)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+
+class LagMonitor:
+    """Heartbeat task that records how late each tick is scheduled."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples) or [0.0]
+        return {
+            'ticks': len(self.samples),
+            'max_ms': samples[-1] * 1000,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            'mean_ms': statistics.mean(samples) * 1000,
+        }
+
+
+def row(i: int):
+    return (1, 1, i, i + 1, time.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+async def blocking_writes(path: str, writes: int):
+    """Old behaviour: every handler runs sqlite3 directly on the event loop."""
+    async def handler(i):
+        conn = sqlite3.connect(path)
+        conn.row_factory = dict_factory
+        try:
+            conn.execute(INSERT, row(i))
+            conn.commit()
+        finally:
+            conn.close()
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*(handler(i) for i in range(writes)))
+
+
+async def async_writes(path: str, writes: int):
+    """New behaviour: statements are queued to the database executor thread."""
+    database = AsyncDatabase(ConnectionPool(path))
+    try:
+        await asyncio.gather(*(database.execute(INSERT, row(i)) for i in range(writes)))
+    finally:
+        database.close()
+        database.pool.close_all()
+
+
+async def measure(name: str, scenario, path: str, writes: int, interval: float) -> dict:
+    monitor = LagMonitor(interval)
+    monitor.start()
+    # Let the monitor settle before the burst starts
+    await asyncio.sleep(interval * 5)
+
+    started = time.perf_counter()
+    await scenario(path, writes)
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(interval * 5)
+    await monitor.stop()
+
+    result = monitor.summary()
+    result['name'] = name
+    result['elapsed_ms'] = elapsed * 1000
+    return result
+
+
+def prepare(directory: str, name: str) -> str:
+    path = os.path.join(directory, f"{name}.db")
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    conn.close()
+    return path
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writes', type=int, default=200, help="number of concurrent writes")
+    parser.add_argument('--interval', type=float, default=0.005, help="heartbeat interval in seconds")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='db-bench-')
+    try:
+        results = [
+            await measure("sync sqlite3 (before)", blocking_writes, prepare(directory, 'before'), args.writes, args.interval),
+            await measure("async db (after)", async_writes, prepare(directory, 'after'), args.writes, args.interval),
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.writes} concurrent writes, heartbeat every {args.interval * 1000:.1f} ms\n")
+    print(f"{'scenario':<24}{'total ms':>10}{'ticks':>8}{'max lag':>10}{'p95 lag':>10}{'mean lag':>10}")
+    for r in results:
+        print(
+            f"{r['name']:<24}{r['elapsed_ms']:>10.1f}{r['ticks']:>8}"
+            f"{r['max_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['mean_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Fire concurrent tournament joins and check that the capacity is never exceeded.
+
+Every simulated click calls utils.registration.add_participant, the
+check-and-insert the join button handler in cogs/tournaments.py runs: count
+the participants, compare with max_participants and insert in a transaction.
+The burst runs once without a lock, showing the overfill race, and once
+under a lock per tournament as the handler takes it, where exactly
+`--slots` joins must succeed.
+
+Usage:
+    python benchmarks/join_stress.py [--joins 500] [--slots 32]
+
+Exits with status 1 if the locked run does not register exactly `--slots`
+players. The benchmark uses a temporary database and never touches
+tournaments.db.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import AsyncDatabase, ConnectionPool
+from utils.locks import KeyedLocks
+from utils.migrations import migrate
+from utils.registration import add_participant, JOINED
+
+
+async def burst(path: str, joins: int, slots: int, locks) -> dict:
+    database = AsyncDatabase(ConnectionPool(path))
+    try:
+        result = await database.execute(
+            "INSERT INTO tournaments (name, type, max_participants, status) VALUES (?, ?, ?, ?)",
+            ("stress", 'private', slots, 'approved')
+        )
+        tournament_id = result.lastrowid
+
+        async def click(user_id: int) -> bool:
+            guard = locks.hold(tournament_id) if locks is not None else contextlib.nullcontext()
+            async with guard:
+                return await add_participant(tournament_id, user_id, f"player{user_id}", database=database) == JOINED
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(click(user_id) for user_id in range(joins)))
+        elapsed = time.perf_counter() - started
+
+        registered = await database.fetchone(
+            "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
+            (tournament_id,)
+        )
+        return {
+            'accepted': sum(outcomes),
+            'registered': registered['count'],
+            'elapsed_ms': elapsed * 1000,
+            'live_locks': len(locks) if locks is not None else 0,
+        }
+    finally:
+        database.close()
+        database.pool.close_all()
+
+
+def prepare(directory: str, name: str) -> str:
+    path = os.path.join(directory, f"{name}.db")
+    with ConnectionPool(path, size=1).connection() as conn:
+        migrate(conn)
+    return path
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--joins', type=int, default=500, help="number of concurrent join clicks")
+    parser.add_argument('--slots', type=int, default=32, help="max_participants of the tournament")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='join-stress-')
+    try:
+        unlocked = await burst(prepare(directory, 'unlocked'), args.joins, args.slots, None)
+        locked = await burst(prepare(directory, 'locked'), args.joins, args.slots, KeyedLocks())
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.joins} concurrent joins into a {args.slots}-slot tournament\n")
+    print(f"{'scenario':<24}{'registered':>12}{'total ms':>10}")
+    print(f"{'no lock (before)':<24}{unlocked['registered']:>12}{unlocked['elapsed_ms']:>10.1f}")
+    print(f"{'tournament lock (after)':<24}{locked['registered']:>12}{locked['elapsed_ms']:>10.1f}")
+
+    if locked['registered'] != args.slots or locked['accepted'] != args.slots:
+        print(f"\nFAIL: expected exactly {args.slots} registrations under the lock")
+        return 1
+    if locked['live_locks']:
+        print(f"\nFAIL: {locked['live_locks']} lock entries left after the burst")
+        return 1
+    print(f"\nOK: exactly {args.slots} joins succeeded, no lock entries left")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,191 @@
+"""
+Play whole tournaments through the match log, undo a result and replay the log.
+
+For every field size the benchmark starts a private tournament on a temporary
+database the way cogs/tournaments.py does, then enters every result the way
+the result modal does with automatic progression: one transaction per match
+that logs the result (utils.match_log), creates the next match and saves the
+bracket. It then takes back a first-round result of the champion, the undo
+with the longest path, and reports how many matches the logged revert drops
+compared with deleting every later round. Finally it times loading the
+bracket from its snapshot plus the tail of the log against replaying the
+whole log from the seeding.
+
+Usage:
+    python benchmarks/match_log_replay.py [--sizes 1024,4096] [--snapshot-interval 50]
+
+Exits with status 1 if the replayed bracket, the loaded one and the one kept
+in memory differ. Every query goes to a temporary database, the benchmark
+never touches tournaments.db.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import AsyncDatabase, ConnectionPool
+from utils.migrations import migrate
+from utils import bracket_engine, match_log
+from utils.bracket_engine import BracketStore, create_matches
+from utils.match_log import RESULT_SET, RESULT_REVERTED
+
+DEFAULT_SIZES = (1024, 4096)
+
+
+async def start(database: AsyncDatabase, store: BracketStore, entrants: int):
+    """Register `entrants` players, seed the bracket and create the first round."""
+    result = await database.execute(
+        "INSERT INTO tournaments (name, type, max_participants, status, started) VALUES (?, ?, ?, ?, ?)",
+        (f"replay-{entrants}", 'private', entrants, 'active', 1)
+    )
+    tournament_id = result.lastrowid
+    user_ids = [tournament_id * 10000 + n for n in range(entrants)]
+    random.shuffle(user_ids)
+    now = datetime.datetime.now()
+    async with database.transaction() as tx:
+        await tx.execute_many(
+            "INSERT INTO tournament_participants (tournament_id, user_id, join_date) VALUES (?, ?, ?)",
+            [(tournament_id, user_id, now) for user_id in user_ids]
+        )
+        bracket = await store.start(tx, tournament_id, user_ids)
+        await create_matches(tx, bracket, bracket.playable())
+        await store.save(tx, bracket)
+    return tournament_id
+
+
+async def play(database: AsyncDatabase, store: BracketStore, tournament_id: int) -> int:
+    """Enter a random result for every match until the final is decided; returns the number of matches."""
+    played = 0
+    while True:
+        bracket = await store.load(tournament_id, tx=database)
+        pending = [match_id for node, match_id in enumerate(bracket.match_ids) if match_id is not None and bracket.slots[node] is None]
+        if not pending:
+            return played
+        for match_id in pending:
+            async with database.transaction() as tx:
+                bracket = await store.load(tournament_id, tx=tx, for_update=True)
+                side1, side2 = bracket.sides(bracket.node_of(match_id))
+                score1, score2 = random.choice(((1, 0), (0, 1)))
+                await tx.execute(
+                    "UPDATE tournament_matches SET team1_score = ?, team2_score = ?, completed = 1, completion_date = ? WHERE id = ?",
+                    (score1, score2, datetime.datetime.now(), match_id)
+                )
+                node = await match_log.append(
+                    tx, bracket, RESULT_SET, match_id=match_id,
+                    winner=side1 if score1 > score2 else side2, score1=score1, score2=score2
+                )
+                if node is not None:
+                    await create_matches(tx, bracket, [node])
+                await store.save(tx, bracket)
+            played += 1
+
+
+async def undo(database: AsyncDatabase, store: BracketStore, tournament_id: int) -> dict:
+    """Revert the champion's first-round match as /tournament-undo does."""
+    bracket = await store.load(tournament_id, tx=database)
+    leaf = bracket.slots.index(bracket.champion, bracket.size)
+    match_id = bracket.match_ids[leaf >> 1]
+    if match_id is None:
+        # Чемпион прошел первый раунд без игры
+        match_id = next(bracket.match_ids[node] for node in range(leaf >> 2, 0, -1) if bracket.match_ids[node] is not None)
+    round_number = bracket.round_of(bracket.node_of(match_id))
+
+    later_rounds = (await database.fetchone(
+        "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ? AND round > ?",
+        (tournament_id, round_number)
+    ))['count']
+
+    started = time.perf_counter()
+    async with database.transaction() as tx:
+        bracket = await store.load(tournament_id, tx=tx, for_update=True)
+        dropped = await match_log.append(tx, bracket, RESULT_REVERTED, match_id=match_id)
+        await store.save(tx, bracket)
+        await tx.execute_many("DELETE FROM match_series WHERE match_id = ?", [(dropped_id,) for dropped_id in dropped])
+        await tx.execute_many("DELETE FROM tournament_matches WHERE id = ?", [(dropped_id,) for dropped_id in dropped])
+        await tx.execute(
+            "UPDATE tournament_matches SET team1_score = NULL, team2_score = NULL, completed = 0, completion_date = NULL WHERE id = ?",
+            (match_id,)
+        )
+    return {
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'dropped': len(dropped),
+        'later_rounds': later_rounds,
+    }
+
+
+async def audit(database: AsyncDatabase, store: BracketStore, tournament_id: int) -> dict:
+    """Time a cold load (snapshot plus tail) and a full replay and compare them with the cached bracket."""
+    cached = await store.load(tournament_id, tx=database)
+
+    cold = BracketStore()
+    started = time.perf_counter()
+    loaded = await cold.load(tournament_id, tx=database)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    replayed = await cold.replay(tournament_id, tx=database)
+    replay_ms = (time.perf_counter() - started) * 1000
+
+    events = (await database.fetchone(
+        "SELECT COUNT(*) as count FROM match_events WHERE tournament_id = ?",
+        (tournament_id,)
+    ))['count']
+    return {
+        'events': events,
+        'tail': cold.stats()['folded_events'],
+        'load_ms': load_ms,
+        'replay_ms': replay_ms,
+        'consistent': replayed is not None and replayed.same_state(loaded) and loaded.same_state(cached),
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="comma-separated field sizes")
+    parser.add_argument('--snapshot-interval', type=int, default=bracket_engine.BRACKET_SNAPSHOT_INTERVAL, help="events between bracket snapshots")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    bracket_engine.BRACKET_SNAPSHOT_INTERVAL = args.snapshot_interval
+
+    directory = tempfile.mkdtemp(prefix='match-log-')
+    path = os.path.join(directory, 'replay.db')
+    with ConnectionPool(path, size=1).connection() as conn:
+        migrate(conn)
+    database = AsyncDatabase(ConnectionPool(path))
+    store = BracketStore()
+    failures = 0
+    try:
+        print(f"{'entrants':>8}{'matches':>9}{'events':>8}{'tail':>6}{'dropped':>9}{'old drop':>10}{'undo ms':>9}{'load ms':>9}{'replay ms':>11}")
+        for size in sizes:
+            tournament_id = await start(database, store, size)
+            matches = await play(database, store, tournament_id)
+            reverted = await undo(database, store, tournament_id)
+            result = await audit(database, store, tournament_id)
+            print(
+                f"{size:>8}{matches:>9}{result['events']:>8}{result['tail']:>6}{reverted['dropped']:>9}"
+                f"{reverted['later_rounds']:>10}{reverted['elapsed_ms']:>9.1f}{result['load_ms']:>9.1f}{result['replay_ms']:>11.1f}"
+            )
+            if not result['consistent']:
+                print("    FAIL: replayed, loaded and cached brackets differ")
+                failures += 1
+    finally:
+        database.close()
+        database.pool.close_all()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failures:
+        print(f"\nFAIL: {failures} inconsistent brackets")
+        return 1
+    print("\nOK: replaying the match log gives the stored bracket")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
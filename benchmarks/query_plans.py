@@ -0,0 +1,132 @@
+"""
+Check that no query in the cogs does a full table scan on the indexed tables.
+
+Collects every SQL literal passed to db.fetchone/fetchall/execute/execute_many
+(and the transaction equivalents) in cogs/ and utils/ except the one-off
+migrations, runs EXPLAIN QUERY PLAN for it against a fresh schema built by
+utils.migrations.migrate and reports every `SCAN` step over a table listed
+in utils.db.INDEXES.
+
+Usage:
+    python benchmarks/query_plans.py [--db path/to/copy.db] [--verbose]
+
+Exits with status 1 if any full scan is found, so it can be used as a CI gate.
+"""
+import argparse
+import ast
+import glob
+import os
+import re
+import sqlite3
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.db import INDEXES, Row
+from utils.migrations import migrate
+
+QUERY_METHODS = {'fetchone', 'fetchall', 'execute', 'execute_many'}
+SOURCES = ('cogs/*.py', 'utils/*.py')
+# Run once per database and may read whole tables on purpose
+EXCLUDED = ('utils/migrations.py',)
+
+# Tables that must always be reached through an index
+WATCHED_TABLES = {table for table, _ in INDEXES.values()}
+
+SQL_KEYWORDS = {'where', 'on', 'join', 'left', 'inner', 'outer', 'cross', 'group', 'order', 'limit', 'set', 'values'}
+CATALOG_TABLES = re.compile(r'\b(?:sqlite_master|information_schema|pg_\w+)\b', re.IGNORECASE)
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+def collect_queries(excluded=()):
+    """Yield (location, sql) for every literal query in the sources except `excluded` files."""
+    for pattern in SOURCES:
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            if os.path.relpath(path, ROOT).replace(os.sep, '/') in excluded:
+                continue
+            with open(path, encoding='utf-8') as f:
+                tree = ast.parse(f.read(), filename=path)
+
+            for node in ast.walk(tree):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+                    continue
+                if node.func.attr not in QUERY_METHODS or not node.args:
+                    continue
+                first = node.args[0]
+                if isinstance(first, ast.Constant) and isinstance(first.value, str):
+                    yield f"{os.path.relpath(path, ROOT)}:{node.lineno}", first.value
+
+
+def table_aliases(sql: str) -> dict:
+    """Map every table name and alias used in the query to the table name."""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def full_scans(cursor, sql: str):
+    """Return the plan steps that scan a watched table without an index."""
+    params = (None,) * sql.count('?')
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    aliases = table_aliases(sql)
+
+    scans = []
+    for step in cursor.fetchall():
+        detail = step['detail']
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if not match:
+            continue
+        table = aliases.get(match.group(1).lower(), match.group(1).lower())
+        if table in WATCHED_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', help="run against a copy of an existing database instead of a fresh schema")
+    parser.add_argument('--verbose', action='store_true', help="print every checked query")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db or ':memory:')
+    conn.row_factory = Row
+    migrate(conn)
+    cursor = conn.cursor()
+
+    checked = 0
+    failures = []
+    skipped = []
+    for location, sql in collect_queries(EXCLUDED):
+        if sql.lstrip().upper().startswith(('CREATE', 'ALTER', 'DROP', 'PRAGMA', 'INSERT')):
+            continue
+        if CATALOG_TABLES.search(sql):
+            continue
+        try:
+            scans = full_scans(cursor, sql)
+        except sqlite3.Error as e:
+            skipped.append((location, str(e)))
+            continue
+
+        checked += 1
+        if scans:
+            failures.append((location, scans, ' '.join(sql.split())))
+        elif args.verbose:
+            print(f"ok    {location}")
+
+    conn.close()
+
+    for location, error in skipped:
+        print(f"skip  {location}: {error}")
+    for location, scans, sql in failures:
+        print(f"SCAN  {location}: {'; '.join(scans)}\n      {sql}")
+
+    print(f"\n{checked} queries checked, {len(failures)} full scans, {len(skipped)} skipped")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Compare the cost of building result rows with dict_factory and utils.db.Row.
+
+Fetches a bracket-shaped result set (100k rows by default) from an in-memory
+database with each row factory and reports fetch time, field access time and
+memory allocated for the rows (measured with tracemalloc).
+
+Usage:
+    python benchmarks/row_factory.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import Row, dict_factory
+
+QUERY = """
+SELECT m.id, m.tournament_id, m.round, m.player1_id, m.player2_id,
+       m.team1_score, m.team2_score, m.completed,
+       p1.username as player1_name, p2.username as player2_name
+FROM tournament_matches m
+LEFT JOIN players p1 ON m.player1_id = p1.user_id
+LEFT JOIN players p2 ON m.player2_id = p2.user_id
+"""
+
+FACTORIES = [
+    ("tuple (no names)", None),
+    ("dict_factory", dict_factory),
+    ("Row", Row),
+]
+
+
+def prepare(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE players (user_id INTEGER PRIMARY KEY, username TEXT)")
+    conn.execute(
+        """
+        CREATE TABLE tournament_matches (
+            id INTEGER PRIMARY KEY, tournament_id INTEGER, round INTEGER,
+            player1_id INTEGER, player2_id INTEGER,
+            team1_score INTEGER, team2_score INTEGER, completed INTEGER
+        )
+        """
+    )
+    conn.executemany("INSERT INTO players VALUES (?, ?)", ((i, f"player{i}") for i in range(1000)))
+    conn.executemany(
+        "INSERT INTO tournament_matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i, i // 64, i % 6 + 1, i % 1000, (i + 1) % 1000, i % 3, i % 2, 1) for i in range(rows))
+    )
+    conn.commit()
+    return conn
+
+
+def access(rows, named: bool):
+    """Touch fields the way the bracket renderer does."""
+    total = 0
+    if named:
+        for row in rows:
+            total += row['round'] + row['team1_score']
+            if row.get('player1_name'):
+                total += 1
+    else:
+        for row in rows:
+            total += row[2] + row[5]
+            if row[8]:
+                total += 1
+    return total
+
+
+def measure(conn, factory, repeat: int) -> dict:
+    conn.row_factory = factory
+    fetch_times = []
+    access_times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = conn.execute(QUERY).fetchall()
+        fetch_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        access(rows, factory is not None)
+        access_times.append(time.perf_counter() - started)
+        del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = conn.execute(QUERY).fetchall()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+
+    return {
+        'fetch_ms': min(fetch_times) * 1000,
+        'access_ms': min(access_times) * 1000,
+        'allocated_mb': allocated / 1024 / 1024,
+        'bytes_per_row': allocated / max(count, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="number of rows to fetch")
+    parser.add_argument('--repeat', type=int, default=3, help="timing runs per factory (best is reported)")
+    args = parser.parse_args()
+
+    conn = prepare(args.rows)
+
+    print(f"{args.rows} rows, best of {args.repeat}\n")
+    print(f"{'factory':<18}{'fetch ms':>10}{'access ms':>11}{'alloc MB':>10}{'B/row':>8}")
+    for name, factory in FACTORIES:
+        r = measure(conn, factory, args.repeat)
+        print(f"{name:<18}{r['fetch_ms']:>10.1f}{r['access_ms']:>11.1f}{r['allocated_mb']:>10.1f}{r['bytes_per_row']:>8.0f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Measure concurrent read/write throughput with the rollback journal and with WAL.
+
+Reader threads run the /mystats and /top-players queries in a loop while a
+writer thread records match results the way the moderation cog does. Each
+profile runs for the same duration against its own temporary database seeded
+with the current schema, and the benchmark reports throughput, read and write
+latency and the number of `database is locked` errors.
+
+Usage:
+    python benchmarks/wal_concurrency.py [--readers 4] [--seconds 5] [--players 5000]
+
+The benchmark uses temporary databases and never touches tournaments.db.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import ConnectionPool, DB_PRAGMAS
+from utils.migrations import migrate
+
+PROFILES = [
+    # What get_db used before: default journal, no busy_timeout beyond sqlite3's 5s connect timeout
+    ("rollback journal (before)", {}),
+    ("WAL profile (after)", DB_PRAGMAS),
+]
+
+READS = [
+    "SELECT username, wins, losses FROM players WHERE user_id = ?",
+    """
+    SELECT tournament_type, COUNT(*) as count
+    FROM player_stats
+    WHERE user_id = ? AND place = 1
+    GROUP BY tournament_type
+    """,
+    "SELECT username, wins, losses, user_id FROM players ORDER BY wins DESC LIMIT 10",
+]
+
+
+def seed(path: str, players: int):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO players (user_id, username, wins, losses) VALUES (?, ?, ?, ?)",
+        ((i, f"player{i}", random.randint(0, 50), random.randint(0, 50)) for i in range(players))
+    )
+    conn.executemany(
+        "INSERT INTO player_stats (user_id, tournament_id, place, tournament_type) VALUES (?, ?, ?, ?)",
+        ((random.randrange(players), i // 8, random.randint(1, 8), random.choice(['private', 'public']))
+         for i in range(players * 4))
+    )
+    conn.executemany(
+        "INSERT INTO tournament_matches (tournament_id, round, player1_id, player2_id) VALUES (?, ?, ?, ?)",
+        ((i // 16, 1, random.randrange(players), random.randrange(players)) for i in range(players))
+    )
+    conn.commit()
+    conn.close()
+
+
+def percentile(samples, fraction: float) -> float:
+    samples = sorted(samples) or [0.0]
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def reader(pool, players: int, stop: threading.Event, latencies: list, errors: list):
+    while not stop.is_set():
+        user_id = random.randrange(players)
+        started = time.perf_counter()
+        try:
+            with pool.connection() as conn:
+                for sql in READS:
+                    conn.execute(sql, (user_id,) if '?' in sql else ()).fetchall()
+        except sqlite3.OperationalError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def writer(pool, players: int, stop: threading.Event, latencies: list, errors: list):
+    while not stop.is_set():
+        match_id = random.randint(1, players)
+        winner, loser = random.randrange(players), random.randrange(players)
+        started = time.perf_counter()
+        try:
+            with pool.connection() as conn:
+                conn.execute(
+                    "UPDATE tournament_matches SET team1_score = ?, team2_score = ?, completed = 1 WHERE id = ?",
+                    (2, 1, match_id)
+                )
+                conn.execute("UPDATE players SET wins = wins + 1 WHERE user_id = ?", (winner,))
+                conn.execute("UPDATE players SET losses = losses + 1 WHERE user_id = ?", (loser,))
+                conn.execute(
+                    "INSERT INTO player_stats (user_id, tournament_id, place, tournament_type) VALUES (?, ?, ?, ?)",
+                    (winner, match_id // 16, 1, 'private')
+                )
+                conn.commit()
+        except sqlite3.OperationalError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def measure(name: str, pragmas: dict, directory: str, args) -> dict:
+    path = os.path.join(directory, f"{len(os.listdir(directory))}.db")
+    seed(path, args.players)
+    pool = ConnectionPool(path, size=args.readers + 1, pragmas=pragmas)
+
+    stop = threading.Event()
+    read_latencies, write_latencies, errors = [], [], []
+    threads = [
+        threading.Thread(target=reader, args=(pool, args.players, stop, read_latencies, errors))
+        for _ in range(args.readers)
+    ]
+    threads.append(threading.Thread(target=writer, args=(pool, args.players, stop, write_latencies, errors)))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool.close_all()
+
+    return {
+        'name': name,
+        'reads': len(read_latencies) / args.seconds,
+        'writes': len(write_latencies) / args.seconds,
+        'read_p95_ms': percentile(read_latencies, 0.95) * 1000,
+        'read_max_ms': percentile(read_latencies, 1.0) * 1000,
+        'write_p95_ms': percentile(write_latencies, 0.95) * 1000,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help="number of concurrent reader threads")
+    parser.add_argument('--seconds', type=float, default=5, help="duration of each run")
+    parser.add_argument('--players', type=int, default=5000, help="number of seeded players")
+    args = parser.parse_args()
+
+    random.seed(0)
+    directory = tempfile.mkdtemp(prefix='wal-bench-')
+    try:
+        results = [measure(name, pragmas, directory, args) for name, pragmas in PROFILES]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.readers} readers + 1 writer, {args.seconds:g}s per profile\n")
+    print(f"{'profile':<28}{'reads/s':>9}{'writes/s':>10}{'read p95':>10}{'read max':>10}{'write p95':>11}{'locked':>8}")
+    for r in results:
+        print(
+            f"{r['name']:<28}{r['reads']:>9.0f}{r['writes']:>10.0f}{r['read_p95_ms']:>10.2f}"
+            f"{r['read_max_ms']:>10.2f}{r['write_p95_ms']:>11.2f}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 import os
+import time
 import logging
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
+from utils.db import db, DB_CHECKPOINT_INTERVAL
+from utils.migrations import migrate
+from utils.outbox import outbox
+from utils.command_sync import sync_commands
 
 logger = logging.getLogger(__name__)
 
+@tasks.loop(seconds=DB_CHECKPOINT_INTERVAL)
+async def checkpoint_wal():
+    """Keep the WAL file bounded between SQLite's automatic checkpoints."""
+    try:
+        busy, frames, checkpointed = await db.maintain_wal()
+        if busy:
+            logger.info(f"WAL checkpoint blocked by readers: {checkpointed}/{frames} frames copied")
+    except Exception as e:
+        logger.error(f"Error during WAL checkpoint: {e}")
+
 async def setup_bot():
     """Setup and configure the Discord bot with all necessary extensions."""
     # Set up intents
@@ -14,7 +29,9 @@ async def setup_bot():
     intents.members = True
     
     # Create bot instance
+    started = time.perf_counter()
     bot = commands.Bot(command_prefix='!', intents=intents)
+    bot.startup_done = False
     
     # Set up sync command for application commands
     @bot.command()
@@ -22,7 +39,8 @@ async def setup_bot():
     async def sync(ctx):
         """Sync application commands to the guild."""
         logger.info(f"Syncing commands to guild {ctx.guild.id}")
-        await bot.tree.sync(guild=discord.Object(id=ctx.guild.id))
+        # Ручная синхронизация игнорирует сохранённый отпечаток
+        await sync_commands(bot.tree, guild=discord.Object(id=ctx.guild.id), force=True)
         await ctx.send("Commands synced!")
     
     # On ready event
@@ -31,6 +49,14 @@ async def setup_bot():
         """Called when the bot is ready and connected to Discord."""
         logger.info(f"{bot.user.name} has connected to Discord!")
         
+        # on_ready повторяется после каждого переподключения, разовая работа выполняется один раз за процесс
+        if bot.startup_done:
+            logger.info("Reconnected, startup tasks already done")
+            return
+        bot.startup_done = True
+        ready_at = time.perf_counter()
+        logger.info(f"Gateway ready {ready_at - started:.2f}s after startup")
+        
         # Set bot activity
         await bot.change_presence(
             activity=discord.Activity(
@@ -39,28 +65,39 @@ async def setup_bot():
             )
         )
         
-        # Sync application commands globally
+        # Sync application commands globally, only if the tree changed since the last sync
+        synced_scopes = 0
         try:
             # Log all commands before syncing
-            all_commands = []
             for cmd in bot.tree.get_commands():
-                all_commands.append(cmd.name)
                 logger.info(f"Command found: {cmd.name}")
             
-            synced = await bot.tree.sync()
-            logger.info(f"Synced {len(synced)} commands globally: {', '.join([cmd.name for cmd in synced])}")
+            if await sync_commands(bot.tree) is not None:
+                synced_scopes += 1
         except Exception as e:
             logger.error(f"Failed to sync commands: {e}")
             
         # Also sync to the current guilds
         for guild in bot.guilds:
             try:
-                synced = await bot.tree.sync(guild=discord.Object(id=guild.id))
-                logger.info(f"Synced {len(synced)} commands to guild {guild.id}: {', '.join([cmd.name for cmd in synced])}")
+                if await sync_commands(bot.tree, guild=discord.Object(id=guild.id)) is not None:
+                    synced_scopes += 1
             except Exception as e:
                 logger.error(f"Failed to sync commands to guild {guild.id}: {e}")
+        
+        logger.info(
+            f"Startup tasks done in {time.perf_counter() - ready_at:.2f}s: "
+            f"{synced_scopes} of {len(bot.guilds) + 1} command scopes synced, the rest unchanged"
+        )
 
     
+    # Bring the database schema up to date before any cog touches it
+    await db.run_sync(migrate)
+    checkpoint_wal.start()
+    
+    # Deliver queued Discord messages, including ones left over from a previous run
+    outbox.start(bot)
+    
     # Load cogs (extensions)
     cogs = [
         'cogs.tournaments',
@@ -3,7 +3,8 @@ import logging
 from discord import app_commands
 from discord.ext import commands
 from typing import Optional
-from utils.db import get_db
+from utils.db import db
+from utils.outbox import outbox
 from utils.permissions import is_admin
 from utils.constants import ACHIEVEMENT_DESCRIPTIONS
 
@@ -12,17 +13,15 @@ logger = logging.getLogger(__name__)
 class Achievements(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.init_achievements()
         
-    def init_achievements(self):
-        """Initialize the achievements in the database if they don't exist."""
-        db = get_db()
-        cursor = db.cursor()
+    async def cog_load(self):
+        await self.init_achievements()
         
+    async def init_achievements(self):
+        """Initialize the achievements in the database if they don't exist."""
         try:
             # Check if achievements table is empty
-            cursor.execute("SELECT COUNT(*) as count FROM achievements")
-            result = cursor.fetchone()
+            result = await db.fetchone("SELECT COUNT(*) as count FROM achievements")
             count = result['count'] if result and 'count' in result else 0
             
             if count == 0:
@@ -33,16 +32,14 @@ class Achievements(commands.Cog):
                     (3, "Турнирный зверь", "Выиграйте 5 турниров подряд")
                 ]
                 
-                cursor.executemany(
+                await db.execute_many(
                     "INSERT INTO achievements (id, name, description) VALUES (?, ?, ?)",
                     achievements
                 )
                 
-                db.commit()
                 logger.info("Initialized default achievements")
         except Exception as e:
             logger.error(f"Error initializing achievements: {e}")
-            db.rollback()
     
     @app_commands.command(
         name="achievement-add",
@@ -67,31 +64,23 @@ class Achievements(commands.Cog):
             await interaction.response.send_message("Описание достижения должно содержать от 5 до 200 символов.", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Check if achievement with same name already exists
-            cursor.execute("SELECT COUNT(*) as count FROM achievements WHERE name = ?", (name,))
-            result = cursor.fetchone()
+            result = await db.fetchone("SELECT COUNT(*) as count FROM achievements WHERE name = ?", (name,))
             if result and 'count' in result and result['count'] > 0:
                 await interaction.response.send_message("Достижение с таким названием уже существует!", ephemeral=True)
                 return
                 
             # Add achievement
-            cursor.execute(
+            await db.execute(
                 "INSERT INTO achievements (name, description) VALUES (?, ?)",
                 (name, description)
             )
             
-            db.commit()
-            
             await interaction.response.send_message(f"Достижение **{name}** успешно добавлено!", ephemeral=True)
             
         except Exception as e:
             logger.error(f"Error adding achievement: {e}")
-            db.rollback()
             await interaction.response.send_message("Произошла ошибка при добавлении достижения.", ephemeral=True)
     
     @app_commands.command(
@@ -108,46 +97,38 @@ class Achievements(commands.Cog):
             await interaction.response.send_message("У вас нет прав для выдачи достижений!", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Check if achievement exists
-            cursor.execute("SELECT * FROM achievements WHERE id = ?", (achievement_id,))
-            achievement = cursor.fetchone()
+            achievement = await db.fetchone("SELECT * FROM achievements WHERE id = ?", (achievement_id,))
             
             if not achievement:
                 await interaction.response.send_message(f"Достижение с ID {achievement_id} не найдено!", ephemeral=True)
                 return
                 
             # Check if player already has this achievement
-            cursor.execute(
+            result = await db.fetchone(
                 "SELECT COUNT(*) as count FROM player_achievements WHERE user_id = ? AND achievement_id = ?",
                 (user.id, achievement_id)
             )
             
-            result = cursor.fetchone()
             if result and 'count' in result and result['count'] > 0:
                 await interaction.response.send_message(f"Игрок уже имеет это достижение!", ephemeral=True)
                 return
                 
-            # Ensure player exists in players table
-            cursor.execute(
-                "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
-                (user.id, user.name)
-            )
+            async with db.transaction() as tx:
+                # Ensure player exists in players table
+                await tx.execute(
+                    "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
+                    (user.id, user.name)
+                )
+                    
+                # Grant achievement
+                await tx.execute(
+                    "INSERT INTO player_achievements (user_id, achievement_id, earned_date, source) VALUES (?, ?, datetime('now'), 'manual')",
+                    (user.id, achievement_id)
+                )
                 
-            # Grant achievement
-            cursor.execute(
-                "INSERT INTO player_achievements (user_id, achievement_id, earned_date) VALUES (?, ?, datetime('now'))",
-                (user.id, achievement_id)
-            )
-            
-            db.commit()
-            
-            # Notify player
-            try:
+                # Notify player
                 embed = discord.Embed(
                     title="🏆 Достижение разблокировано!",
                     description=f"Вы получили достижение **{achievement['name']}**!",
@@ -155,9 +136,7 @@ class Achievements(commands.Cog):
                 )
                 embed.add_field(name="Описание", value=achievement['description'])
                 
-                await user.send(embed=embed)
-            except:
-                logger.warning(f"Could not send DM to user {user.id} about achievement")
+                await outbox.send_dm(tx, user.id, embeds=[embed], dedup_key=f"achievement:{user.id}:{achievement['name']}")
             
             await interaction.response.send_message(
                 f"Достижение **{achievement['name']}** успешно выдано игроку {user.mention}!",
@@ -166,7 +145,6 @@ class Achievements(commands.Cog):
             
         except Exception as e:
             logger.error(f"Error granting achievement: {e}")
-            db.rollback()
             await interaction.response.send_message("Произошла ошибка при выдаче достижения.", ephemeral=True)
     
     @app_commands.command(
@@ -174,14 +152,9 @@ class Achievements(commands.Cog):
         description="Показать список всех доступных достижений"
     )
     async def achievement_list(self, interaction: discord.Interaction):
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Get all achievements
-            cursor.execute("SELECT * FROM achievements ORDER BY id ASC")
-            achievements = cursor.fetchall()
+            achievements = await db.fetchall("SELECT * FROM achievements ORDER BY id ASC")
             
             if not achievements:
                 await interaction.response.send_message("В системе пока нет достижений.", ephemeral=True)
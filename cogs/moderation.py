@@ -1,17 +1,304 @@
 import discord
 import logging
+import re
 import asyncio
 import datetime
+import time
 from discord import app_commands
 from discord.ext import commands
 from typing import Optional
-from utils.db import get_db
+from utils.db import db
+from utils.brackets import publish_bracket, round_title
+from utils.scheduler import scheduler
+from utils.outbox import outbox, HIGH
+from utils.fanout import fanout
+from utils.dedup import interaction_dedup
+from utils.locks import tournament_locks
+from utils.jobs import jobs, Job
+from utils.models import Match, Tournament, SERIES_MATCH_TYPES, WINS_NEEDED
+from utils.bracket_engine import Bracket, brackets, create_matches, decided_winner, BRACKET_PROGRESSION
+from utils import match_log
+from utils.match_log import RESULT_SET, RESULT_REVERTED, WALKOVER
+from utils.series import SeriesError, record_games, get_series, reset_series
+from utils.seeding import SEEDING_METHODS, RANDOM, MANUAL, seed_entrants, set_manual_seeds
 from utils.permissions import is_tournament_manager, is_admin
 from utils.embeds import create_match_result_embed
 from utils.constants import TOURNAMENT_RESULTS_CHANNEL, PRIVATE_TOURNAMENTS_CHANNEL, PUBLIC_TOURNAMENTS_CHANNEL
 
 logger = logging.getLogger(__name__)
 
+async def finish_tournament(tx, tournament: Tournament, winner_id: int, score: str = None):
+    """Record the winner, complete the tournament and queue the results announcement."""
+    if tournament.is_team:
+        await tx.execute(
+            "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
+            (winner_id, tournament.id)
+        )
+        team = await tx.fetchone("SELECT team_name FROM tournament_teams WHERE id = ?", (winner_id,))
+        winner = team['team_name'] if team else f"Команда #{winner_id}"
+    else:
+        await tx.execute(
+            "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
+            (winner_id, tournament.id)
+        )
+        player = await tx.fetchone("SELECT username FROM players WHERE user_id = ?", (winner_id,))
+        winner = f"<@{winner_id}> ({player['username']})" if player else f"<@{winner_id}>"
+    
+    # Создаем embed с результатами
+    embed = discord.Embed(
+        title=f"🏆 Результаты турнира: {tournament.name}",
+        description=f"Турнир завершен!",
+        color=0xF1C40F  # Gold
+    )
+    embed.add_field(name="Победитель", value=winner, inline=False)
+    if score:
+        embed.add_field(name="Счет", value=score, inline=False)
+    
+    # Отправляем результаты через outbox, не держа блокировку БД на время запроса к Discord
+    await outbox.send(tx, TOURNAMENT_RESULTS_CHANNEL, embeds=[embed], dedup_key=f"tournament-result:{tournament.id}:{winner_id}")
+
+
+async def advance_bracket(tx, bracket: Bracket, node: Optional[int]) -> Optional[int]:
+    """
+    Act on a result just recorded in the bracket (automatic progression).
+    
+    Finishes the tournament once the final is decided, or creates the match
+    of `node` that became playable and calls its two sides to it, all in the
+    transaction of the result. Returns the id of the created match.
+    """
+    if bracket.champion is None and node is None:
+        return None
+    row = await tx.fetchone("SELECT * FROM tournaments WHERE id = ?", (bracket.tournament_id,))
+    tournament = Tournament.from_row(row)
+    
+    if bracket.champion is not None:
+        if tournament.status != 'completed':
+            await finish_tournament(tx, tournament, bracket.champion)
+        return None
+    
+    created = await create_matches(tx, bracket, [node])
+    if not created:
+        return None
+    match_id = created[0]
+    
+    # Уведомляем обе стороны нового матча
+    side1, side2 = bracket.sides(node)
+    if bracket.is_team:
+        names = {
+            team['id']: team['team_name'] for team in await tx.fetchall(
+                "SELECT id, team_name FROM tournament_teams WHERE id IN (?, ?)",
+                (side1, side2)
+            )
+        }
+        mentions = None
+        versus = f"{names.get(side1, '?')} vs {names.get(side2, '?')}"
+    else:
+        mentions = f"<@{side1}> <@{side2}>"
+        versus = f"<@{side1}> vs <@{side2}>"
+    
+    embed = discord.Embed(
+        title=f"⚡ Новый матч в турнире {tournament.name}",
+        description=f"{round_title(bracket.round_of(node), bracket.rounds)}: {versus}",
+        color=0x1ABC9C  # Teal
+    )
+    embed.add_field(name="Матч", value=f"#{match_id}", inline=True)
+    embed.add_field(name="Формат", value=tournament.match_type, inline=True)
+    await outbox.send(tx, TOURNAMENT_RESULTS_CHANNEL, content=mentions, embeds=[embed], dedup_key=f"match-created:{match_id}")
+    logger.info(f"Created match {match_id} at node {node} of tournament {tournament.id}")
+    return match_id
+
+
+# Достижения за места в турнирах: id -> (название, описание)
+ACHIEVEMENTS = {
+    1: ("Король ревиков", "Выиграйте 3 турнира с револьверами"),
+    2: ("Снайпер-легенда", "Выиграйте снайперский турнир"),
+    3: ("Турнирный зверь", "Выиграйте 5 турниров подряд"),
+}
+
+
+async def achievements_met(tx, user_id: int) -> set:
+    """Return the ids of the ACHIEVEMENTS the player's player_stats rows qualify for."""
+    met = set()
+    
+    # Check for revolver tournament wins ("Король ревиков")
+    revolver_wins = (await tx.fetchone(
+        """
+        SELECT COUNT(*) as wins FROM player_stats ps
+        JOIN tournaments t ON ps.tournament_id = t.id
+        WHERE ps.user_id = ? AND ps.place = 1
+        AND (t.weapon_type LIKE '%револьвер%' OR t.weapon_type LIKE '%revolver%')
+        """,
+        (user_id,)
+    ))['wins']
+    if revolver_wins >= 3:
+        met.add(1)
+    
+    # Check for sniper tournament win
+    sniper_wins = (await tx.fetchone(
+        """
+        SELECT COUNT(*) as wins FROM player_stats ps
+        JOIN tournaments t ON ps.tournament_id = t.id
+        WHERE ps.user_id = ? AND ps.place = 1
+        AND (t.weapon_type LIKE '%снайпер%' OR t.weapon_type LIKE '%sniper%')
+        """,
+        (user_id,)
+    ))['wins']
+    if sniper_wins >= 1:
+        met.add(2)
+    
+    # Check for consecutive wins
+    results = await tx.fetchall(
+        """
+        SELECT tournament_id, place
+        FROM player_stats
+        WHERE user_id = ?
+        ORDER BY tournament_id DESC
+        LIMIT 5
+        """,
+        (user_id,)
+    )
+    consecutive_wins = 0
+    for result in results:
+        if result['place'] == 1:
+            consecutive_wins += 1
+        else:
+            break
+    if consecutive_wins >= 5:
+        met.add(3)
+    
+    return met
+
+
+async def check_achievements(tx, user_id):
+    """Award achievements earned by the player inside the given transaction.
+    
+    Returns a list of (name, description) tuples for newly awarded achievements,
+    so notifications can be sent after the transaction is committed.
+    """
+    earned = []
+    
+    for achievement_id in sorted(await achievements_met(tx, user_id)):
+        # Check if already has achievement
+        existing = await tx.fetchone(
+            "SELECT COUNT(*) as count FROM player_achievements WHERE user_id = ? AND achievement_id = ?",
+            (user_id, achievement_id)
+        )
+        
+        if existing['count'] == 0:
+            # Award achievement
+            await tx.execute(
+                "INSERT INTO player_achievements (user_id, achievement_id, earned_date, source) VALUES (?, ?, ?, 'match')",
+                (user_id, achievement_id, datetime.datetime.now())
+            )
+            earned.append(ACHIEVEMENTS[achievement_id])
+    
+    return earned
+
+
+async def notify_achievements(tx, user_id, achievements):
+    """Queue a DM to the player for every newly awarded achievement in the given transaction."""
+    for name, description in achievements:
+        embed = discord.Embed(
+            title="🏆 Достижение разблокировано!",
+            description=f"Вы получили достижение **{name}**!",
+            color=0xF1C40F  # Gold
+        )
+        embed.add_field(name="Описание", value=description)
+        
+        await outbox.send_dm(tx, user_id, embeds=[embed], dedup_key=f"achievement:{user_id}:{name}")
+
+
+async def record_match_stats(tx, tournament_id: int, winner_id: int, loser_id: int):
+    """
+    Count a decided 1v1 match in the players' records.
+    
+    Adds the win and the loss, a player_stats row for each side and awards
+    the winner's new achievements; revert_match_stats takes it all back.
+    """
+    await tx.execute("UPDATE players SET wins = wins + 1 WHERE user_id = ?", (winner_id,))
+    await tx.execute("UPDATE players SET losses = losses + 1 WHERE user_id = ?", (loser_id,))
+    
+    # Get tournament type
+    tournament = await tx.fetchone("SELECT type FROM tournaments WHERE id = ?", (tournament_id,))
+    tournament_type = tournament['type'] if tournament else 'private'
+    
+    await tx.execute_many(
+        "INSERT INTO player_stats (user_id, tournament_id, place, tournament_type) VALUES (?, ?, ?, ?)",
+        [(winner_id, tournament_id, 1, tournament_type), (loser_id, tournament_id, 2, tournament_type)]
+    )
+    
+    # Check for achievements and queue notifications about them
+    earned_achievements = await check_achievements(tx, winner_id)
+    await notify_achievements(tx, winner_id, earned_achievements)
+
+
+async def credited_winner(tx, match) -> Optional[int]:
+    """
+    Player that record_match_stats credited with a completed match row.
+    
+    The winner logged with the match's RESULT_SET or WALKOVER event is the
+    one the stats got. Matches outside the log fall back to decided_winner's
+    rule, the higher score; draws completed before they were rejected were
+    credited to the first player if they scored at all.
+    """
+    event = await tx.fetchone(
+        """
+        SELECT winner FROM match_events
+        WHERE tournament_id = ? AND match_id = ? AND kind IN (?, ?)
+        ORDER BY id DESC LIMIT 1
+        """,
+        (match['tournament_id'], match['id'], RESULT_SET, WALKOVER)
+    )
+    if event and event['winner'] is not None:
+        return event['winner']
+    score1, score2 = match['team1_score'] or 0, match['team2_score'] or 0
+    if score1 != score2:
+        return match['player1_id'] if score1 > score2 else match['player2_id']
+    return match['player1_id'] if score1 > 0 else None
+
+
+async def revert_match_stats(tx, match):
+    """
+    Take back what a completed 1v1 match added to the players' records.
+    
+    Undoes the win and the loss of the credited_winner, removes one
+    player_stats row of each side and revokes the winner's achievements
+    that match stats awarded and no longer justify; achievements granted
+    by hand stay. Team matches left no stats.
+    """
+    player1_id, player2_id = match.get('player1_id'), match.get('player2_id')
+    if player1_id is None or player2_id is None:
+        return
+    winner_id = await credited_winner(tx, match)
+    if winner_id is None:
+        return
+    loser_id = player2_id if winner_id == player1_id else player1_id
+    
+    await tx.execute("UPDATE players SET wins = wins - 1 WHERE user_id = ? AND wins > 0", (winner_id,))
+    await tx.execute("UPDATE players SET losses = losses - 1 WHERE user_id = ? AND losses > 0", (loser_id,))
+    
+    # Удаляется только запись этого матча, остальные матчи турнира сохраняют статистику
+    for user_id, place in ((winner_id, 1), (loser_id, 2)):
+        await tx.execute(
+            """
+            DELETE FROM player_stats WHERE id = (
+                SELECT id FROM player_stats
+                WHERE user_id = ? AND tournament_id = ? AND place = ?
+                ORDER BY id DESC LIMIT 1
+            )
+            """,
+            (user_id, match['tournament_id'], place)
+        )
+    
+    met = await achievements_met(tx, winner_id)
+    revoked = [(winner_id, achievement_id) for achievement_id in ACHIEVEMENTS if achievement_id not in met]
+    if revoked:
+        await tx.execute_many(
+            "DELETE FROM player_achievements WHERE user_id = ? AND achievement_id = ? AND source = 'match'",
+            revoked
+        )
+
+
 class TournamentResultModal(discord.ui.Modal):
     score_team1 = discord.ui.TextInput(
         label="Очки команды 1",
@@ -39,50 +326,25 @@ class TournamentResultModal(discord.ui.Modal):
         max_length=1000
     )
     
-    def __init__(self, match_id: int):
-        # Получаем информацию о матче и формате матча
-        db = get_db()
-        cursor = db.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT t.match_type, t.name
-                FROM tournament_matches m
-                JOIN tournaments t ON m.tournament_id = t.id
-                WHERE m.id = ?
-                """,
-                (match_id,)
-            )
-            match_info = cursor.fetchone()
-            match_type = match_info['match_type'] if match_info else 'BO1'
-            tournament_name = match_info['name'] if match_info else ''
-            
-            title = f"Результат матча ({match_type})"
-            if tournament_name:
-                title += f" - {tournament_name}"
-        except Exception as e:
-            logger.error(f"Error getting match info: {e}")
-            title = "Результат матча"
-            match_type = 'BO1'
+    def __init__(self, match_id: int, match_type: str = 'BO1', tournament_name: str = '', tournament_id: int = None):
+        # Информация о формате матча приходит из команды, чтобы не обращаться к БД при построении формы
+        match_type = match_type or 'BO1'
+        
+        title = f"Результат матча ({match_type})"
+        if tournament_name:
+            title += f" - {tournament_name}"
         
         # Обновляем подсказку для поля ввода в зависимости от типа матча
         super().__init__(title=title)
         self.match_id = match_id
+        self.match_type = match_type
+        self.tournament_id = tournament_id
         
         # Обновляем подсказку в зависимости от типа матча
-        wins_needed = 1
-        if match_type == 'BO3':
-            wins_needed = 2
-            self.score_team1.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
-            self.score_team2.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
-        elif match_type == 'BO5':
-            wins_needed = 3
-            self.score_team1.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
-            self.score_team2.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
-        elif match_type == 'BO7':
-            wins_needed = 4
-            self.score_team1.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
-            self.score_team2.placeholder = f"Введите кол-во побед (нужно {wins_needed} для победы)"
+        if match_type in SERIES_MATCH_TYPES:
+            needed = WINS_NEEDED[match_type]
+            self.score_team1.placeholder = f"Выигранные игры (серия до {needed} побед)"
+            self.score_team2.placeholder = f"Выигранные игры (серия до {needed} побед)"
         else:
             self.score_team1.placeholder = "Введите количество очков..."
             self.score_team2.placeholder = "Введите количество очков..."
@@ -103,365 +365,140 @@ class TournamentResultModal(discord.ui.Modal):
         if score_team1 < 0 or score_team2 < 0:
             await interaction.response.send_message("Очки не могут быть отрицательными!", ephemeral=True)
             return
-            
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
         
-        try:
-            # Update match result
-            cursor.execute(
-                """
-                UPDATE tournament_matches 
-                SET team1_score = ?, team2_score = ?, notes = ?, completed = 1, completion_date = ?
-                WHERE id = ?
-                """,
-                (score_team1, score_team2, self.notes.value, datetime.datetime.now(), self.match_id)
-            )
-            
-            # Get match and tournament details
-            cursor.execute(
-                """
-                SELECT m.*, t.name as tournament_name, t.id as tournament_id, t.match_type,
-                       team1.team_name as team1_name, team2.team_name as team2_name
-                FROM tournament_matches m
-                JOIN tournaments t ON m.tournament_id = t.id
-                LEFT JOIN tournament_teams team1 ON m.team1_id = team1.id
-                LEFT JOIN tournament_teams team2 ON m.team2_id = team2.id
-                WHERE m.id = ?
-                """,
-                (self.match_id,)
-            )
-            
-            match = cursor.fetchone()
-            
-            if not match:
-                await interaction.response.send_message("Матч не найден!", ephemeral=True)
-                return
-                
-            # Determine winner based on match type
-            winner_id = None
-            match_type = match.get('match_type', 'BO1')
-            
-            # Определяем нужное количество побед в зависимости от типа матча
-            wins_needed = 1  # Default for BO1
-            if match_type == 'BO3':
-                wins_needed = 2
-            elif match_type == 'BO5':
-                wins_needed = 3
-            elif match_type == 'BO7':
-                wins_needed = 4
-            
-            # Проверяем, есть ли победитель
-            if score_team1 >= wins_needed:
-                winner_id = match['team1_id']
-                loser_id = match['team2_id']
-            elif score_team2 >= wins_needed:
-                winner_id = match['team2_id']
-                loser_id = match['team1_id']
-            
-            # If this is a private tournament (1v1), update player stats
-            if match.get('team1_id') is None and match.get('team2_id') is None:
-                # Get player IDs
-                cursor.execute(
-                    "SELECT player1_id, player2_id FROM tournament_matches WHERE id = ?",
-                    (self.match_id,)
-                )
-                player_match = cursor.fetchone()
-                
-                if player_match:
-                    player1_id = player_match['player1_id']
-                    player2_id = player_match['player2_id']
-                    
-                    # Determine winner based on match type for player tournament
-                    match_type = match.get('match_type', 'BO1')
-                    
-                    # Определяем нужное количество побед в зависимости от типа матча
-                    wins_needed = 1  # Default for BO1
-                    if match_type == 'BO3':
-                        wins_needed = 2
-                    elif match_type == 'BO5':
-                        wins_needed = 3
-                    elif match_type == 'BO7':
-                        wins_needed = 4
-                    
-                    # Проверяем, есть ли победитель
-                    if score_team1 >= wins_needed:
-                        winner_id = player1_id
-                        loser_id = player2_id
-                    elif score_team2 >= wins_needed:
-                        winner_id = player2_id
-                        loser_id = player1_id
-                    
-                    # Check if this is a duel tournament (only 2 players) in BO3/BO5/BO7 format
-                    cursor.execute(
-                        """
-                        SELECT t.match_type, COUNT(DISTINCT p.user_id) as player_count,
-                               SUM(CASE WHEN m.player1_id = ? AND m.team1_score > m.team2_score THEN 1 ELSE 0 END) as player1_wins,
-                               SUM(CASE WHEN m.player2_id = ? AND m.team2_score > m.team1_score THEN 1 ELSE 0 END) as player2_wins
-                        FROM tournaments t
-                        JOIN tournament_participants p ON t.id = p.tournament_id
-                        LEFT JOIN tournament_matches m ON t.id = m.tournament_id AND m.completed = 1
-                        WHERE t.id = ? AND t.match_type IN ('BO3', 'BO5', 'BO7')
-                        GROUP BY t.id
-                        """,
-                        (player1_id, player2_id, match['tournament_id'])
-                    )
-                    
-                    tournament_data = cursor.fetchone()
-                    is_duel_tournament = tournament_data and tournament_data['player_count'] == 2
-                    
-                    if is_duel_tournament:
-                        logger.info(f"Duel tournament detected: {match['tournament_id']}, match_type: {tournament_data['match_type']}")
-                        
-                        # Получаем количество побед для каждого игрока
-                        player1_wins = tournament_data['player1_wins'] or 0
-                        player2_wins = tournament_data['player2_wins'] or 0
-                        
-                        logger.info(f"Current score: Player1 ({player1_id}) - {player1_wins} wins, Player2 ({player2_id}) - {player2_wins} wins")
-                        
-                        # Если текущий матч выиграл первый игрок
-                        if score_team1 > score_team2:
-                            player1_wins += 1
-                        # Если текущий матч выиграл второй игрок
-                        elif score_team2 > score_team1:
-                            player2_wins += 1
-                            
-                        logger.info(f"Updated score: Player1 - {player1_wins} wins, Player2 - {player2_wins} wins")
-                        
-                        # Проверяем, достаточно ли побед для завершения дуэли
-                        if player1_wins >= wins_needed:
-                            logger.info(f"Player1 ({player1_id}) has won the duel tournament with {player1_wins} wins")
-                            winner_id = player1_id
-                            loser_id = player2_id
-                        elif player2_wins >= wins_needed:
-                            logger.info(f"Player2 ({player2_id}) has won the duel tournament with {player2_wins} wins")
-                            winner_id = player2_id
-                            loser_id = player1_id
-                    
-                    # Update player stats if there's a winner
-                    if winner_id:
-                        # Update winner stats
-                        cursor.execute(
-                            "UPDATE players SET wins = wins + 1 WHERE user_id = ?",
-                            (winner_id,)
-                        )
-                        
-                        # Update loser stats
-                        cursor.execute(
-                            "UPDATE players SET losses = losses + 1 WHERE user_id = ?",
-                            (loser_id,)
-                        )
-                        
-                        # Если это дуэльный турнир и кто-то выиграл, обновляем статус турнира
-                        if is_duel_tournament and (player1_wins >= wins_needed or player2_wins >= wins_needed):
-                            logger.info(f"Updating tournament {match['tournament_id']} as completed with winner {winner_id}")
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                (winner_id, match['tournament_id'])
-                            )
-                        
-                        # Get tournament type
-                        cursor.execute(
-                            "SELECT type FROM tournaments WHERE id = ?",
-                            (match['tournament_id'],)
-                        )
-                        tournament = cursor.fetchone()
-                        tournament_type = tournament['type'] if tournament else 'private'
-                        
-                        # Update player_stats table
-                        cursor.execute(
-                            "INSERT INTO player_stats (user_id, tournament_id, place, tournament_type) VALUES (?, ?, ?, ?)",
-                            (winner_id, match['tournament_id'], 1, tournament_type)
-                        )
-                        
-                        cursor.execute(
-                            "INSERT INTO player_stats (user_id, tournament_id, place, tournament_type) VALUES (?, ?, ?, ?)",
-                            (loser_id, match['tournament_id'], 2, tournament_type)
-                        )
-                        
-                        # Check for achievements
-                        await self.check_achievements(interaction.client, winner_id, match['tournament_id'], cursor)
-            
-            # Commit changes
-            db.commit()
-            
-            # Create result embed
-            embed = create_match_result_embed(match, score_team1, score_team2)
-            
-            # Send to results channel
-            results_channel = interaction.client.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-            if results_channel:
-                # Получаем информацию о турнире
-                cursor.execute("SELECT * FROM tournaments WHERE id = ?", (match['tournament_id'],))
-                tournament = cursor.fetchone()
-                
-                # Добавляем эмбед с информацией о типе матча
-                match_info = ""
-                if tournament:
-                    match_type = tournament.get('match_type', 'BO1')
-                    if match_type == 'BO1':
-                        match_info = "Одиночный матч"
-                    elif match_type == 'BO3':
-                        match_info = f"Матч до 2 побед ({match_type})"
-                    elif match_type == 'BO5':
-                        match_info = f"Матч до 3 побед ({match_type})"
-                    elif match_type == 'BO7':
-                        match_info = f"Матч до 4 побед ({match_type})"
-                    
-                    # Добавляем информацию о формате матча
-                    embed.add_field(name="Формат матча", value=match_info, inline=False)
-                
-                # Отправляем уведомление о результатах
-                await results_channel.send(embed=embed)
-                
-                # Обновляем и публикуем сетку турнира
-                if tournament:
-                    from utils.brackets import generate_tournament_bracket
-                    success, bracket = generate_tournament_bracket(match['tournament_id'])
-                    
-                    if success:
-                        await results_channel.send(embed=bracket)
-            
-            await interaction.response.send_message("Результаты матча успешно сохранены!", ephemeral=True)
+        # В одиночном матче ничьей нет; в сериях равный счет означает сыгранные игры, а не итог
+        if self.match_type not in SERIES_MATCH_TYPES and score_team1 == score_team2:
+            await interaction.response.send_message("Ничья невозможна: у матча должен быть победитель!", ephemeral=True)
+            return
             
+        # Сохранение результата, достижения и сетка обрабатываются в фоновой задаче,
+        # результаты одного турнира записываются по очереди
+        await jobs.run(
+            interaction,
+            f"Результат матча #{self.match_id}",
+            lambda job: self.save_result(job, score_team1, score_team2)
+        )
+    
+    async def save_result(self, job: Job, score_team1: int, score_team2: int):
+        """Store the match result and award achievements; runs as a job after the modal is acknowledged."""
+        try:
+            # Блокировка турнира держится только на время транзакции
+            async with tournament_locks.hold(self.tournament_id):
+                async with db.transaction() as tx:
+                    reply = await self.record_result(tx, score_team1, score_team2)
+            # Ответ модератору уходит после фиксации и снятия блокировки, они не ждут Discord
+            await job.send(reply, ephemeral=True)
+            
+        except SeriesError as e:
+            await job.send(str(e), ephemeral=True)
         except Exception as e:
             logger.error(f"Error setting match result: {e}")
-            db.rollback()
-            await interaction.response.send_message("Произошла ошибка при сохранении результатов.", ephemeral=True)
+            job.error = str(e)
+            await job.send("Произошла ошибка при сохранении результатов.", ephemeral=True)
     
-    async def check_achievements(self, bot, user_id, tournament_id, cursor):
-        """Check if player earned any achievements and award them if needed."""
-        # Check for revolver tournament wins ("Король ревиков")
-        cursor.execute(
+    async def record_result(self, tx, score_team1: int, score_team2: int) -> str:
+        """Store the match result in the transaction and return the reply for the moderator."""
+        # Get match and tournament details
+        row = await tx.fetchone(
             """
-            SELECT COUNT(*) as wins FROM player_stats ps
-            JOIN tournaments t ON ps.tournament_id = t.id
-            WHERE ps.user_id = ? AND ps.place = 1
-            AND (t.weapon_type LIKE '%револьвер%' OR t.weapon_type LIKE '%revolver%')
+            SELECT m.*, t.name as tournament_name, t.id as tournament_id, t.match_type,
+                   team1.team_name as team1_name, team2.team_name as team2_name
+            FROM tournament_matches m
+            JOIN tournaments t ON m.tournament_id = t.id
+            LEFT JOIN tournament_teams team1 ON m.team1_id = team1.id
+            LEFT JOIN tournament_teams team2 ON m.team2_id = team2.id
+            WHERE m.id = ?
             """,
-            (user_id,)
+            (self.match_id,)
         )
+    
+        if not row:
+            return "Матч не найден!"
+        match = Match.from_row(row)
         
-        revolver_wins = cursor.fetchone()['wins']
+        if match.completed:
+            return "Этот матч уже завершен!"
         
-        if revolver_wins >= 3:
-            # Check if already has achievement
-            cursor.execute(
-                "SELECT COUNT(*) FROM player_achievements WHERE user_id = ? AND achievement_id = 1",
-                (user_id,)
-            )
-            
-            if cursor.fetchone()[0] == 0:
-                # Award achievement
-                cursor.execute(
-                    "INSERT INTO player_achievements (user_id, achievement_id, earned_date) VALUES (?, 1, ?)",
-                    (user_id, datetime.datetime.now())
-                )
-                
-                # Notify player
-                try:
-                    user = await bot.fetch_user(user_id)
-                    embed = discord.Embed(
-                        title="🏆 Достижение разблокировано!",
-                        description="Вы получили достижение **Король ревиков**!",
-                        color=0xF1C40F  # Gold
-                    )
-                    embed.add_field(name="Описание", value="Выиграйте 3 турнира с револьверами")
-                    
-                    await user.send(embed=embed)
-                except:
-                    logger.error(f"Could not send achievement notification to user {user_id}")
-        
-        # Check for sniper tournament win
-        cursor.execute(
+        # В форматах BO3/BO5/BO7 счет прибавляется к серии, матч завершается, когда одна из сторон набрала нужные победы
+        if match.match_type in SERIES_MATCH_TYPES:
+            series = await record_games(tx, self.match_id, match.tournament_id, match.match_type, score_team1, score_team2)
+            if not series.clinched:
+                await self.announce_series(tx, match, series)
+                return f"Игры записаны. Счет серии: {series.score} (до {series.wins_needed} побед)."
+            score_team1, score_team2 = series.wins1, series.wins2
+        elif score_team1 == score_team2:
+            return "Ничья невозможна: у матча должен быть победитель!"
+        
+        # Update match result
+        await tx.execute(
             """
-            SELECT COUNT(*) as wins FROM player_stats ps
-            JOIN tournaments t ON ps.tournament_id = t.id
-            WHERE ps.user_id = ? AND ps.place = 1
-            AND (t.weapon_type LIKE '%снайпер%' OR t.weapon_type LIKE '%sniper%')
+            UPDATE tournament_matches 
+            SET team1_score = ?, team2_score = ?, notes = ?, completed = 1, completion_date = ?
+            WHERE id = ?
             """,
-            (user_id,)
+            (score_team1, score_team2, self.notes.value, datetime.datetime.now(), self.match_id)
         )
+        match.team1_score, match.team2_score, match.completed = score_team1, score_team2, 1
         
-        sniper_wins = cursor.fetchone()['wins']
+        # Победитель определяется один раз: по нему начисляется статистика, продвигается сетка и строится объявление
+        winner_id = decided_winner(match)
         
-        if sniper_wins >= 1:
-            # Check if already has achievement
-            cursor.execute(
-                "SELECT COUNT(*) FROM player_achievements WHERE user_id = ? AND achievement_id = 2",
-                (user_id,)
+        # If this is a private tournament (1v1), update player stats
+        if not match.is_team_match and winner_id is not None and match.player1_id is not None and match.player2_id is not None:
+            loser_id = match.player2_id if winner_id == match.player1_id else match.player1_id
+            await record_match_stats(tx, match.tournament_id, winner_id, loser_id)
+        
+        # Победитель сразу занимает свой слот в следующем матче сетки
+        next_match_id = None
+        bracket = await brackets.load(match.tournament_id, tx=tx, for_update=True)
+        if bracket is not None and bracket.node_of(self.match_id) is not None and winner_id is not None:
+            node = await match_log.append(
+                tx, bracket, RESULT_SET, match_id=self.match_id,
+                winner=winner_id, score1=score_team1, score2=score_team2
             )
-            
-            if cursor.fetchone()[0] == 0:
-                # Award achievement
-                cursor.execute(
-                    "INSERT INTO player_achievements (user_id, achievement_id, earned_date) VALUES (?, 2, ?)",
-                    (user_id, datetime.datetime.now())
-                )
-                
-                # Notify player
-                try:
-                    user = await bot.fetch_user(user_id)
-                    embed = discord.Embed(
-                        title="🏆 Достижение разблокировано!",
-                        description="Вы получили достижение **Снайпер-легенда**!",
-                        color=0xF1C40F  # Gold
-                    )
-                    embed.add_field(name="Описание", value="Выиграйте снайперский турнир")
-                    
-                    await user.send(embed=embed)
-                except:
-                    logger.error(f"Could not send achievement notification to user {user_id}")
-        
-        # Check for consecutive wins
-        cursor.execute(
-            """
-            SELECT tournament_id, place
-            FROM player_stats
-            WHERE user_id = ?
-            ORDER BY tournament_id DESC
-            LIMIT 5
-            """,
-            (user_id,)
+            if BRACKET_PROGRESSION == 'auto':
+                next_match_id = await advance_bracket(tx, bracket, node)
+            await brackets.save(tx, bracket)
+        
+        # Create result embed
+        embed = create_match_result_embed(match, score_team1, score_team2, winner_id)
+        
+        # Добавляем эмбед с информацией о типе матча
+        if match.match_type in SERIES_MATCH_TYPES:
+            match_info = f"Матч до {match.wins_needed} побед ({match.match_type})"
+        else:
+            match_info = "Одиночный матч"
+        embed.add_field(name="Формат матча", value=match_info, inline=False)
+        
+        # Уведомление о результатах уходит через outbox вместе с результатом матча
+        await outbox.send(
+            tx,
+            TOURNAMENT_RESULTS_CHANNEL,
+            embeds=[embed],
+            dedup_key=f"match-result:{self.match_id}:{score_team1}:{score_team2}"
         )
         
-        results = cursor.fetchall()
-        consecutive_wins = 0
+        # Сетка турнира обновляется в том же сообщении
+        await publish_bracket(match.tournament_id, tx=tx)
         
-        for result in results:
-            if result['place'] == 1:
-                consecutive_wins += 1
-            else:
-                break
-                
-        if consecutive_wins >= 5:
-            # Check if already has achievement
-            cursor.execute(
-                "SELECT COUNT(*) FROM player_achievements WHERE user_id = ? AND achievement_id = 3",
-                (user_id,)
-            )
-            
-            if cursor.fetchone()[0] == 0:
-                # Award achievement
-                cursor.execute(
-                    "INSERT INTO player_achievements (user_id, achievement_id, earned_date) VALUES (?, 3, ?)",
-                    (user_id, datetime.datetime.now())
-                )
-                
-                # Notify player
-                try:
-                    user = await bot.fetch_user(user_id)
-                    embed = discord.Embed(
-                        title="🏆 Достижение разблокировано!",
-                        description="Вы получили достижение **Турнирный зверь**!",
-                        color=0xF1C40F  # Gold
-                    )
-                    embed.add_field(name="Описание", value="Выиграйте 5 турниров подряд")
-                    
-                    await user.send(embed=embed)
-                except:
-                    logger.error(f"Could not send achievement notification to user {user_id}")
+        if next_match_id:
+            return f"Результаты матча успешно сохранены! Создан следующий матч #{next_match_id}."
+        return "Результаты матча успешно сохранены!"
+    
+    async def announce_series(self, tx, match: Match, series):
+        """Queue the running score of a series that is not decided yet."""
+        if match.is_team_match:
+            side1, side2 = match.team1_name or '?', match.team2_name or '?'
+        else:
+            side1, side2 = f"<@{match.player1_id}>", f"<@{match.player2_id}>"
+        
+        embed = discord.Embed(
+            title=f"Серия {match.match_type}: {match.tournament_name}",
+            description=f"Матч #{match.id}: {side1} **{series.wins1}** - **{series.wins2}** {side2}",
+            color=0x3498DB  # Blue
+        )
+        embed.add_field(name="До победы", value=f"{series.wins_needed} побед", inline=False)
+        await outbox.send(tx, TOURNAMENT_RESULTS_CHANNEL, embeds=[embed], dedup_key=f"series:{match.id}:{series.games}:{series.score}")
 
 
 class TournamentRescheduleModal(discord.ui.Modal):
@@ -487,24 +524,23 @@ class TournamentRescheduleModal(discord.ui.Modal):
         self.tournament_id = tournament_id
         
     async def on_submit(self, interaction: discord.Interaction):
-        # Сначала отложим ответ на взаимодействие
-        await interaction.response.defer(ephemeral=True)
-        
         # Verify permissions
         if not await is_tournament_manager(interaction) and not await is_admin(interaction):
-            await interaction.followup.send("У вас нет прав для этого действия!", ephemeral=True)
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
             return
         
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
+        # Рассылка уведомлений может занять время, поэтому работа идет в фоновой задаче
+        await jobs.run(interaction, f"Перенос турнира #{self.tournament_id}", self.reschedule_tournament)
+    
+    async def reschedule_tournament(self, job: Job):
+        """Move the tournament and notify participants; runs as a job after the modal is acknowledged."""
+        interaction = job.interaction
         try:
             # Parse new date
             try:
                 parsed_date = datetime.datetime.strptime(self.new_date.value, "%d.%m.%Y %H:%M")
             except ValueError:
-                await interaction.followup.send(
+                await job.send(
                     "Некорректный формат даты. Используйте формат ДД.ММ.ГГГГ ЧЧ:ММ (например: 20.05.2025 21:00)", 
                     ephemeral=True
                 )
@@ -512,15 +548,14 @@ class TournamentRescheduleModal(discord.ui.Modal):
                 
             # Check if date is in the future
             if parsed_date <= datetime.datetime.now():
-                await interaction.followup.send("Дата турнира должна быть в будущем.", ephemeral=True)
+                await job.send("Дата турнира должна быть в будущем.", ephemeral=True)
                 return
             
             # Check if tournament exists
-            cursor.execute("SELECT * FROM tournaments WHERE id = ?", (self.tournament_id,))
-            tournament = cursor.fetchone()
+            tournament = await db.fetchone("SELECT * FROM tournaments WHERE id = ?", (self.tournament_id,))
             
             if not tournament:
-                await interaction.followup.send(f"Турнир с ID {self.tournament_id} не найден!", ephemeral=True)
+                await job.send(f"Турнир с ID {self.tournament_id} не найден!", ephemeral=True)
                 return
             
             # Store old date for notification
@@ -531,22 +566,6 @@ class TournamentRescheduleModal(discord.ui.Modal):
                 else:
                     old_date = tournament['tournament_date'].strftime("%d.%m.%Y, %H:%M")
             
-            # Update tournament date
-            cursor.execute(
-                "UPDATE tournaments SET tournament_date = ? WHERE id = ?",
-                (parsed_date.strftime('%Y-%m-%d %H:%M:%S'), self.tournament_id)
-            )
-            
-            db.commit()
-            
-            # Get participants to notify them
-            cursor.execute(
-                "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
-                (self.tournament_id,)
-            )
-            
-            participants = cursor.fetchall()
-            
             # Create notification embed
             embed = discord.Embed(
                 title=f"Турнир перенесен: {tournament['name']}",
@@ -563,33 +582,50 @@ class TournamentRescheduleModal(discord.ui.Modal):
             embed.add_field(name="Причина", value=self.reason.value, inline=False)
             embed.add_field(name="Действие выполнено", value=f"<@{interaction.user.id}>", inline=False)
             
-            # Notify participants via DM
-            participant_mentions = ""
-            for participant in participants:
-                try:
-                    user = await interaction.client.fetch_user(participant['user_id'])
-                    if user:
-                        participant_mentions += f"<@{participant['user_id']}> "
-                        await user.send(embed=embed)
-                except Exception as e:
-                    logger.error(f"Could not send DM to user {participant['user_id']}: {e}")
-            
             # Send notification to the appropriate channel based on tournament type
             if tournament['type'] == 'private':
                 channel_id = PRIVATE_TOURNAMENTS_CHANNEL
             else:
                 channel_id = PUBLIC_TOURNAMENTS_CHANNEL
+            
+            # Новая дата и объявление о переносе фиксируются вместе
+            new_date = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
+            async with db.transaction() as tx:
+                # Update tournament date
+                await tx.execute(
+                    "UPDATE tournaments SET tournament_date = ? WHERE id = ?",
+                    (new_date, self.tournament_id)
+                )
+                
+                # Get participants to notify them
+                participants = await tx.fetchall(
+                    "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
+                    (self.tournament_id,)
+                )
+                user_ids = [participant['user_id'] for participant in participants]
+                participant_mentions = " ".join(f"<@{user_id}>" for user_id in user_ids)
                 
-            channel = interaction.client.get_channel(channel_id)
-            if channel:
-                await channel.send(content=f"**ВНИМАНИЕ! ТУРНИР ПЕРЕНЕСЕН!** {participant_mentions}", embed=embed)
+                await outbox.send(
+                    tx,
+                    channel_id,
+                    content=f"**ВНИМАНИЕ! ТУРНИР ПЕРЕНЕСЕН!** {participant_mentions}",
+                    embeds=[embed],
+                    dedup_key=f"tournament-reschedule:{self.tournament_id}:{new_date}",
+                    priority=HIGH
+                )
+            await scheduler.refresh(self.tournament_id)
+            
+            await job.update(f"Дата изменена, уведомление {len(participants)} участников")
+            
+            # Notify participants via DM
+            result = await fanout.send(interaction.client, user_ids, f"tournament-reschedule:{self.tournament_id}", embed=embed)
             
-            await interaction.followup.send("Турнир успешно перенесен на новую дату! Участники уведомлены.", ephemeral=True)
+            await job.send(f"Турнир успешно перенесен на новую дату! Участники уведомлены.\n{result.summary()}", ephemeral=True)
             
         except Exception as e:
             logger.error(f"Error rescheduling tournament: {e}")
-            db.rollback()
-            await interaction.followup.send("Произошла ошибка при переносе турнира.", ephemeral=True)
+            job.error = str(e)
+            await job.send("Произошла ошибка при переносе турнира.", ephemeral=True)
 
 
 class TournamentCancelModal(discord.ui.Modal):
@@ -606,46 +642,30 @@ class TournamentCancelModal(discord.ui.Modal):
         self.tournament_id = tournament_id
         
     async def on_submit(self, interaction: discord.Interaction):
-        # Сначала отложим ответ на взаимодействие
-        await interaction.response.defer(ephemeral=True)
-        
         # Verify permissions
         if not await is_tournament_manager(interaction) and not await is_admin(interaction):
-            await interaction.followup.send("У вас нет прав для этого действия!", ephemeral=True)
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
             return
         
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
+        # Рассылка уведомлений может занять время, поэтому работа идет в фоновой задаче
+        await jobs.run(interaction, f"Отмена турнира #{self.tournament_id}", self.cancel_tournament)
+    
+    async def cancel_tournament(self, job: Job):
+        """Cancel the tournament and notify participants; runs as a job after the modal is acknowledged."""
+        interaction = job.interaction
         try:
             # Check if tournament exists
-            cursor.execute("SELECT * FROM tournaments WHERE id = ?", (self.tournament_id,))
-            tournament = cursor.fetchone()
+            tournament = await db.fetchone("SELECT * FROM tournaments WHERE id = ?", (self.tournament_id,))
             
             if not tournament:
-                await interaction.followup.send(f"Турнир с ID {self.tournament_id} не найден!", ephemeral=True)
+                await job.send(f"Турнир с ID {self.tournament_id} не найден!", ephemeral=True)
                 return
             
             # Проверяем, что турнир не завершен
             if tournament['status'] == 'completed':
-                await interaction.followup.send("Нельзя отменить завершенный турнир!", ephemeral=True)
+                await job.send("Нельзя отменить завершенный турнир!", ephemeral=True)
                 return
             
-            # Меняем статус турнира на 'cancelled'
-            cursor.execute(
-                "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
-                (self.reason.value, self.tournament_id)
-            )
-            
-            # Получаем список участников для уведомления
-            cursor.execute(
-                "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
-                (self.tournament_id,)
-            )
-            
-            participants = cursor.fetchall()
-            
             # Создаем эмбед с уведомлением об отмене
             embed = discord.Embed(
                 title=f"Турнир отменен: {tournament['name']}",
@@ -667,40 +687,54 @@ class TournamentCancelModal(discord.ui.Modal):
             embed.add_field(name="Причина отмены", value=self.reason.value, inline=False)
             embed.add_field(name="Действие выполнено", value=f"<@{interaction.user.id}>", inline=False)
             
-            # Уведомляем участников через DM
-            participant_mentions = ""
-            for participant in participants:
-                try:
-                    user = await interaction.client.fetch_user(participant['user_id'])
-                    if user:
-                        participant_mentions += f"<@{participant['user_id']}> "
-                        await user.send(embed=embed)
-                except Exception as e:
-                    logger.error(f"Could not send DM to user {participant['user_id']}: {e}")
-            
             # Отправляем уведомление в соответствующий канал
             if tournament['type'] == 'private':
                 channel_id = PRIVATE_TOURNAMENTS_CHANNEL
             else:
                 channel_id = PUBLIC_TOURNAMENTS_CHANNEL
+            
+            # Статус и объявление об отмене фиксируются вместе
+            async with db.transaction() as tx:
+                # Меняем статус турнира на 'cancelled'
+                await tx.execute(
+                    "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
+                    (self.reason.value, self.tournament_id)
+                )
+                
+                # Получаем список участников для уведомления
+                participants = await tx.fetchall(
+                    "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
+                    (self.tournament_id,)
+                )
+                user_ids = [participant['user_id'] for participant in participants]
+                participant_mentions = " ".join(f"<@{user_id}>" for user_id in user_ids)
                 
-            channel = interaction.client.get_channel(channel_id)
-            if channel:
-                await channel.send(content=f"**ВНИМАНИЕ! ТУРНИР ОТМЕНЕН!** {participant_mentions}", embed=embed)
+                await outbox.send(
+                    tx,
+                    channel_id,
+                    content=f"**ВНИМАНИЕ! ТУРНИР ОТМЕНЕН!** {participant_mentions}",
+                    embeds=[embed],
+                    dedup_key=f"tournament-cancel:{self.tournament_id}",
+                    priority=HIGH
+                )
+            await scheduler.refresh(self.tournament_id)
+            
+            await job.update(f"Турнир отменен, уведомление {len(participants)} участников")
+            
+            # Уведомляем участников через DM
+            result = await fanout.send(interaction.client, user_ids, f"tournament-cancel:{self.tournament_id}", embed=embed)
             
-            db.commit()
-            await interaction.followup.send("Турнир успешно отменен. Участники уведомлены.", ephemeral=True)
+            await job.send(f"Турнир успешно отменен. Участники уведомлены.\n{result.summary()}", ephemeral=True)
             
         except Exception as e:
             logger.error(f"Error cancelling tournament: {e}")
-            db.rollback()
-            await interaction.followup.send("Произошла ошибка при отмене турнира.", ephemeral=True)
+            job.error = str(e)
+            await job.send("Произошла ошибка при отмене турнира.", ephemeral=True)
 
 
 class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.processed_interactions = set()
     
     @app_commands.command(
         name="tournament-cancel",
@@ -715,13 +749,8 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         # Check if tournament exists
-        cursor.execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
-        tournament = cursor.fetchone()
+        tournament = await db.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
         
         if not tournament:
             await interaction.response.send_message(f"Турнир с ID {tournament_id} не найден!", ephemeral=True)
@@ -753,13 +782,8 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         # Check if tournament exists
-        cursor.execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
-        tournament = cursor.fetchone()
+        tournament = await db.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
         
         if not tournament:
             await interaction.response.send_message(f"Турнир с ID {tournament_id} не найден!", ephemeral=True)
@@ -774,6 +798,93 @@ class Moderation(commands.Cog):
         modal = TournamentRescheduleModal(tournament_id)
         await interaction.response.send_modal(modal)
     
+    @app_commands.command(
+        name="tournament-seeding",
+        description="Выбрать способ посева участников турнира"
+    )
+    @app_commands.describe(
+        tournament_id="ID турнира",
+        method="Способ посева",
+        order="Для ручного посева: участники (упоминания или ID) или ID команд через пробел, начиная с первого номера"
+    )
+    @app_commands.choices(method=[
+        app_commands.Choice(name=label, value=method) for method, label in SEEDING_METHODS.items()
+    ])
+    async def tournament_seeding(
+        self, 
+        interaction: discord.Interaction, 
+        tournament_id: int, 
+        method: app_commands.Choice[str], 
+        order: Optional[str] = None
+    ):
+        # Verify permissions
+        if not await is_tournament_manager(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+            return
+        
+        tournament = await db.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
+        if not tournament:
+            await interaction.response.send_message(f"Турнир с ID {tournament_id} не найден!", ephemeral=True)
+            return
+        
+        # Посев влияет только на первый раунд
+        if tournament['started']:
+            await interaction.response.send_message("Турнир уже начался, посев изменить нельзя!", ephemeral=True)
+            return
+        
+        entrant_ids = [int(entrant_id) for entrant_id in re.findall(r'\d+', order or '')]
+        if method.value == MANUAL and not entrant_ids:
+            await interaction.response.send_message(
+                "Для ручного посева укажите участников в порядке номеров посева.", 
+                ephemeral=True
+            )
+            return
+        
+        try:
+            async with tournament_locks.hold(tournament_id):
+                async with db.transaction() as tx:
+                    # Старт мог пройти, пока ждали блокировку
+                    tournament = await tx.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
+                    started = tournament['started']
+                    if not started:
+                        if method.value == MANUAL:
+                            seeded = await set_manual_seeds(tx, tournament_id, entrant_ids, tournament['type'] == 'public')
+                        else:
+                            await tx.execute("UPDATE tournaments SET seeding = ? WHERE id = ?", (method.value, tournament_id))
+                            seeded = None
+                        # Предпросмотр верхних номеров (при случайном посеве порядок определится при старте)
+                        seeded_tournament = Tournament.from_row(tournament)
+                        seeded_tournament.seeding = method.value
+                        preview = await seed_entrants(tx, seeded_tournament)
+            
+            if started:
+                await interaction.response.send_message("Турнир уже начался, посев изменить нельзя!", ephemeral=True)
+                return
+            
+            embed = discord.Embed(
+                title=f"Посев турнира #{tournament_id}",
+                description=f"Способ посева: {method.name}",
+                color=0x3498DB  # Blue
+            )
+            if seeded is not None and seeded < len(entrant_ids):
+                embed.add_field(
+                    name="Пропущено", 
+                    value=f"{len(entrant_ids) - seeded} из указанных не зарегистрированы в турнире", 
+                    inline=False
+                )
+            if method.value != RANDOM and preview:
+                if tournament['type'] == 'public':
+                    top = [f"{seed}. Команда #{entrant_id}" for seed, entrant_id in enumerate(preview[:16], 1)]
+                else:
+                    top = [f"{seed}. <@{entrant_id}>" for seed, entrant_id in enumerate(preview[:16], 1)]
+                embed.add_field(name=f"Первые номера (всего {len(preview)})", value="\n".join(top), inline=False)
+            
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            logger.error(f"Error setting tournament seeding: {e}")
+            await interaction.response.send_message("Произошла ошибка при настройке посева.", ephemeral=True)
+    
     @app_commands.command(
         name="tournament-set-result",
         description="Установить результат матча"
@@ -787,13 +898,16 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         # Check if match exists
-        cursor.execute("SELECT * FROM tournament_matches WHERE id = ?", (match_id,))
-        match = cursor.fetchone()
+        match = await db.fetchone(
+            """
+            SELECT m.*, t.match_type, t.name as tournament_name
+            FROM tournament_matches m
+            JOIN tournaments t ON m.tournament_id = t.id
+            WHERE m.id = ?
+            """,
+            (match_id,)
+        )
         
         if not match:
             await interaction.response.send_message(f"Матч с ID {match_id} не найден!", ephemeral=True)
@@ -804,9 +918,110 @@ class Moderation(commands.Cog):
             return
             
         # Show modal for entering results
-        modal = TournamentResultModal(match_id)
+        modal = TournamentResultModal(match_id, match['match_type'], match['tournament_name'], match['tournament_id'])
         await interaction.response.send_modal(modal)
     
+    @app_commands.command(
+        name="tournament-walkover",
+        description="Присудить техническую победу в матче"
+    )
+    @app_commands.describe(
+        match_id="ID матча",
+        winner="Сторона, получающая техническую победу"
+    )
+    @app_commands.choices(winner=[
+        app_commands.Choice(name="Сторона 1", value=1),
+        app_commands.Choice(name="Сторона 2", value=2)
+    ])
+    async def tournament_walkover(self, interaction: discord.Interaction, match_id: int, winner: app_commands.Choice[int]):
+        # Verify permissions
+        if not await is_tournament_manager(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+            return
+        
+        match = await db.fetchone("SELECT tournament_id FROM tournament_matches WHERE id = ?", (match_id,))
+        if not match:
+            await interaction.response.send_message(f"Матч с ID {match_id} не найден!", ephemeral=True)
+            return
+        
+        await jobs.run(
+            interaction,
+            f"Техническая победа в матче #{match_id}",
+            lambda job: self.award_walkover(job, match['tournament_id'], match_id, winner.value)
+        )
+    
+    async def award_walkover(self, job: Job, tournament_id: int, match_id: int, side: int):
+        """Complete a match without a game in favour of `side` (1 or 2) and advance the bracket."""
+        try:
+            async with tournament_locks.hold(tournament_id):
+                async with db.transaction() as tx:
+                    reply = await self.record_walkover(tx, match_id, side)
+            await job.send(reply, ephemeral=True)
+            
+        except Exception as e:
+            logger.error(f"Error awarding walkover: {e}")
+            job.error = str(e)
+            await job.send("Произошла ошибка при присуждении технической победы.", ephemeral=True)
+    
+    async def record_walkover(self, tx, match_id: int, side: int) -> str:
+        """Store the walkover in the transaction and return the reply for the moderator."""
+        row = await tx.fetchone(
+            """
+            SELECT m.*, t.match_type, team1.team_name as team1_name, team2.team_name as team2_name
+            FROM tournament_matches m
+            JOIN tournaments t ON m.tournament_id = t.id
+            LEFT JOIN tournament_teams team1 ON m.team1_id = team1.id
+            LEFT JOIN tournament_teams team2 ON m.team2_id = team2.id
+            WHERE m.id = ?
+            """,
+            (match_id,)
+        )
+        if not row:
+            return f"Матч с ID {match_id} не найден!"
+        match = Match.from_row(row)
+        
+        if match.completed:
+            return "Этот матч уже завершен!"
+        
+        # Технический счет: победитель получает все нужные победы серии, сыгранные игры не учитываются
+        winner_id = match.side1_id if side == 1 else match.side2_id
+        loser_id = match.side2_id if side == 1 else match.side1_id
+        score_team1, score_team2 = (match.wins_needed, 0) if side == 1 else (0, match.wins_needed)
+        await reset_series(tx, match_id)
+        await tx.execute(
+            """
+            UPDATE tournament_matches 
+            SET team1_score = ?, team2_score = ?, notes = ?, completed = 1, completion_date = ?
+            WHERE id = ?
+            """,
+            (score_team1, score_team2, "Техническая победа", datetime.datetime.now(), match_id)
+        )
+        match.team1_score, match.team2_score, match.completed = score_team1, score_team2, 1
+        
+        # Техническая победа засчитывается как обычная, отмена результата возвращает статистику
+        if not match.is_team_match and winner_id is not None and loser_id is not None:
+            await record_match_stats(tx, match.tournament_id, winner_id, loser_id)
+        
+        next_match_id = None
+        bracket = await brackets.load(match.tournament_id, tx=tx, for_update=True)
+        if bracket is not None and bracket.node_of(match_id) is not None:
+            node = await match_log.append(
+                tx, bracket, WALKOVER, match_id=match_id,
+                winner=winner_id, score1=score_team1, score2=score_team2
+            )
+            if BRACKET_PROGRESSION == 'auto':
+                next_match_id = await advance_bracket(tx, bracket, node)
+            await brackets.save(tx, bracket)
+        
+        embed = create_match_result_embed(match, score_team1, score_team2, winner_id)
+        embed.add_field(name="Техническая победа", value=f"Сторона {side}", inline=False)
+        await outbox.send(tx, TOURNAMENT_RESULTS_CHANNEL, embeds=[embed], dedup_key=f"match-walkover:{match_id}:{side}")
+        await publish_bracket(match.tournament_id, tx=tx)
+        
+        if next_match_id:
+            return f"Техническая победа присуждена! Создан следующий матч #{next_match_id}."
+        return "Техническая победа присуждена!"
+    
     @app_commands.command(
         name="tournament-penalty",
         description="Выдать штраф игроку или команде"
@@ -832,13 +1047,9 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("Количество штрафных очков должно быть положительным числом!", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Record penalty
-            cursor.execute(
+            await db.execute(
                 """
                 INSERT INTO player_penalties (user_id, points, reason, issued_by, issue_date)
                 VALUES (?, ?, ?, ?, ?)
@@ -846,8 +1057,6 @@ class Moderation(commands.Cog):
                 (user.id, points, reason, interaction.user.id, datetime.datetime.now())
             )
             
-            db.commit()
-            
             # Create penalty embed
             embed = discord.Embed(
                 title="⚠️ Штраф выдан",
@@ -863,7 +1072,6 @@ class Moderation(commands.Cog):
             
         except Exception as e:
             logger.error(f"Error issuing penalty: {e}")
-            db.rollback()
             await interaction.response.send_message("Произошла ошибка при выдаче штрафа.", ephemeral=True)
     
     @app_commands.command(
@@ -875,1177 +1083,218 @@ class Moderation(commands.Cog):
     )
     async def tournament_next_match(self, interaction: discord.Interaction, tournament_id: int):
         """Создает матчи следующего раунда турнира."""
-        # Проверяем, не обрабатывали ли мы уже это взаимодействие
+        # Проверяем права пользователя до того, как занять запись о взаимодействии
+        if not await is_tournament_manager(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+            return
+        
+        # Помечаем взаимодействие как обработанное, повторная доставка пропускается
         interaction_id = str(interaction.id)
-        if interaction_id in self.processed_interactions:
+        if not await interaction_dedup.claim(interaction_id):
             logger.warning(f"Skipping duplicate next match interaction {interaction_id}")
             await interaction.response.send_message("Это действие уже выполняется", ephemeral=True)
             return
             
-        # Помечаем взаимодействие как обработанное
-        self.processed_interactions.add(interaction_id)
         logger.info(f"Processing next match request for tournament {tournament_id}, interaction ID: {interaction_id}")
         
-        # Проверяем права пользователя
-        if not await is_tournament_manager(interaction):
-            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
-            return
-            
-        # Подключаемся к базе данных
-        db = get_db()
-        cursor = db.cursor()
-        
+        # Подтверждаем команду сразу, сам раунд создается в фоновой задаче
+        await jobs.run(
+            interaction,
+            f"Следующий раунд турнира #{tournament_id}",
+            lambda job: self.create_next_round(job, tournament_id)
+        )
+    
+    async def create_next_round(self, job: Job, tournament_id: int):
+        """Create the matches that became playable in the bracket; runs as a job after the command is acknowledged."""
         try:
-            # Проверяем, существует ли турнир
-            cursor.execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
-            tournament = cursor.fetchone()
-            
-            if not tournament:
-                await interaction.response.send_message(f"Турнир с ID {tournament_id} не найден!", ephemeral=True)
-                return
-                
-            # Проверяем, завершен ли уже турнир
-            if tournament['status'] == 'completed':
-                logger.info(f"Tournament {tournament_id} is already completed, cannot create next match")
-                await interaction.response.send_message(
-                    "Турнир уже завершен и имеет победителя. Создание новых матчей невозможно.", 
-                    ephemeral=True
-                )
-                return
-                
-            # Проверяем, есть ли незавершенные матчи
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ? AND completed = 0",
-                (tournament_id,)
-            )
-            
-            uncompleted_count = cursor.fetchone()['count']
-            if uncompleted_count > 0:
-                await interaction.response.send_message(
-                    "Есть незавершенные матчи в текущем раунде. Пожалуйста, завершите их перед переходом к следующему раунду.", 
-                    ephemeral=True
-                )
+            async with tournament_locks.hold(tournament_id):
+                async with db.transaction() as tx:
+                    notice, tournament, new_matches = await self.open_round(tx, tournament_id)
+            # Сообщения модератору отправляются после фиксации транзакции и снятия блокировки
+            if notice:
+                await job.send(notice, ephemeral=True)
                 return
-                
-            # Определяем текущий раунд
-            cursor.execute(
-                "SELECT MAX(round) as current_round FROM tournament_matches WHERE tournament_id = ?",
-                (tournament_id,)
-            )
-            
-            current_round = cursor.fetchone()['current_round'] or 0
-            next_round = current_round + 1
-            
-            # Определяем тип матча и необходимое количество побед
-            match_type = tournament.get('match_type', 'BO1')
-            wins_needed = 1  # По умолчанию для BO1
-            if match_type == 'BO3':
-                wins_needed = 2
-            elif match_type == 'BO5':
-                wins_needed = 3
-            elif match_type == 'BO7':
-                wins_needed = 4
-            
-            # Определяем победителей текущего раунда
-            winners = []
-            
-            # Проверяем, является ли это дуэльным турниром с форматом BO3/BO5/BO7
-            is_duel_tournament = False
-            
-            # Определяем количество участников
-            if tournament['type'] == 'private':
-                cursor.execute(
-                    "SELECT COUNT(DISTINCT user_id) as count FROM tournament_participants WHERE tournament_id = ?",
-                    (tournament_id,)
-                )
-                participant_count = cursor.fetchone()['count']
-            else:
-                cursor.execute(
-                    "SELECT COUNT(DISTINCT id) as count FROM tournament_teams WHERE tournament_id = ?",
-                    (tournament_id,)
-                )
-                participant_count = cursor.fetchone()['count']
-                
-            is_duel_tournament = participant_count == 2
             
-            logger.info(f"Tournament {tournament_id} has {participant_count} participants, is_duel_tournament={is_duel_tournament}")
-            
-            # Если это первый раунд (current_round = 0), то создаем начальные матчи
-            if current_round == 0:
-                # Создание первого раунда матчей
-                if tournament['type'] == 'private':
-                    # Получаем список участников
-                    cursor.execute(
-                        "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
-                        (tournament_id,)
-                    )
-                    
-                    participants = [p['user_id'] for p in cursor.fetchall()]
-                    
-                    if len(participants) < 2:
-                        await interaction.response.send_message("Недостаточно участников для начала турнира.", ephemeral=True)
-                        return
-                    
-                    # Особый случай для дуэльных турниров (только 2 игрока) в формате BO3/BO5/BO7
-                    if len(participants) == 2 and match_type in ['BO3', 'BO5', 'BO7']:
-                        logger.info(f"Creating duel tournament with match type {match_type} for participants {participants}")
-                        
-                        matches_to_create = 1  # По умолчанию создаем 1 матч (для BO1)
-                        
-                        if match_type == 'BO3':
-                            matches_to_create = 3
-                        elif match_type == 'BO5':
-                            matches_to_create = 5
-                        elif match_type == 'BO7':
-                            matches_to_create = 7
-                        
-                        # Создаем необходимое количество матчей между одними и теми же игроками
-                        for i in range(matches_to_create):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, player1_id, player2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    1,  # Все матчи в 1 раунде для BO3/BO5/BO7 дуэлей
-                                    participants[0], 
-                                    participants[1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        
-                        logger.info(f"Created {matches_to_create} matches for duel tournament {tournament_id}")
-                    else:
-                        # Стандартное создание матчей для турнира
-                        for i in range(0, len(participants), 2):
-                            if i + 1 < len(participants):
-                                cursor.execute(
-                                    """
-                                    INSERT INTO tournament_matches 
-                                    (tournament_id, round, player1_id, player2_id, creation_date)
-                                    VALUES (?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        tournament_id, 
-                                        next_round, 
-                                        participants[i], 
-                                        participants[i+1],
-                                        datetime.datetime.now()
-                                    )
-                                )
-                else:
-                    # Командный турнир
-                    # Получаем все команды
-                    cursor.execute(
-                        "SELECT id FROM tournament_teams WHERE tournament_id = ?",
-                        (tournament_id,)
-                    )
-                    
-                    teams = [t['id'] for t in cursor.fetchall()]
-                    
-                    if len(teams) < 2:
-                        await interaction.response.send_message("Недостаточно команд для начала турнира.", ephemeral=True)
-                        return
-                    
-                    # Особый случай для дуэльных командных турниров (только 2 команды) в формате BO3/BO5/BO7
-                    if len(teams) == 2 and match_type in ['BO3', 'BO5', 'BO7']:
-                        logger.info(f"Creating duel team tournament with match type {match_type} for teams {teams}")
-                        
-                        matches_to_create = 1  # По умолчанию создаем 1 матч (для BO1)
-                        
-                        if match_type == 'BO3':
-                            matches_to_create = 3
-                        elif match_type == 'BO5':
-                            matches_to_create = 5
-                        elif match_type == 'BO7':
-                            matches_to_create = 7
-                        
-                        # Создаем необходимое количество матчей между одними и теми же командами
-                        for i in range(matches_to_create):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, team1_id, team2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    1,  # Все матчи в 1 раунде для BO3/BO5/BO7 дуэлей
-                                    teams[0], 
-                                    teams[1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        
-                        logger.info(f"Created {matches_to_create} matches for duel team tournament {tournament_id}")
-                    else:
-                        # Стандартное создание матчей для турнира
-                        for i in range(0, len(teams), 2):
-                            if i + 1 < len(teams):
-                                cursor.execute(
-                                    """
-                                    INSERT INTO tournament_matches 
-                                    (tournament_id, round, team1_id, team2_id, creation_date)
-                                    VALUES (?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        tournament_id, 
-                                        next_round, 
-                                        teams[i], 
-                                        teams[i+1],
-                                        datetime.datetime.now()
-                                    )
-                                )
-            else:
-                # Обработка дуэльного турнира
-                if is_duel_tournament and match_type in ['BO3', 'BO5', 'BO7']:
-                    if tournament['type'] == 'private':
-                        # Получаем ID участников
-                        cursor.execute(
-                            "SELECT user_id FROM tournament_participants WHERE tournament_id = ? LIMIT 2",
-                            (tournament_id,)
-                        )
-                        participants = cursor.fetchall()
-                        
-                        if len(participants) != 2:
-                            logger.error(f"Expected 2 participants in duel tournament {tournament_id}, but found {len(participants)}")
-                            await interaction.response.send_message(
-                                "Ошибка: некорректное количество участников для дуэльного турнира.", 
-                                ephemeral=True
-                            )
-                            return
-                            
-                        player1_id = participants[0]['user_id']
-                        player2_id = participants[1]['user_id']
-                        
-                        # Подсчитываем победы для каждого игрока
-                        cursor.execute(
-                            """
-                            SELECT 
-                                SUM(CASE WHEN team1_score > team2_score THEN 1 ELSE 0 END) as player1_wins,
-                                SUM(CASE WHEN team2_score > team1_score THEN 1 ELSE 0 END) as player2_wins
-                            FROM tournament_matches 
-                            WHERE tournament_id = ? AND completed = 1 AND (player1_id = ? OR player2_id = ?)
-                            """,
-                            (tournament_id, player1_id, player1_id)
-                        )
-                        
-                        win_counts = cursor.fetchone()
-                        player1_wins = win_counts['player1_wins'] or 0
-                        player2_wins = win_counts['player2_wins'] or 0
-                        
-                        logger.info(f"Duel tournament {tournament_id} score: Player1 ({player1_id}) - {player1_wins}, Player2 ({player2_id}) - {player2_wins}")
-                        
-                        # Проверяем, есть ли победитель
-                        if player1_wins >= wins_needed:
-                            # Игрок 1 победил в дуэли
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                (player1_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT username FROM players WHERE user_id = ?",
-                                (player1_id,)
-                            )
-                            winner_name = cursor.fetchone()['username']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=f"<@{player1_id}> ({winner_name})", inline=False)
-                            embed.add_field(name="Счет", value=f"{player1_wins}:{player2_wins}", inline=False)
-                            
-                            # Отправляем результаты
-                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                            if results_channel:
-                                await results_channel.send(embed=embed)
-                            
-                            await interaction.response.send_message("Турнир завершен! Победитель определен и объявлен.", ephemeral=True)
-                            db.commit()
-                            return
-                        elif player2_wins >= wins_needed:
-                            # Игрок 2 победил в дуэли
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                (player2_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT username FROM players WHERE user_id = ?",
-                                (player2_id,)
-                            )
-                            winner_name = cursor.fetchone()['username']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=f"<@{player2_id}> ({winner_name})", inline=False)
-                            embed.add_field(name="Счет", value=f"{player2_wins}:{player1_wins}", inline=False)
-                            
-                            # Отправляем результаты
-                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                            if results_channel:
-                                await results_channel.send(embed=embed)
-                            
-                            await interaction.response.send_message("Турнир завершен! Победитель определен и объявлен.", ephemeral=True)
-                            db.commit()
-                            return
-                    else:
-                        # Командный турнир
-                        cursor.execute(
-                            "SELECT id FROM tournament_teams WHERE tournament_id = ? LIMIT 2",
-                            (tournament_id,)
-                        )
-                        teams = cursor.fetchall()
-                        
-                        if len(teams) != 2:
-                            logger.error(f"Expected 2 teams in duel tournament {tournament_id}, but found {len(teams)}")
-                            await interaction.response.send_message(
-                                "Ошибка: некорректное количество команд для дуэльного турнира.", 
-                                ephemeral=True
-                            )
-                            return
-                            
-                        team1_id = teams[0]['id']
-                        team2_id = teams[1]['id']
-                        
-                        # Подсчитываем победы для каждой команды
-                        cursor.execute(
-                            """
-                            SELECT 
-                                SUM(CASE WHEN team1_score > team2_score THEN 1 ELSE 0 END) as team1_wins,
-                                SUM(CASE WHEN team2_score > team1_score THEN 1 ELSE 0 END) as team2_wins
-                            FROM tournament_matches 
-                            WHERE tournament_id = ? AND completed = 1 AND (team1_id = ? OR team2_id = ?)
-                            """,
-                            (tournament_id, team1_id, team1_id)
-                        )
-                        
-                        win_counts = cursor.fetchone()
-                        team1_wins = win_counts['team1_wins'] or 0
-                        team2_wins = win_counts['team2_wins'] or 0
-                        
-                        logger.info(f"Duel team tournament {tournament_id} score: Team1 ({team1_id}) - {team1_wins}, Team2 ({team2_id}) - {team2_wins}")
-                        
-                        # Проверяем, есть ли победитель
-                        if team1_wins >= wins_needed:
-                            # Команда 1 победила в дуэли
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
-                                (team1_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT team_name FROM tournament_teams WHERE id = ?",
-                                (team1_id,)
-                            )
-                            winner_name = cursor.fetchone()['team_name']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=winner_name, inline=False)
-                            embed.add_field(name="Счет", value=f"{team1_wins}:{team2_wins}", inline=False)
-                            
-                            # Отправляем результаты
-                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                            if results_channel:
-                                await results_channel.send(embed=embed)
-                            
-                            await interaction.response.send_message("Турнир завершен! Победитель определен и объявлен.", ephemeral=True)
-                            db.commit()
-                            return
-                        elif team2_wins >= wins_needed:
-                            # Команда 2 победила в дуэли
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
-                                (team2_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT team_name FROM tournament_teams WHERE id = ?",
-                                (team2_id,)
-                            )
-                            winner_name = cursor.fetchone()['team_name']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=winner_name, inline=False)
-                            embed.add_field(name="Счет", value=f"{team2_wins}:{team1_wins}", inline=False)
-                            
-                            # Отправляем результаты
-                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                            if results_channel:
-                                await results_channel.send(embed=embed)
-                            
-                            await interaction.response.send_message("Турнир завершен! Победитель определен и объявлен.", ephemeral=True)
-                            db.commit()
-                            return
-                
-                # Получаем победителей текущего раунда для обычных (не дуэльных) турниров
-                if tournament['type'] == 'private':
-                    # Индивидуальный турнир
-                    cursor.execute(
-                        """
-                        SELECT 
-                            CASE 
-                                WHEN team1_score > team2_score THEN player1_id
-                                WHEN team2_score > team1_score THEN player2_id
-                                ELSE NULL
-                            END as player_id
-                        FROM tournament_matches 
-                        WHERE tournament_id = ? AND round = ? AND completed = 1
-                        """,
-                        (tournament_id, current_round)
-                    )
-                    
-                    player_winners = cursor.fetchall()
-                    winners = [{'player_id': pw['player_id']} for pw in player_winners if pw['player_id'] is not None]
-                else:
-                    # Командный турнир
-                    cursor.execute(
-                        """
-                        SELECT 
-                            CASE 
-                                WHEN team1_score > team2_score THEN team1_id
-                                WHEN team2_score > team1_score THEN team2_id
-                                ELSE NULL
-                            END as team_id
-                        FROM tournament_matches 
-                        WHERE tournament_id = ? AND round = ? AND completed = 1
-                        """,
-                        (tournament_id, current_round)
-                    )
-                    
-                    team_winners = cursor.fetchall()
-                    winners = [{'team_id': tw['team_id']} for tw in team_winners if tw['team_id'] is not None]
-                
-                # Проверяем, достаточно ли победителей для следующего раунда
-                if len(winners) < 2:
-                    # Турнир завершен - определяем общего победителя
-                    if len(winners) == 1:
-                        if tournament['type'] == 'private':
-                            player_id = winners[0]['player_id']
-                            
-                            # Обновляем статус турнира и записываем победителя
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                (player_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT username FROM players WHERE user_id = ?",
-                                (player_id,)
-                            )
-                            winner_name = cursor.fetchone()['username']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=f"<@{player_id}> ({winner_name})", inline=False)
-                        else:
-                            team_id = winners[0]['team_id']
-                            
-                            # Обновляем статус турнира и записываем победителя
-                            cursor.execute(
-                                "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
-                                (team_id, tournament_id)
-                            )
-                            
-                            # Создаем embed с результатами
-                            cursor.execute(
-                                "SELECT team_name FROM tournament_teams WHERE id = ?",
-                                (team_id,)
-                            )
-                            winner_name = cursor.fetchone()['team_name']
-                            
-                            embed = discord.Embed(
-                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                description=f"Турнир завершен!",
-                                color=0xF1C40F  # Gold
-                            )
-                            
-                            embed.add_field(name="Победитель", value=winner_name, inline=False)
-                        
-                        # Отправляем результаты
-                        results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                        if results_channel:
-                            await results_channel.send(embed=embed)
-                        
-                        await interaction.response.send_message("Турнир завершен! Победитель определен и объявлен.", ephemeral=True)
-                        db.commit()
-                        return
-                    else:
-                        await interaction.response.send_message("Не удалось определить победителей текущего раунда.", ephemeral=True)
-                        return
-                
-                # Создаем матчи для следующего раунда
-                if tournament['type'] == 'private':
-                    # Индивидуальный турнир
-                    player_ids = [w['player_id'] for w in winners]
-                    
-                    for i in range(0, len(player_ids), 2):
-                        if i + 1 < len(player_ids):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, player1_id, player2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    next_round, 
-                                    player_ids[i], 
-                                    player_ids[i+1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                else:
-                    # Командный турнир
-                    team_ids = [w['team_id'] for w in winners]
-                    
-                    for i in range(0, len(team_ids), 2):
-                        if i + 1 < len(team_ids):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, team1_id, team2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    next_round, 
-                                    team_ids[i], 
-                                    team_ids[i+1],
-                                    datetime.datetime.now()
-                                )
-                            )
-            
-            # Получаем информацию о созданных матчах для отображения
-            if tournament['type'] == 'private':
-                cursor.execute(
-                    """
-                    SELECT m.id, p1.username as player1_name, p2.username as player2_name
-                    FROM tournament_matches m
-                    JOIN players p1 ON m.player1_id = p1.user_id
-                    JOIN players p2 ON m.player2_id = p2.user_id
-                    WHERE m.tournament_id = ? AND m.round = ?
-                    """,
-                    (tournament_id, next_round)
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT m.id, t1.team_name as team1_name, t2.team_name as team2_name
-                    FROM tournament_matches m
-                    JOIN tournament_teams t1 ON m.team1_id = t1.id
-                    JOIN tournament_teams t2 ON m.team2_id = t2.id
-                    WHERE m.tournament_id = ? AND m.round = ?
-                    """,
-                    (tournament_id, next_round)
-                )
-                    
-            new_matches = cursor.fetchall()
+            next_round = min((match['round'] for match in new_matches), default=1)
             
             # Создаем embed с новыми матчами
             embed = discord.Embed(
-                title=f"Раунд {next_round}: {tournament['name']}",
+                title=f"Раунд {next_round}: {tournament.name}",
                 description="Новые матчи созданы:",
                 color=0x3498DB  # Blue
             )
             
-            for match in new_matches:
-                if tournament['type'] == 'private':
-                    embed.add_field(
-                        name=f"Матч {match['id']}", 
-                        value=f"{match['player1_name']} vs {match['player2_name']}", 
-                        inline=False
-                    )
+            for match in new_matches[:25]:
+                if tournament.is_team:
+                    value = f"{match['team1_name']} vs {match['team2_name']}"
                 else:
-                    embed.add_field(
-                        name=f"Матч {match['id']}", 
-                        value=f"{match['team1_name']} vs {match['team2_name']}", 
-                        inline=False
-                    )
+                    value = f"{match['player1_name']} vs {match['player2_name']}"
+                embed.add_field(name=f"Матч {match['id']}", value=value, inline=False)
             
-            # Обновляем статус турнира, если это первый раунд
-            if current_round == 0:
-                cursor.execute(
-                    "UPDATE tournaments SET started = 1 WHERE id = ?",
-                    (tournament_id,)
-                )
-            
-            db.commit()
+            await job.update(f"Раунд {next_round}: матчи созданы, отправка уведомлений")
             
             # Отправляем уведомления участникам
-            channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-            if channel:
-                if tournament['type'] == 'private':
-                    # Формируем список упоминаний участников
-                    match_participants = set()
-                    for match in new_matches:
-                        cursor.execute(
-                            "SELECT player1_id, player2_id FROM tournament_matches WHERE id = ?", 
-                            (match['id'],)
-                        )
-                        match_data = cursor.fetchone()
-                        if match_data:
-                            if match_data['player1_id']:
-                                match_participants.add(match_data['player1_id'])
-                            if match_data['player2_id']:
-                                match_participants.add(match_data['player2_id'])
-                    
-                    mentions = ' '.join([f"<@{p_id}>" for p_id in match_participants])
-                    if mentions:
-                        match_notification = discord.Embed(
-                            title=f"⚡ Новый раунд в турнире {tournament['name']}",
-                            description=f"Ваши матчи созданы! Проверьте сетку турнира, чтобы найти свой матч.",
-                            color=0x1ABC9C  # Teal
-                        )
-                        await channel.send(mentions, embed=match_notification)
-                else:
-                    # Для командных турниров без тегов
+            if not tournament.is_team:
+                # Формируем список упоминаний участников
+                match_participants = set()
+                for match in new_matches:
+                    for player_id in (match['player1_id'], match['player2_id']):
+                        if player_id:
+                            match_participants.add(player_id)
+                
+                mentions = ' '.join([f"<@{p_id}>" for p_id in match_participants])
+                if mentions:
                     match_notification = discord.Embed(
-                        title=f"⚡ Новый раунд в турнире {tournament['name']}",
-                        description=f"Новые матчи созданы! Представители команд, проверьте сетку турнира.",
+                        title=f"⚡ Новый раунд в турнире {tournament.name}",
+                        description=f"Ваши матчи созданы! Проверьте сетку турнира, чтобы найти свой матч.",
                         color=0x1ABC9C  # Teal
                     )
-                    await channel.send(embed=match_notification)
-            
-            # Обновляем и отправляем турнирную сетку
-            from utils.brackets import generate_tournament_bracket
-            success, bracket = generate_tournament_bracket(tournament_id)
-            
-            if success and channel:
-                await channel.send(embed=bracket)
-            
-            await interaction.response.send_message(embed=embed)
-            
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(f"Error creating next matches: {e}\n{error_details}")
-            db.rollback()
-            
-            # Отправляем более информативное сообщение об ошибке
-            try:
-                await interaction.response.send_message(
-                    f"Произошла ошибка при создании следующего раунда: {str(e)}", 
-                    ephemeral=True
-                )
-            except discord.errors.InteractionResponded:
-                await interaction.followup.send(
-                    f"Произошла ошибка при создании следующего раунда: {str(e)}", 
-                    ephemeral=True
-                )
-                
-                # Handle team tournaments vs player tournaments differently
-                if tournament['type'] == 'public':
-                    # Team tournament
-                    if len(winners) < 2:
-                        # Tournament is complete - announce overall winner
-                        if len(winners) == 1 and winners[0]['winner_id'] is not None:
-                            # Get winning team name
-                            cursor.execute(
-                                "SELECT team_name FROM tournament_teams WHERE id = ?",
-                                (winners[0]['winner_id'],)
-                            )
-                            
-                            winner_team = cursor.fetchone()
-                            
-                            if winner_team:
-                                # Update tournament winner and status
-                                cursor.execute(
-                                    "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
-                                    (winners[0]['winner_id'], tournament_id)
-                                )
-                                
-                                # Create final results embed
-                                embed = discord.Embed(
-                                    title=f"🏆 Результаты турнира: {tournament['name']}",
-                                    description=f"Турнир завершен!",
-                                    color=0xF1C40F  # Gold
-                                )
-                                
-                                embed.add_field(name="Победитель", value=winner_team['team_name'], inline=False)
-                                
-                                # Send to results channel
-                                results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                                if results_channel:
-                                    await results_channel.send(embed=embed)
-                                
-                                await interaction.response.send_message("Турнир завершен! Победитель объявлен.", ephemeral=True)
-                                db.commit()
-                                return
-                        elif current_round > 0:  # Проверяем, что это не первый раунд
-                            # Если это был финальный раунд (осталось меньше 2 победителей)
-                            # Проверяем, есть ли матчи в текущем раунде
-                            cursor.execute(
-                                "SELECT COUNT(*) as match_count FROM tournament_matches WHERE tournament_id = ? AND round = ?",
-                                (tournament_id, current_round)
-                            )
-                            match_count = cursor.fetchone()['match_count']
-                            
-                            if match_count == 1:
-                                # Это был финальный матч - пытаемся определить победителя
-                                cursor.execute(
-                                    """
-                                    SELECT team1_id, team2_id, team1_score, team2_score 
-                                    FROM tournament_matches 
-                                    WHERE tournament_id = ? AND round = ? AND completed = 1
-                                    LIMIT 1
-                                    """,
-                                    (tournament_id, current_round)
-                                )
-                                final_match = cursor.fetchone()
-                                
-                                if final_match:
-                                    winner_id = None
-                                    if final_match['team1_score'] > final_match['team2_score']:
-                                        winner_id = final_match['team1_id']
-                                    else:
-                                        winner_id = final_match['team2_id']
-                                    
-                                    if winner_id:
-                                        # Get winning team name
-                                        cursor.execute(
-                                            "SELECT team_name FROM tournament_teams WHERE id = ?",
-                                            (winner_id,)
-                                        )
-                                        
-                                        winner_team = cursor.fetchone()
-                                        
-                                        if winner_team:
-                                            # Update tournament winner and status
-                                            cursor.execute(
-                                                "UPDATE tournaments SET winner_team_id = ?, status = 'completed' WHERE id = ?",
-                                                (winner_id, tournament_id)
-                                            )
-                                            
-                                            # Create final results embed
-                                            embed = discord.Embed(
-                                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                                description=f"Турнир завершен!",
-                                                color=0xF1C40F  # Gold
-                                            )
-                                            
-                                            embed.add_field(name="Победитель", value=winner_team['team_name'], inline=False)
-                                            
-                                            # Send to results channel
-                                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                                            if results_channel:
-                                                await results_channel.send(embed=embed)
-                                            
-                                            await interaction.response.send_message("Турнир завершен! Победитель объявлен.", ephemeral=True)
-                                            db.commit()
-                                            return
-                        
-                        await interaction.response.send_message("Недостаточно победителей для создания следующего раунда.", ephemeral=True)
-                        return
-                    
-                    # Create matches for next round
-                    for i in range(0, len(winners), 2):
-                        if i + 1 < len(winners):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, team1_id, team2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    next_round, 
-                                    winners[i]['winner_id'], 
-                                    winners[i+1]['winner_id'],
-                                    datetime.datetime.now()
-                                )
-                            )
-                
-                else:
-                    # Player tournament
-                    if len(winners) < 2:
-                        # Tournament is complete - announce overall winner
-                        if len(winners) == 1 and winners[0]['winner_player_id'] is not None:
-                            # Get winning player name
-                            cursor.execute(
-                                "SELECT username FROM players WHERE user_id = ?",
-                                (winners[0]['winner_player_id'],)
-                            )
-                            
-                            winner_player = cursor.fetchone()
-                            
-                            if winner_player:
-                                # Update tournament winner and status
-                                cursor.execute(
-                                    "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                    (winners[0]['winner_player_id'], tournament_id)
-                                )
-                                
-                                # Create final results embed
-                                embed = discord.Embed(
-                                    title=f"🏆 Результаты турнира: {tournament['name']}",
-                                    description=f"Турнир завершен!",
-                                    color=0xF1C40F  # Gold
-                                )
-                                
-                                embed.add_field(name="Победитель", value=f"<@{winners[0]['winner_player_id']}> ({winner_player['username']})", inline=False)
-                                
-                                # Send to results channel
-                                results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                                if results_channel:
-                                    await results_channel.send(embed=embed)
-                                
-                                await interaction.response.send_message("Турнир завершен! Победитель объявлен.", ephemeral=True)
-                                db.commit()
-                                return
-                        elif current_round > 0:  # Проверяем, что это не первый раунд
-                            # Если это был финальный раунд (осталось меньше 2 победителей)
-                            # Проверяем, есть ли матчи в текущем раунде
-                            cursor.execute(
-                                "SELECT COUNT(*) as match_count FROM tournament_matches WHERE tournament_id = ? AND round = ?",
-                                (tournament_id, current_round)
-                            )
-                            match_count = cursor.fetchone()['match_count']
-                            
-                            if match_count == 1:
-                                # Это был финальный матч - пытаемся определить победителя
-                                cursor.execute(
-                                    """
-                                    SELECT player1_id, player2_id, team1_score, team2_score 
-                                    FROM tournament_matches 
-                                    WHERE tournament_id = ? AND round = ? AND completed = 1
-                                    LIMIT 1
-                                    """,
-                                    (tournament_id, current_round)
-                                )
-                                final_match = cursor.fetchone()
-                                
-                                if final_match:
-                                    winner_id = None
-                                    if final_match['team1_score'] > final_match['team2_score']:
-                                        winner_id = final_match['player1_id']
-                                    else:
-                                        winner_id = final_match['player2_id']
-                                    
-                                    if winner_id:
-                                        # Get winning player name
-                                        cursor.execute(
-                                            "SELECT username FROM players WHERE user_id = ?",
-                                            (winner_id,)
-                                        )
-                                        
-                                        winner_player = cursor.fetchone()
-                                        
-                                        if winner_player:
-                                            # Update tournament winner and status
-                                            cursor.execute(
-                                                "UPDATE tournaments SET winner_id = ?, status = 'completed' WHERE id = ?",
-                                                (winner_id, tournament_id)
-                                            )
-                                            
-                                            # Create final results embed
-                                            embed = discord.Embed(
-                                                title=f"🏆 Результаты турнира: {tournament['name']}",
-                                                description=f"Турнир завершен!",
-                                                color=0xF1C40F  # Gold
-                                            )
-                                            
-                                            embed.add_field(name="Победитель", value=f"<@{winner_id}> ({winner_player['username']})", inline=False)
-                                            
-                                            # Send to results channel
-                                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                                            if results_channel:
-                                                await results_channel.send(embed=embed)
-                                            
-                                            await interaction.response.send_message("Турнир завершен! Победитель объявлен.", ephemeral=True)
-                                            db.commit()
-                                            return
-                        
-                        await interaction.response.send_message("Недостаточно победителей для создания следующего раунда.", ephemeral=True)
-                        return
-                    
-                    # Create matches for next round
-                    for i in range(0, len(winners), 2):
-                        if i + 1 < len(winners):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, player1_id, player2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    next_round, 
-                                    winners[i]['winner_player_id'], 
-                                    winners[i+1]['winner_player_id'],
-                                    datetime.datetime.now()
-                                )
-                            )
-            
+                    await outbox.send(None, TOURNAMENT_RESULTS_CHANNEL, content=mentions, embeds=[match_notification])
             else:
-                # First round - create initial matches
-                if tournament['type'] == 'private':
-                    # Get all participants
-                    cursor.execute(
-                        "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
-                        (tournament_id,)
-                    )
-                    
-                    participants = [p['user_id'] for p in cursor.fetchall()]
-                    
-                    if len(participants) < 2:
-                        await interaction.response.send_message("Недостаточно участников для начала турнира.", ephemeral=True)
-                        return
-                    
-                    # Особый случай для дуэльных турниров (только 2 игрока) в формате BO3/BO5/BO7
-                    if len(participants) == 2 and tournament.get('match_type', 'BO1') in ['BO3', 'BO5', 'BO7']:
-                        logger.info(f"Creating duel tournament with match type {tournament.get('match_type')} for participants {participants}")
-                        
-                        match_type = tournament.get('match_type')
-                        matches_to_create = 1  # По умолчанию создаем 1 матч (для BO1)
-                        
-                        if match_type == 'BO3':
-                            matches_to_create = 3
-                        elif match_type == 'BO5':
-                            matches_to_create = 5
-                        elif match_type == 'BO7':
-                            matches_to_create = 7
-                        
-                        # Создаем необходимое количество матчей между одними и теми же игроками
-                        for i in range(matches_to_create):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, player1_id, player2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    1,  # Все матчи в 1 раунде для BO3/BO5/BO7 дуэлей
-                                    participants[0], 
-                                    participants[1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        
-                        logger.info(f"Created {matches_to_create} matches for duel tournament {tournament_id}")
-                    else:
-                        # Стандартное создание матчей для турнира
-                        for i in range(0, len(participants), 2):
-                            if i + 1 < len(participants):
-                                cursor.execute(
-                                    """
-                                    INSERT INTO tournament_matches 
-                                    (tournament_id, round, player1_id, player2_id, creation_date)
-                                    VALUES (?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        tournament_id, 
-                                        next_round, 
-                                        participants[i], 
-                                        participants[i+1],
-                                        datetime.datetime.now()
-                                    )
-                                )
-                
-                else:
-                    # Get all teams
-                    cursor.execute(
-                        "SELECT id FROM tournament_teams WHERE tournament_id = ?",
-                        (tournament_id,)
-                    )
-                    
-                    teams = [t['id'] for t in cursor.fetchall()]
-                    
-                    if len(teams) < 2:
-                        await interaction.response.send_message("Недостаточно команд для начала турнира.", ephemeral=True)
-                        return
-                    
-                    # Особый случай для дуэльных командных турниров (только 2 команды) в формате BO3/BO5/BO7
-                    if len(teams) == 2 and tournament.get('match_type', 'BO1') in ['BO3', 'BO5', 'BO7']:
-                        logger.info(f"Creating duel team tournament with match type {tournament.get('match_type')} for teams {teams}")
-                        
-                        match_type = tournament.get('match_type')
-                        matches_to_create = 1  # По умолчанию создаем 1 матч (для BO1)
-                        
-                        if match_type == 'BO3':
-                            matches_to_create = 3
-                        elif match_type == 'BO5':
-                            matches_to_create = 5
-                        elif match_type == 'BO7':
-                            matches_to_create = 7
-                        
-                        # Создаем необходимое количество матчей между одними и теми же командами
-                        for i in range(matches_to_create):
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, team1_id, team2_id, creation_date)
-                                VALUES (?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    tournament_id, 
-                                    1,  # Все матчи в 1 раунде для BO3/BO5/BO7 дуэлей
-                                    teams[0], 
-                                    teams[1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        
-                        logger.info(f"Created {matches_to_create} matches for duel team tournament {tournament_id}")
-                    else:
-                        # Стандартное создание матчей для турнира
-                        for i in range(0, len(teams), 2):
-                            if i + 1 < len(teams):
-                                cursor.execute(
-                                    """
-                                    INSERT INTO tournament_matches 
-                                    (tournament_id, round, team1_id, team2_id, creation_date)
-                                    VALUES (?, ?, ?, ?, ?)
-                                    """,
-                                    (
-                                        tournament_id, 
-                                        next_round, 
-                                        teams[i], 
-                                        teams[i+1],
-                                        datetime.datetime.now()
-                                    )
-                                )
-            
-            db.commit()
-            
-            # Get new matches for display
-            if tournament['type'] == 'private':
-                cursor.execute(
-                    """
-                    SELECT m.id, p1.username as player1_name, p2.username as player2_name
-                    FROM tournament_matches m
-                    JOIN players p1 ON m.player1_id = p1.user_id
-                    JOIN players p2 ON m.player2_id = p2.user_id
-                    WHERE m.tournament_id = ? AND m.round = ?
-                    """,
-                    (tournament_id, next_round)
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT m.id, t1.team_name as team1_name, t2.team_name as team2_name
-                    FROM tournament_matches m
-                    JOIN tournament_teams t1 ON m.team1_id = t1.id
-                    JOIN tournament_teams t2 ON m.team2_id = t2.id
-                    WHERE m.tournament_id = ? AND m.round = ?
-                    """,
-                    (tournament_id, next_round)
+                # Для командных турниров без тегов
+                match_notification = discord.Embed(
+                    title=f"⚡ Новый раунд в турнире {tournament.name}",
+                    description=f"Новые матчи созданы! Представители команд, проверьте сетку турнира.",
+                    color=0x1ABC9C  # Teal
                 )
-                
-            new_matches = cursor.fetchall()
+                await outbox.send(None, TOURNAMENT_RESULTS_CHANNEL, embeds=[match_notification])
             
-            # Create embed with new matches
-            embed = discord.Embed(
-                title=f"Раунд {next_round}: {tournament['name']}",
-                description="Новые матчи созданы:",
-                color=0x3498DB  # Blue
-            )
-            
-            for match in new_matches:
-                if tournament['type'] == 'private':
-                    embed.add_field(
-                        name=f"Матч {match['id']}", 
-                        value=f"{match['player1_name']} vs {match['player2_name']}", 
-                        inline=False
-                    )
-                else:
-                    embed.add_field(
-                        name=f"Матч {match['id']}", 
-                        value=f"{match['team1_name']} vs {match['team2_name']}", 
-                        inline=False
-                    )
-            
-            await interaction.response.send_message(embed=embed)
+            # Обновляем турнирную сетку
+            await publish_bracket(tournament_id)
             
-            # Отправляем уведомления о начале матча участникам
-            channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-            if channel:
-                if tournament['type'] == 'private':
-                    # Получаем всех участников и тегаем их
-                    match_participants = set()
-                    for match in new_matches:
-                        cursor.execute(
-                            """SELECT player1_id, player2_id FROM tournament_matches WHERE id = ?""", 
-                            (match['id'],)
-                        )
-                        match_data = cursor.fetchone()
-                        if match_data and match_data['player1_id']:
-                            match_participants.add(match_data['player1_id'])
-                        if match_data and match_data['player2_id']:
-                            match_participants.add(match_data['player2_id'])
-                    
-                    # Формируем упоминания и отправляем уведомление
-                    mentions = ' '.join([f"<@{p_id}>" for p_id in match_participants])
-                    if mentions:
-                        match_notification = discord.Embed(
-                            title=f"⚡ Новый раунд в турнире {tournament['name']}",
-                            description=f"Ваши матчи созданы! Проверьте сетку турнира, чтобы найти свой матч.",
-                            color=0x1ABC9C  # Teal
-                        )
-                        await channel.send(mentions, embed=match_notification)
-                else:
-                    # Для командных турниров просто отправляем уведомление без тегов
-                    match_notification = discord.Embed(
-                        title=f"⚡ Новый раунд в турнире {tournament['name']}",
-                        description=f"Новые матчи созданы! Представители команд, проверьте сетку турнира.",
-                        color=0x1ABC9C  # Teal
-                    )
-                    await channel.send(embed=match_notification)
-            
-            # Обновляем и публикуем турнирную сетку
-            from utils.brackets import generate_tournament_bracket
-            success, bracket = generate_tournament_bracket(tournament_id)
-            
-            if success and channel:
-                await channel.send(embed=bracket)
+            await job.send(embed=embed)
             
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
             logger.error(f"Error creating next matches: {e}\n{error_details}")
-            db.rollback()
+            job.error = str(e)
             
             # Отправляем более информативное сообщение об ошибке
-            try:
-                await interaction.response.send_message(
-                    f"Произошла ошибка при создании следующего раунда: {str(e)}", 
-                    ephemeral=True
+            await job.send(
+                f"Произошла ошибка при создании следующего раунда: {str(e)}", 
+                ephemeral=True
+            )
+    
+    async def open_round(self, tx, tournament_id: int) -> tuple:
+        """
+        Create the next matches in the transaction.
+        
+        Returns (notice, tournament, new matches); `notice` is the reply for
+        the moderator when no matches were created.
+        """
+        # Проверяем, существует ли турнир
+        row = await tx.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
+    
+        if not row:
+            return f"Турнир с ID {tournament_id} не найден!", None, []
+        tournament = Tournament.from_row(row)
+        
+        # Проверяем, завершен ли уже турнир
+        if tournament.status == 'completed':
+            logger.info(f"Tournament {tournament_id} is already completed, cannot create next match")
+            return "Турнир уже завершен и имеет победителя. Создание новых матчей невозможно.", tournament, []
+        
+        entrants = await self.tournament_entrants(tx, tournament)
+        logger.info(f"Tournament {tournament_id} has {len(entrants)} participants")
+        
+        # При автоматическом переходе матчи сетки создаются сразу по готовности,
+        # раунд целиком ждут только в ручном режиме
+        if BRACKET_PROGRESSION != 'auto':
+            uncompleted_count = (await tx.fetchone(
+                "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ? AND completed = 0",
+                (tournament_id,)
+            ))['count']
+            if uncompleted_count > 0:
+                return (
+                    "Есть незавершенные матчи в текущем раунде. Пожалуйста, завершите их перед переходом к следующему раунду.",
+                    tournament, []
                 )
-            except discord.errors.InteractionResponded:
-                await interaction.followup.send(
-                    f"Произошла ошибка при создании следующего раунда: {str(e)}", 
-                    ephemeral=True
+        
+        # Серии BO3/BO5/BO7 играются внутри одного матча сетки, в том числе дуэли
+        bracket = await brackets.load(tournament_id, tx=tx, for_update=True)
+        if bracket is None:
+            # Матчи турнира, начатого до хранения сеток, не сложились в сетку: новая сетка рядом с ними дала бы дубли
+            existing = await tx.fetchone(
+                "SELECT id FROM tournament_matches WHERE tournament_id = ? LIMIT 1",
+                (tournament_id,)
+            )
+            if existing:
+                logger.error(f"Matches of tournament {tournament_id} do not form a bracket, refusing to seed a new one")
+                return (
+                    "Существующие матчи турнира не удалось собрать в сетку, новые матчи не созданы. "
+                    "Обратитесь к администратору.",
+                    tournament, []
                 )
+            if len(entrants) < 2:
+                what = "команд" if tournament.is_team else "участников"
+                return f"Недостаточно {what} для начала турнира.", tournament, []
+            bracket = await brackets.start(tx, tournament_id, await seed_entrants(tx, tournament), tournament.is_team)
+        
+        # Победители уже стоят в слотах сетки, пересчитывать раунд не нужно
+        if bracket.champion is not None:
+            await finish_tournament(tx, tournament, bracket.champion)
+            await brackets.save(tx, bracket)
+            return "Турнир завершен! Победитель определен и объявлен.", tournament, []
+        
+        nodes = bracket.playable()
+        if not nodes:
+            if BRACKET_PROGRESSION == 'auto':
+                return "Новых матчей пока нет: следующие матчи создаются автоматически после ввода результатов.", tournament, []
+            return "Не удалось определить победителей текущего раунда.", tournament, []
+        
+        created = await create_matches(tx, bracket, nodes)
+        await brackets.save(tx, bracket)
+        
+        # Получаем информацию о созданных матчах для отображения
+        placeholders = ', '.join('?' for _ in created)
+        if not created:
+            new_matches = []
+        elif tournament.is_team:
+            new_matches = await tx.fetchall(
+                f"""
+                SELECT m.id, m.round, t1.team_name as team1_name, t2.team_name as team2_name
+                FROM tournament_matches m
+                LEFT JOIN tournament_teams t1 ON m.team1_id = t1.id
+                LEFT JOIN tournament_teams t2 ON m.team2_id = t2.id
+                WHERE m.id IN ({placeholders})
+                ORDER BY m.id
+                """,
+                created
+            )
+        else:
+            new_matches = await tx.fetchall(
+                f"""
+                SELECT m.id, m.round, m.player1_id, m.player2_id,
+                       p1.username as player1_name, p2.username as player2_name
+                FROM tournament_matches m
+                LEFT JOIN players p1 ON m.player1_id = p1.user_id
+                LEFT JOIN players p2 ON m.player2_id = p2.user_id
+                WHERE m.id IN ({placeholders})
+                ORDER BY m.id
+                """,
+                created
+            )
+        
+        # Обновляем статус турнира, если это первый раунд
+        if not tournament.started:
+            await tx.execute(
+                "UPDATE tournaments SET started = 1 WHERE id = ?",
+                (tournament_id,)
+            )
+        
+        return None, tournament, new_matches
+    
+    async def tournament_entrants(self, tx, tournament: Tournament) -> list:
+        """Return the players of a private tournament or the teams of a public one."""
+        if tournament.is_team:
+            rows = await tx.fetchall("SELECT id FROM tournament_teams WHERE tournament_id = ?", (tournament.id,))
+            return [row['id'] for row in rows]
+        rows = await tx.fetchall(
+            "SELECT DISTINCT user_id FROM tournament_participants WHERE tournament_id = ?",
+            (tournament.id,)
+        )
+        return [row['user_id'] for row in rows]
     
     @app_commands.command(
         name="tournament-undo",
@@ -2060,160 +1309,234 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("У вас нет прав для этого действия! Требуются права администратора.", ephemeral=True)
             return
             
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
+        # Откат раунда может затронуть много матчей, поэтому работа идет в фоновой задаче
+        await jobs.run(
+            interaction,
+            f"Отмена результата матча #{match_id}",
+            lambda job: self.undo_match_result(job, match_id)
+        )
+    
+    async def undo_match_result(self, job: Job, match_id: int):
+        """Reset a match result; runs as a job after the command is acknowledged."""
         # Check if match exists
-        cursor.execute("SELECT * FROM tournament_matches WHERE id = ?", (match_id,))
-        match = cursor.fetchone()
+        match = await db.fetchone("SELECT * FROM tournament_matches WHERE id = ?", (match_id,))
         
         if not match:
-            await interaction.response.send_message(f"Матч с ID {match_id} не найден!", ephemeral=True)
+            await job.send(f"Матч с ID {match_id} не найден!", ephemeral=True)
             return
+        tournament_id = match['tournament_id']
             
         if match['completed'] == 0:
-            await interaction.response.send_message("Этот матч еще не завершен!", ephemeral=True)
+            # У незавершенной серии можно сбросить уже записанные игры
+            series = await get_series(match_id)
+            if series is not None:
+                async with db.transaction() as tx:
+                    await reset_series(tx, match_id)
+                await job.send(f"Счет серии {series.score} сброшен.", ephemeral=True)
+                return
+            await job.send("Этот матч еще не завершен!", ephemeral=True)
             return
-            
-        # Check if there are matches in next round that depend on this one
-        cursor.execute(
-            "SELECT COUNT(*) FROM tournament_matches WHERE tournament_id = ? AND round > ?",
-            (match['tournament_id'], match['round'])
+        
+        # Отмена затрагивает только матчи на пути победителя к финалу
+        bracket = await brackets.load(tournament_id)
+        if bracket is not None:
+            dependent_matches = len(bracket.dependents(match_id)) if bracket.node_of(match_id) is not None else 0
+        else:
+            dependent_matches = (await db.fetchone(
+                "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ? AND round > ?",
+                (tournament_id, match['round'])
+            ))['count']
+        
+        if dependent_matches == 0:
+            await self.revert_result(job, tournament_id, match_id)
+            return
+        
+        # Ask for confirmation
+        embed = discord.Embed(
+            title="⚠️ Внимание!",
+            description=(
+                f"От результата этого матча зависят последующие матчи ({dependent_matches}). "
+                "Отмена результата удалит их. Продолжить?"
+            ),
+            color=0xE74C3C  # Red
         )
         
-        if cursor.fetchone()[0] > 0:
-            # Ask for confirmation
-            embed = discord.Embed(
-                title="⚠️ Внимание!",
-                description=(
-                    "Существуют матчи в следующих раундах, которые зависят от результата этого матча. "
-                    "Отмена результата приведет к сбросу всех последующих раундов. Продолжить?"
-                ),
-                color=0xE74C3C  # Red
+        view = discord.ui.View(timeout=60)
+        
+        async def confirm_callback(interaction: discord.Interaction):
+            # Состояние матча перечитывается в новой транзакции под блокировкой турнира
+            await jobs.run(
+                interaction,
+                f"Отмена результата матча #{match_id}",
+                lambda confirm_job: self.revert_result(confirm_job, tournament_id, match_id)
             )
+        
+        async def cancel_callback(interaction: discord.Interaction):
+            await interaction.response.send_message("Отмена действия.", ephemeral=True)
+        
+        confirm_button = discord.ui.Button(label="Подтвердить", style=discord.ButtonStyle.danger)
+        confirm_button.callback = confirm_callback
+        
+        cancel_button = discord.ui.Button(label="Отмена", style=discord.ButtonStyle.secondary)
+        cancel_button.callback = cancel_callback
+        
+        view.add_item(confirm_button)
+        view.add_item(cancel_button)
+        
+        await job.send(embed=embed, view=view, ephemeral=True)
+    
+    async def revert_result(self, job: Job, tournament_id: int, match_id: int):
+        """
+        Take back a match result and the later matches built on it.
+        
+        The match is read again in the transaction, so a confirmation that
+        comes after another change acts on the current state. The revert is
+        logged as an event and drops only the matches on the winner's path.
+        """
+        try:
+            async with tournament_locks.hold(tournament_id):
+                async with db.transaction() as tx:
+                    reply = await self.revert_match(tx, match_id)
+            await job.send(reply, ephemeral=True)
             
-            view = discord.ui.View(timeout=60)
-            
-            async def confirm_callback(interaction: discord.Interaction):
-                # Delete matches in subsequent rounds
-                cursor.execute(
-                    "DELETE FROM tournament_matches WHERE tournament_id = ? AND round > ?",
-                    (match['tournament_id'], match['round'])
-                )
-                
-                # Reset match result
-                cursor.execute(
-                    "UPDATE tournament_matches SET team1_score = NULL, team2_score = NULL, notes = NULL, completed = 0, completion_date = NULL WHERE id = ?",
-                    (match_id,)
-                )
-                
-                # If this is a private tournament, update player stats
-                if match.get('player1_id') is not None and match.get('player2_id') is not None:
-                    # Determine winner from the match results
-                    player1_id = match['player1_id']
-                    player2_id = match['player2_id']
-                    
-                    if match['team1_score'] > match['team2_score']:
-                        winner_id = player1_id
-                        loser_id = player2_id
-                    elif match['team2_score'] > match['team1_score']:
-                        winner_id = player2_id
-                        loser_id = player1_id
-                    else:
-                        winner_id = None
-                        loser_id = None
-                    
-                    # If there was a winner, update stats
-                    if winner_id:
-                        # Update winner stats
-                        cursor.execute(
-                            "UPDATE players SET wins = wins - 1 WHERE user_id = ? AND wins > 0",
-                            (winner_id,)
-                        )
-                        
-                        # Update loser stats
-                        cursor.execute(
-                            "UPDATE players SET losses = losses - 1 WHERE user_id = ? AND losses > 0",
-                            (loser_id,)
-                        )
-                        
-                        # Remove from player_stats table
-                        cursor.execute(
-                            "DELETE FROM player_stats WHERE user_id IN (?, ?) AND tournament_id = ?",
-                            (winner_id, loser_id, match['tournament_id'])
-                        )
-                
-                db.commit()
-                
-                await interaction.response.send_message("Результат матча успешно отменен и все последующие раунды сброшены.", ephemeral=True)
-            
-            async def cancel_callback(interaction: discord.Interaction):
-                await interaction.response.send_message("Отмена действия.", ephemeral=True)
-            
-            confirm_button = discord.ui.Button(label="Подтвердить", style=discord.ButtonStyle.danger)
-            confirm_button.callback = confirm_callback
-            
-            cancel_button = discord.ui.Button(label="Отмена", style=discord.ButtonStyle.secondary)
-            cancel_button.callback = cancel_callback
-            
-            view.add_item(confirm_button)
-            view.add_item(cancel_button)
+        except Exception as e:
+            logger.error(f"Error undoing match result: {e}")
+            job.error = str(e)
+            await job.send("Произошла ошибка при отмене результата матча.", ephemeral=True)
+    
+    async def revert_match(self, tx, match_id: int) -> str:
+        """Revert the result in the transaction and return the reply for the moderator."""
+        match = await tx.fetchone("SELECT * FROM tournament_matches WHERE id = ?", (match_id,))
+        if not match or not match['completed']:
+            return "Результат этого матча уже отменен."
+        
+        bracket = await brackets.load(match['tournament_id'], tx=tx, for_update=True)
+        if bracket is not None:
+            dropped = []
+            if bracket.node_of(match_id) is not None:
+                dropped = await match_log.append(tx, bracket, RESULT_REVERTED, match_id=match_id)
+                await brackets.save(tx, bracket)
+        else:
+            # Турнир без сетки: сбрасываются все последующие раунды
+            rows = await tx.fetchall(
+                "SELECT id FROM tournament_matches WHERE tournament_id = ? AND round > ?",
+                (match['tournament_id'], match['round'])
+            )
+            dropped = [row['id'] for row in rows]
+        
+        if dropped:
+            # Завершенные последующие матчи тоже возвращают статистику игроков
+            placeholders = ', '.join('?' for _ in dropped)
+            for dropped_match in await tx.fetchall(
+                f"SELECT * FROM tournament_matches WHERE id IN ({placeholders}) AND completed = 1",
+                dropped
+            ):
+                await revert_match_stats(tx, dropped_match)
+            await tx.execute_many("DELETE FROM match_series WHERE match_id = ?", [(dropped_id,) for dropped_id in dropped])
+            await tx.execute_many("DELETE FROM tournament_matches WHERE id = ?", [(dropped_id,) for dropped_id in dropped])
+        await reset_series(tx, match_id)
+        await revert_match_stats(tx, match)
+        
+        # Reset match result
+        await tx.execute(
+            "UPDATE tournament_matches SET team1_score = NULL, team2_score = NULL, notes = NULL, completed = 0, completion_date = NULL WHERE id = ?",
+            (match_id,)
+        )
+        
+        # Победитель турнира больше не определен: турнир снова идет, финал можно сыграть заново
+        if bracket is None or bracket.champion is None:
+            await tx.execute(
+                """
+                UPDATE tournaments SET status = 'in_progress', winner_id = NULL, winner_team_id = NULL
+                WHERE id = ? AND status = 'completed'
+                """,
+                (match['tournament_id'],)
+            )
+        await publish_bracket(match['tournament_id'], tx=tx)
+        
+        if dropped:
+            return f"Результат матча успешно отменен, удалено последующих матчей: {len(dropped)}."
+        return "Результат матча успешно отменен."
+    
+    @app_commands.command(
+        name="tournament-replay",
+        description="Проверить сетку турнира повторным проигрыванием журнала матчей"
+    )
+    @app_commands.describe(
+        tournament_id="ID турнира"
+    )
+    async def tournament_replay(self, interaction: discord.Interaction, tournament_id: int):
+        # Verify permissions
+        if not await is_admin(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия! Требуются права администратора.", ephemeral=True)
+            return
+        
+        await jobs.run(
+            interaction,
+            f"Проверка журнала турнира #{tournament_id}",
+            lambda job: self.audit_bracket(job, tournament_id)
+        )
+    
+    async def audit_bracket(self, job: Job, tournament_id: int):
+        """Fold the whole match log of a tournament and compare it with the stored bracket."""
+        try:
+            started = time.perf_counter()
+            replayed = await brackets.replay(tournament_id)
+            elapsed = (time.perf_counter() - started) * 1000
+            if replayed is None:
+                await job.send("У этого турнира нет журнала матчей (турнир начат до его появления).", ephemeral=True)
+                return
             
-            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+            stored = await brackets.load(tournament_id)
+            matches = stored is not None and replayed.same_state(stored)
+            embed = discord.Embed(
+                title=f"Журнал матчей турнира #{tournament_id}",
+                description="✅ Сетка совпадает с журналом" if matches else "❌ Сетка расходится с журналом",
+                color=0x2ECC71 if matches else 0xE74C3C
+            )
+            # Все события журнала применены к пустой сетке
+            embed.add_field(name="События", value=str(replayed.pending_events), inline=True)
+            embed.add_field(name="Последнее событие", value=f"#{replayed.event_id}", inline=True)
+            embed.add_field(name="Время", value=f"{elapsed:.1f} мс", inline=True)
+            if not matches:
+                logger.warning(f"Bracket of tournament {tournament_id} differs from its replayed match log")
+            await job.send(embed=embed, ephemeral=True)
             
-        else:
-            try:
-                # Reset match result
-                cursor.execute(
-                    "UPDATE tournament_matches SET team1_score = NULL, team2_score = NULL, notes = NULL, completed = 0, completion_date = NULL WHERE id = ?",
-                    (match_id,)
-                )
-                
-                # If this is a private tournament, update player stats
-                if match.get('player1_id') is not None and match.get('player2_id') is not None:
-                    # Determine winner from the match results
-                    player1_id = match['player1_id']
-                    player2_id = match['player2_id']
-                    
-                    if match['team1_score'] > match['team2_score']:
-                        winner_id = player1_id
-                        loser_id = player2_id
-                    elif match['team2_score'] > match['team1_score']:
-                        winner_id = player2_id
-                        loser_id = player1_id
-                    else:
-                        winner_id = None
-                        loser_id = None
-                    
-                    # If there was a winner, update stats
-                    if winner_id:
-                        # Update winner stats
-                        cursor.execute(
-                            "UPDATE players SET wins = wins - 1 WHERE user_id = ? AND wins > 0",
-                            (winner_id,)
-                        )
-                        
-                        # Update loser stats
-                        cursor.execute(
-                            "UPDATE players SET losses = losses - 1 WHERE user_id = ? AND losses > 0",
-                            (loser_id,)
-                        )
-                        
-                        # Remove from player_stats table
-                        cursor.execute(
-                            "DELETE FROM player_stats WHERE user_id IN (?, ?) AND tournament_id = ?",
-                            (winner_id, loser_id, match['tournament_id'])
-                        )
-                
-                db.commit()
-                
-                await interaction.response.send_message("Результат матча успешно отменен.", ephemeral=True)
-                
-            except Exception as e:
-                logger.error(f"Error undoing match result: {e}")
-                db.rollback()
-                await interaction.response.send_message("Произошла ошибка при отмене результата матча.", ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error replaying match log: {e}")
+            job.error = str(e)
+            await job.send("Произошла ошибка при проверке журнала матчей.", ephemeral=True)
+    
+    @app_commands.command(
+        name="job-status",
+        description="Показать состояние фоновых задач модерации"
+    )
+    @app_commands.describe(
+        job_id="ID задачи (по умолчанию - ваши последние задачи)"
+    )
+    async def job_status(self, interaction: discord.Interaction, job_id: Optional[int] = None):
+        # Verify permissions
+        if not await is_tournament_manager(interaction) and not await is_admin(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+            return
+        
+        if job_id is not None:
+            job = jobs.get(job_id)
+            if not job:
+                await interaction.response.send_message(f"Задача #{job_id} не найдена (возможно, бот был перезапущен).", ephemeral=True)
+                return
+            await interaction.response.send_message(job.describe(), ephemeral=True)
+            return
+        
+        recent = jobs.recent(interaction.user.id)
+        if not recent:
+            await interaction.response.send_message("У вас нет недавних задач.", ephemeral=True)
+            return
+        
+        embed = discord.Embed(title="Фоновые задачи", color=0x3498DB)
+        for job in recent:
+            embed.add_field(name=f"#{job.id} {job.name}", value=job.details(), inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Moderation(bot))
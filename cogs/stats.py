@@ -3,7 +3,14 @@ import logging
 from discord import app_commands
 from discord.ext import commands
 from typing import Optional
-from utils.db import get_db
+from utils.db import db, get_pool_stats
+from utils.models import Player
+from utils.outbox import outbox
+from utils.fanout import fanout
+from utils.resolver import resolver
+from utils.dedup import interaction_dedup
+from utils.bracket_engine import brackets
+from utils.permissions import is_admin
 from utils.constants import ACHIEVEMENT_DESCRIPTIONS
 
 logger = logging.getLogger(__name__)
@@ -17,13 +24,9 @@ class Stats(commands.Cog):
         description="Показать вашу личную статистику участия в турнирах"
     )
     async def mystats(self, interaction: discord.Interaction):
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Get basic stats
-            cursor.execute(
+            player = await db.fetchone(
                 """
                 SELECT username, wins, losses 
                 FROM players 
@@ -32,21 +35,18 @@ class Stats(commands.Cog):
                 (interaction.user.id,)
             )
             
-            player = cursor.fetchone()
-            
             if not player:
                 # Player not found, create record
-                cursor.execute(
+                await db.execute(
                     "INSERT INTO players (user_id, username) VALUES (?, ?)",
                     (interaction.user.id, interaction.user.name)
                 )
-                db.commit()
                 
                 await interaction.response.send_message("У вас пока нет статистики турниров.", ephemeral=True)
                 return
             
             # Get individual tournament stats (private tournaments)
-            cursor.execute(
+            private_stats = await db.fetchone(
                 """
                 SELECT COUNT(*) as tournaments_count,
                        SUM(CASE WHEN place = 1 THEN 1 ELSE 0 END) as first_places,
@@ -56,12 +56,10 @@ class Stats(commands.Cog):
                 WHERE user_id = ? AND tournament_type = 'private'
                 """,
                 (interaction.user.id,)
-            )
-            
-            private_stats = cursor.fetchone() or {'tournaments_count': 0, 'first_places': 0, 'second_places': 0, 'third_places': 0}
+            ) or {'tournaments_count': 0, 'first_places': 0, 'second_places': 0, 'third_places': 0}
             
             # Get team tournament stats (public tournaments)
-            cursor.execute(
+            public_stats = await db.fetchone(
                 """
                 SELECT COUNT(*) as tournaments_count,
                        SUM(CASE WHEN place = 1 THEN 1 ELSE 0 END) as first_places,
@@ -71,12 +69,10 @@ class Stats(commands.Cog):
                 WHERE user_id = ? AND tournament_type = 'public'
                 """,
                 (interaction.user.id,)
-            )
-            
-            public_stats = cursor.fetchone() or {'tournaments_count': 0, 'first_places': 0, 'second_places': 0, 'third_places': 0}
+            ) or {'tournaments_count': 0, 'first_places': 0, 'second_places': 0, 'third_places': 0}
                 
             # Get tournament participation history
-            cursor.execute(
+            participations = await db.fetchall(
                 """
                 SELECT t.name, ps.place, t.type, ps.tournament_type
                 FROM player_stats ps
@@ -88,8 +84,6 @@ class Stats(commands.Cog):
                 (interaction.user.id,)
             )
             
-            participations = cursor.fetchall()
-            
             # Create embed
             embed = discord.Embed(
                 title=f"📊 Статистика игрока {player['username']}",
@@ -159,13 +153,9 @@ class Stats(commands.Cog):
         description="Показать топ игроков по победам"
     )
     async def top_players(self, interaction: discord.Interaction):
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Get top players
-            cursor.execute(
+            top_players = await db.fetchall(
                 """
                 SELECT username, wins, losses, user_id
                 FROM players
@@ -175,8 +165,6 @@ class Stats(commands.Cog):
                 """
             )
             
-            top_players = cursor.fetchall()
-            
             if not top_players:
                 await interaction.response.send_message("Пока нет игроков с победами в турнирах.", ephemeral=True)
                 return
@@ -190,14 +178,13 @@ class Stats(commands.Cog):
             
             # Format top players list
             players_text = ""
-            for i, player in enumerate(top_players):
+            for i, player in enumerate(map(Player.from_row, top_players)):
                 medal = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else f"{i+1}."
                 
-                if player['wins'] + player['losses'] > 0:
-                    win_rate = round(player['wins'] / (player['wins'] + player['losses']) * 100, 1)
-                    players_text += f"{medal} **{player['username']}** - {player['wins']} побед ({win_rate}% винрейт)\n"
+                if player.wins + player.losses > 0:
+                    players_text += f"{medal} **{player.username}** - {player.wins} побед ({player.win_rate}% винрейт)\n"
                 else:
-                    players_text += f"{medal} **{player['username']}** - {player['wins']} побед\n"
+                    players_text += f"{medal} **{player.username}** - {player.wins} побед\n"
             
             embed.add_field(name="Лидеры", value=players_text, inline=False)
             
@@ -212,13 +199,9 @@ class Stats(commands.Cog):
         description="Показать ваши достижения в турнирах"
     )
     async def myachievements(self, interaction: discord.Interaction):
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Get player achievements
-            cursor.execute(
+            achievements = await db.fetchall(
                 """
                 SELECT a.id, a.name, a.description, pa.earned_date
                 FROM player_achievements pa
@@ -229,11 +212,8 @@ class Stats(commands.Cog):
                 (interaction.user.id,)
             )
             
-            achievements = cursor.fetchall()
-            
             # Get available achievements
-            cursor.execute("SELECT id, name, description FROM achievements ORDER BY id ASC")
-            all_achievements = cursor.fetchall()
+            all_achievements = await db.fetchall("SELECT id, name, description FROM achievements ORDER BY id ASC")
             
             # Create embed
             embed = discord.Embed(
@@ -270,5 +250,53 @@ class Stats(commands.Cog):
             logger.error(f"Error retrieving achievements: {e}")
             await interaction.response.send_message("Произошла ошибка при получении достижений.", ephemeral=True)
 
+    @app_commands.command(
+        name="db-stats",
+        description="Показать статистику пула подключений к базе данных (только для администраторов)"
+    )
+    async def db_stats(self, interaction: discord.Interaction):
+        # Check admin permissions
+        if not await is_admin(interaction):
+            await interaction.response.send_message("У вас нет прав для просмотра этой статистики!", ephemeral=True)
+            return
+        
+        stats = get_pool_stats()
+        
+        embed = discord.Embed(
+            title="🗄️ Пул подключений к базе данных",
+            color=0x3498DB  # Blue
+        )
+        
+        embed.add_field(name="Подключения", value=f"{stats['in_use']} занято / {stats['idle']} свободно / {stats['size']} макс.", inline=False)
+        embed.add_field(name="Попадания в пул", value=f"{stats['hits']} ({stats['hit_rate']}%)", inline=True)
+        embed.add_field(name="Новые подключения", value=str(stats['misses']), inline=True)
+        embed.add_field(name="Ожидания", value=f"{stats['waits']} (в среднем {stats['avg_wait_ms']} мс)", inline=True)
+        embed.add_field(name="Таймауты", value=str(stats['timeouts']), inline=True)
+        embed.add_field(name="Утечки", value=str(stats['leaks']), inline=True)
+        
+        # Статистика очереди запросов асинхронного слоя
+        queue = db.stats()
+        embed.add_field(name="Очередь запросов", value=f"{queue['pending']} в очереди (макс. {queue['max_pending']} / {queue['queue_size']})", inline=True)
+        embed.add_field(name="Выполнено запросов", value=f"{queue['statements']} ({queue['transactions']} транзакций)", inline=True)
+        embed.add_field(name="Ошибки запросов", value=str(queue['errors']), inline=True)
+        deliveries = outbox.stats()
+        embed.add_field(name="Outbox", value=f"{deliveries['delivered']} доставлено, {deliveries['retried']} повторов, {deliveries['failed']} ошибок", inline=False)
+        depth = await outbox.queue_depth()
+        busiest = max(depth['channels'].values(), default=0)
+        embed.add_field(name="Очередь отправки", value=f"{depth['pending']} ожидают, {deliveries['queued']} в очередях каналов (макс. {busiest}), {deliveries['merged']} объединено, {deliveries['throttled']} приторможено", inline=False)
+        embed.add_field(name="Задержка доставки", value=f"{deliveries['latency_avg']:.1f} с в среднем, {deliveries['latency_max']:.1f} с макс.", inline=False)
+        embed.add_field(name="Сэкономлено правок", value=f"{deliveries['edits_coalesced']} объединено, {deliveries['edits_unchanged']} без изменений", inline=False)
+        dms = fanout.stats()
+        embed.add_field(name="Рассылка в ЛС", value=f"{dms['delivered']} доставлено, {dms['failed']} ошибок, {dms['skipped']} пропущено (закрытые ЛС), {dms['rate_limited']} 429", inline=False)
+        users = resolver.stats()
+        embed.add_field(name="Кэш пользователей", value=f"{users['hits']} попаданий ({users['gateway_hits']} gateway), {users['misses']} промахов, {users['rest_calls']} REST, {users['negative_hits']} отрицательных", inline=False)
+        seen = interaction_dedup.stats()
+        embed.add_field(name="Дедупликация взаимодействий", value=f"{seen['claimed']} новых, {seen['duplicates']} повторов, {seen['cached']} в памяти ({seen['backend']})", inline=False)
+        trees = brackets.stats()
+        embed.add_field(name="Сетки турниров", value=f"{trees['cached']} в памяти, {trees['hits']} попаданий, {trees['loads']} загрузок, {trees['rebuilds']} восстановлено по матчам", inline=False)
+        embed.add_field(name="WAL", value=f"{queue['wal_size'] // 1024} КБ, {queue['checkpoints']} чекпоинтов ({queue['checkpoint_busy']} заблокировано)", inline=False)
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(Stats(bot))
@@ -3,15 +3,26 @@ import logging
 import asyncio
 import datetime
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 from typing import Optional, List
-from utils.db import get_db, create_tables
+from utils.db import db
 from utils.embeds import (
     create_private_tournament_embed, 
     create_public_tournament_embed,
     create_tournament_notification_embed
 )
 from utils.brackets import generate_tournament_bracket
+from utils.bracket_engine import brackets, create_matches
+from utils.seeding import seed_entrants
+from utils.models import Tournament
+from utils.scheduler import scheduler, parse_tournament_date, NOTIFY, DEADLINE, START
+from utils.outbox import outbox, HIGH
+from utils.fanout import fanout
+from utils.dedup import interaction_dedup
+from utils.locks import tournament_locks
+from utils.registration import add_participant, ALREADY_JOINED, NOT_FOUND, FULL
+from utils.announcements import register_message, refresh_announcement, recover_announcements, announced_tournament_id
+from utils.components import ActionButton, action, build_view, dispatch
 from utils.permissions import is_tournament_manager, is_admin
 from utils.constants import (
     TOURNAMENT_APPROVAL_CHANNEL, 
@@ -22,211 +33,189 @@ from utils.constants import (
 
 logger = logging.getLogger(__name__)
 
-class TournamentView(discord.ui.View):
-    def __init__(self, tournament_id: int, type_: str):
-        super().__init__(timeout=None)
-        self.tournament_id = tournament_id
-        self.type = type_
+# Действия кнопок, custom_id имеет вид "<действие>:<id турнира>"
+JOIN = 'join'
+APPROVE = 'approve'
+REJECT = 'reject'
+
+def tournament_view(tournament_id: int) -> discord.ui.View:
+    """Buttons of a tournament announcement."""
+    return build_view(
+        ActionButton(JOIN, tournament_id, label="Участвовать", style=discord.ButtonStyle.primary)
+    )
+
+def approval_view(tournament_id: int, disabled: bool = False) -> discord.ui.View:
+    """Buttons of a tournament request in the moderation channel."""
+    return build_view(
+        ActionButton(APPROVE, tournament_id, label="✅ Одобрить", style=discord.ButtonStyle.green, disabled=disabled),
+        ActionButton(REJECT, tournament_id, label="❌ Отклонить", style=discord.ButtonStyle.red, disabled=disabled)
+    )
+
+@action(JOIN)
+async def join_tournament(interaction: discord.Interaction, tournament_id: int):
+    # Сначала подтвердим получение взаимодействия
+    await interaction.response.defer(ephemeral=True)
+    
+    try:
+        # Проверка мест и запись выполняются под блокировкой турнира, иначе параллельные нажатия переполняют турнир
+        async with tournament_locks.hold(tournament_id):
+            outcome = await add_participant(
+                tournament_id, interaction.user.id, interaction.user.display_name,
+                on_join=lambda tx: refresh_announcement(tournament_id, tx=tx)
+            )
         
-    @discord.ui.button(label="Участвовать", style=discord.ButtonStyle.primary, custom_id="join_tournament")
-    async def join_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Сначала подтвердим получение взаимодействия
-        await interaction.response.defer(ephemeral=True)
+        if outcome == ALREADY_JOINED:
+            await interaction.followup.send("Вы уже зарегистрированы на этот турнир!", ephemeral=True)
+            return
+        if outcome == NOT_FOUND:
+            await interaction.followup.send("Ошибка: турнир не найден или данные повреждены.", ephemeral=True)
+            return
+        if outcome == FULL:
+            await interaction.followup.send("Турнир уже заполнен!", ephemeral=True)
+            return
         
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
+        # Get entry fee
+        fee_result = await db.fetchone("SELECT entry_fee FROM tournaments WHERE id = ?", (tournament_id,))
+        entry_fee = fee_result.get('entry_fee', 0) if fee_result else 0
         
-        try:
-            # Check if user is already registered
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ? AND user_id = ?",
-                (self.tournament_id, interaction.user.id)
-            )
-            
-            result = cursor.fetchone()
-            if result and result.get('count', 0) > 0:
-                await interaction.followup.send("Вы уже зарегистрированы на этот турнир!", ephemeral=True)
-                return
-                
-            # First get max participants from the tournament
-            cursor.execute(
-                "SELECT max_participants FROM tournaments WHERE id = ?",
-                (self.tournament_id,)
-            )
-            tournament_info = cursor.fetchone()
-            if not tournament_info or 'max_participants' not in tournament_info:
-                await interaction.followup.send("Ошибка: турнир не найден или данные повреждены.", ephemeral=True)
-                return
-                
-            max_participants = tournament_info['max_participants']
-                
-            # Then check participant count
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
-                (self.tournament_id,)
+        if entry_fee > 0:
+            await interaction.followup.send(
+                f"Вы успешно зарегистрированы! Пожалуйста, передайте вступительный взнос в размере {entry_fee}$ организатору турнира перед началом.", 
+                ephemeral=True
             )
-            
-            participant_result = cursor.fetchone()
-            participant_count = participant_result.get('count', 0) if participant_result else 0
-            
-            if participant_count >= max_participants:
-                await interaction.followup.send("Турнир уже заполнен!", ephemeral=True)
-                return
+        else:
+            await interaction.followup.send("Вы успешно зарегистрированы на турнир!", ephemeral=True)
                 
-            # Add player to tournament
-            # First ensure player exists in players table
-            cursor.execute(
-                "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
-                (interaction.user.id, interaction.user.display_name)
-            )
-            
-            # Then add to tournament participants
-            cursor.execute(
-                "INSERT INTO tournament_participants (tournament_id, user_id, join_date) VALUES (?, ?, ?)",
-                (self.tournament_id, interaction.user.id, datetime.datetime.now())
-            )
-            
-            db.commit()
-            
-            # Get entry fee
-            cursor.execute("SELECT entry_fee FROM tournaments WHERE id = ?", (self.tournament_id,))
-            fee_result = cursor.fetchone()
-            entry_fee = fee_result.get('entry_fee', 0) if fee_result else 0
-            
-            if entry_fee > 0:
-                await interaction.followup.send(
-                    f"Вы успешно зарегистрированы! Пожалуйста, передайте вступительный взнос в размере {entry_fee}$ организатору турнира перед началом.", 
-                    ephemeral=True
-                )
-            else:
-                await interaction.followup.send("Вы успешно зарегистрированы на турнир!", ephemeral=True)
-                
-            # Update tournament embed
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
-                (self.tournament_id,)
-            )
-            current_result = cursor.fetchone()
-            current_participants = current_result.get('count', 0) if current_result else 0
-            
-            # Find the original message to edit it
-            channel = interaction.channel
-            if channel:
-                async for message in channel.history(limit=100):
-                    if message.author.id == interaction.client.user.id and len(message.embeds) > 0:
-                        embed = message.embeds[0]
-                        for i, field in enumerate(embed.fields):
-                            if field.name == "Участники":
-                                embed.set_field_at(
-                                    index=i,
-                                    name="Участники",
-                                    value=f"{current_participants}/{max_participants}",
-                                    inline=True
-                                )
-                                await message.edit(embed=embed)
-                                break
-                        break
-                    
-        except Exception as e:
-            logger.error(f"Error registering user for tournament: {e}")
-            db.rollback()
-            await interaction.followup.send("Произошла ошибка при регистрации. Пожалуйста, попробуйте позже.", ephemeral=True)
+    except Exception as e:
+        logger.error(f"Error registering user for tournament: {e}")
+        await interaction.followup.send("Произошла ошибка при регистрации. Пожалуйста, попробуйте позже.", ephemeral=True)
 
 
-class ApprovalView(discord.ui.View):
-    def __init__(self, tournament_id: int, bot: commands.Bot):
-        super().__init__(timeout=None)
-        self.tournament_id = tournament_id
-        self.bot = bot
-        
-    @discord.ui.button(label="✅ Одобрить", style=discord.ButtonStyle.green, custom_id="approve_tournament")
-    async def approve_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Сначала отложим ответ на взаимодействие
-        await interaction.response.defer(ephemeral=True)
-        
-        # Verify permissions
-        if not await is_tournament_manager(interaction):
-            await interaction.followup.send("У вас нет прав для этого действия!", ephemeral=True)
-            return
-            
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
+@action(APPROVE)
+async def approve_tournament(interaction: discord.Interaction, tournament_id: int):
+    # Сначала отложим ответ на взаимодействие
+    await interaction.response.defer(ephemeral=True)
+    
+    # Verify permissions
+    if not await is_tournament_manager(interaction):
+        await interaction.followup.send("У вас нет прав для этого действия!", ephemeral=True)
+        return
         
-        try:
+    try:
+        async with db.transaction() as tx:
             # Update tournament status
-            cursor.execute(
+            await tx.execute(
                 "UPDATE tournaments SET status = 'approved', approved_by = ? WHERE id = ?",
-                (interaction.user.id, self.tournament_id)
+                (interaction.user.id, tournament_id)
             )
             
             # Get tournament details
-            cursor.execute(
+            tournament = await tx.fetchone(
                 """
                 SELECT t.*, u.username as creator_name 
                 FROM tournaments t
                 JOIN players u ON t.creator_id = u.user_id
                 WHERE t.id = ?
                 """,
-                (self.tournament_id,)
-            )
-            
-            tournament = cursor.fetchone()
-            if not tournament:
-                await interaction.followup.send("Ошибка: турнир не найден.", ephemeral=True)
-                return
-                
-            db.commit()
-            
-            # Find the right channel to post the tournament in
-            if tournament.get('type') == 'private':
-                channel_id = PRIVATE_TOURNAMENTS_CHANNEL
-                embed = create_private_tournament_embed(tournament)
-            else:
-                channel_id = PUBLIC_TOURNAMENTS_CHANNEL
-                embed = create_public_tournament_embed(tournament)
-            
-            channel = self.bot.get_channel(channel_id)
-            if not channel:
-                logger.error(f"Could not find channel with ID {channel_id}")
-                await interaction.followup.send("Канал для публикации турнира не найден!", ephemeral=True)
-                return
-                
-            # Post the tournament in the appropriate channel
-            await channel.send(
-                embed=embed,
-                view=TournamentView(tournament_id=self.tournament_id, type_=tournament.get('type', 'private'))
+                (tournament_id,)
             )
+        
+        # Ставим напоминание, проверку участников и старт в планировщик
+        await scheduler.refresh(tournament_id)
             
-            # Disable the buttons and edit the message
-            for child in self.children:
-                child.disabled = True
-                
-            if interaction.message:
-                await interaction.message.edit(view=self)
-            
-            await interaction.followup.send("Турнир одобрен и опубликован!", ephemeral=True)
+        if not tournament:
+            await interaction.followup.send("Ошибка: турнир не найден.", ephemeral=True)
+            return
+        
+        # Find the right channel to post the tournament in
+        if tournament.get('type') == 'private':
+            channel_id = PRIVATE_TOURNAMENTS_CHANNEL
+            embed = create_private_tournament_embed(tournament)
+        else:
+            channel_id = PUBLIC_TOURNAMENTS_CHANNEL
+            embed = create_public_tournament_embed(tournament)
+        
+        channel = interaction.client.get_channel(channel_id)
+        if not channel:
+            logger.error(f"Could not find channel with ID {channel_id}")
+            await interaction.followup.send("Канал для публикации турнира не найден!", ephemeral=True)
+            return
             
-        except Exception as e:
-            logger.error(f"Error approving tournament: {e}")
-            db.rollback()
-            await interaction.followup.send("Произошла ошибка при одобрении турнира.", ephemeral=True)
+        # Post the tournament in the appropriate channel
+        message = await channel.send(embed=embed, view=tournament_view(tournament_id))
+        
+        # Запоминаем сообщение анонса, чтобы обновлять его без поиска по истории канала
+        await register_message(tournament_id, channel.id, message.id)
+        
+        # Disable the buttons and edit the message
+        if interaction.message:
+            await interaction.message.edit(view=approval_view(tournament_id, disabled=True))
+        
+        await interaction.followup.send("Турнир одобрен и опубликован!", ephemeral=True)
+        
+    except Exception as e:
+        logger.error(f"Error approving tournament: {e}")
+        await interaction.followup.send("Произошла ошибка при одобрении турнира.", ephemeral=True)
+
+@action(REJECT)
+async def reject_tournament(interaction: discord.Interaction, tournament_id: int):
+    # Verify permissions
+    if not await is_tournament_manager(interaction):
+        await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+        return
+        
+    # Create a modal for rejection reason
+    try:
+        modal = RejectTournamentModal(tournament_id)
+        await interaction.response.send_modal(modal)
+    except Exception as e:
+        logger.error(f"Error sending rejection modal: {e}")
+        await interaction.response.send_message("Произошла ошибка при отклонении турнира.", ephemeral=True)
+
+
+class LegacyTournamentView(discord.ui.View):
+    """
+    Buttons posted before custom_ids carried the tournament id.
     
+    Registered once with bot.add_view; the tournament is recovered from the
+    message and the click is routed to the same handlers as ActionButton.
+    """
+    def __init__(self):
+        super().__init__(timeout=None)
+        
+    async def route(self, interaction: discord.Interaction, name: str, tournament_id: Optional[int]):
+        if tournament_id is None:
+            logger.warning(f"Could not resolve tournament of legacy {name} button on message {interaction.message.id}")
+            await interaction.response.send_message("Не удалось определить турнир этой кнопки.", ephemeral=True)
+            return
+        await dispatch(interaction, name, tournament_id)
+        
+    async def request_tournament_id(self, message) -> Optional[int]:
+        """Find the pending tournament of an old moderation request by its name."""
+        for embed in message.embeds:
+            name = next((field.value for field in embed.fields if field.name == "Название"), None)
+            if name is None:
+                continue
+            rows = await db.fetchall(
+                "SELECT id FROM tournaments WHERE status = 'pending' AND name = ?",
+                (name,)
+            )
+            # Одноимённые заявки различить нельзя
+            if len(rows) == 1:
+                return rows[0]['id']
+        return None
+        
+    @discord.ui.button(label="Участвовать", style=discord.ButtonStyle.primary, custom_id="join_tournament")
+    async def join_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.route(interaction, JOIN, announced_tournament_id(interaction.message))
+        
+    @discord.ui.button(label="✅ Одобрить", style=discord.ButtonStyle.green, custom_id="approve_tournament")
+    async def approve_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.route(interaction, APPROVE, await self.request_tournament_id(interaction.message))
+        
     @discord.ui.button(label="❌ Отклонить", style=discord.ButtonStyle.red, custom_id="reject_tournament")
     async def reject_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
-        # Verify permissions
-        if not await is_tournament_manager(interaction):
-            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
-            return
-            
-        # Create a modal for rejection reason
-        try:
-            modal = RejectTournamentModal(self.tournament_id, self)
-            await interaction.response.send_modal(modal)
-        except Exception as e:
-            logger.error(f"Error sending rejection modal: {e}")
-            await interaction.response.send_message("Произошла ошибка при отклонении турнира.", ephemeral=True)
+        await self.route(interaction, REJECT, await self.request_tournament_id(interaction.message))
 
 
 class RejectTournamentModal(discord.ui.Modal):
@@ -238,39 +227,35 @@ class RejectTournamentModal(discord.ui.Modal):
         max_length=1000
     )
     
-    def __init__(self, tournament_id: int, view: ApprovalView):
+    def __init__(self, tournament_id: int):
         super().__init__(title="Причина отклонения")
         self.tournament_id = tournament_id
-        self.approval_view = view
         
     async def on_submit(self, interaction: discord.Interaction):
         # Сначала отложим ответ на взаимодействие
         await interaction.response.defer(ephemeral=True)
         
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
-            # Update tournament status
-            cursor.execute(
-                "UPDATE tournaments SET status = 'rejected', rejection_reason = ? WHERE id = ?",
-                (self.reason.value, self.tournament_id)
-            )
-            
-            # Get tournament creator to notify them
-            cursor.execute(
-                "SELECT creator_id FROM tournaments WHERE id = ?",
-                (self.tournament_id,)
-            )
+            async with db.transaction() as tx:
+                # Update tournament status
+                await tx.execute(
+                    "UPDATE tournaments SET status = 'rejected', rejection_reason = ? WHERE id = ?",
+                    (self.reason.value, self.tournament_id)
+                )
+                
+                # Get tournament creator to notify them
+                result = await tx.fetchone(
+                    "SELECT creator_id FROM tournaments WHERE id = ?",
+                    (self.tournament_id,)
+                )
             
-            result = cursor.fetchone()
+            await scheduler.refresh(self.tournament_id)
+                
             if not result or 'creator_id' not in result:
                 await interaction.followup.send("Ошибка: турнир не найден или данные повреждены.", ephemeral=True)
                 return
                 
             creator_id = result['creator_id']
-            db.commit()
             
             # Create rejection embed
             embed = discord.Embed(
@@ -282,176 +267,180 @@ class RejectTournamentModal(discord.ui.Modal):
             embed.add_field(name="Причина отклонения:", value=self.reason.value)
             
             # Notify creator via DM
-            try:
-                creator = await interaction.client.fetch_user(creator_id)
-                if creator:
-                    await creator.send(embed=embed)
-            except Exception as e:
-                logger.error(f"Could not send DM to user {creator_id}: {e}")
+            await fanout.send(interaction.client, [creator_id], f"tournament-reject:{self.tournament_id}", embed=embed)
             
             # Disable the buttons and edit the message
             if interaction.message:
-                for child in self.approval_view.children:
-                    child.disabled = True
-                await interaction.message.edit(view=self.approval_view)
+                await interaction.message.edit(view=approval_view(self.tournament_id, disabled=True))
             
             await interaction.followup.send("Турнир отклонен, создатель уведомлен о причине.", ephemeral=True)
             
         except Exception as e:
             logger.error(f"Error rejecting tournament: {e}")
-            db.rollback()
             await interaction.followup.send("Произошла ошибка при отклонении турнира.", ephemeral=True)
 
-
 class Tournaments(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        create_tables()  # Initialize database tables
-        self.processed_interactions = set()  # Для отслеживания обработанных взаимодействий
-        self.check_upcoming_tournaments.start()
-        
-    def cog_unload(self):
-        self.check_upcoming_tournaments.cancel()
+        self.scheduler_task = None
     
-    @tasks.loop(minutes=1)  # Уменьшим интервал для быстрого тестирования
-    async def check_upcoming_tournaments(self):
-        """Check for tournaments starting soon and send notifications."""
-        logger.info("Running check_upcoming_tournaments task...")
-        db = get_db()
-        cursor = db.cursor()
-        
-        now = datetime.datetime.now()
-        logger.info(f"Current time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Логируем состояние турнира 10000
-        cursor.execute(
-            "SELECT id, name, status, tournament_date, started FROM tournaments WHERE id = 10000"
-        )
-        tournament_10000 = cursor.fetchone()
-        if tournament_10000:
-            logger.info(f"Tournament 10000 status: {tournament_10000}")
+    async def cog_load(self):
+        # Планировщик спит до ближайшего дедлайна вместо ежеминутного опроса БД
+        await scheduler.load()
+        self.scheduler_task = asyncio.create_task(self.run_scheduler())
         
-        # 0. Проверка одобренных турниров на недостаточное количество участников
-        await self.check_approved_tournaments_participants()
+        # Кнопки всех турниров обрабатывает один динамический элемент, в том числе после перезапуска
+        self.bot.add_dynamic_items(ActionButton)
+        self.bot.add_view(LegacyTournamentView())
         
-        # 1. Get tournaments starting in the next 15 minutes (for notifications)
-        notification_threshold = now + datetime.timedelta(minutes=15)
-        
-        cursor.execute(
+    def cog_unload(self):
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+        self.bot.remove_dynamic_items(ActionButton)
+    
+    async def run_scheduler(self):
+        """Wait until the bot is ready, then process tournament deadlines as they come due."""
+        await self.bot.wait_until_ready()
+        logger.info(f"Tournament scheduler started with {len(scheduler)} pending deadlines")
+        await scheduler.run(self.handle_deadline)
+    
+    async def handle_deadline(self, kind: str, tournament_id: int):
+        """Dispatch a due deadline from the scheduler."""
+        logger.info(f"Deadline {kind} reached for tournament {tournament_id}")
+        if kind == NOTIFY:
+            await self.notify_tournament(tournament_id)
+        elif kind == DEADLINE:
+            await self.check_tournament_participants(tournament_id)
+        elif kind == START:
+            await self.start_tournament(tournament_id)
+    
+    async def notify_tournament(self, tournament_id: int):
+        """Send the 15 minute reminder for a tournament."""
+        tournament = await db.fetchone(
             """
             SELECT t.*, u.username as creator_name 
             FROM tournaments t
             JOIN players u ON t.creator_id = u.user_id
-            WHERE t.tournament_date BETWEEN ? AND ?
+            WHERE t.id = ?
             AND t.status = 'approved'
             AND t.notification_sent = 0
             """,
-            (now.strftime('%Y-%m-%d %H:%M:%S'), notification_threshold.strftime('%Y-%m-%d %H:%M:%S'))
+            (tournament_id,)
         )
+        if not tournament:
+            return
         
-        upcoming_tournaments = cursor.fetchall()
+        # Get the appropriate channel
+        if tournament['type'] == 'private':
+            channel_id = PRIVATE_TOURNAMENTS_CHANNEL
+        else:
+            channel_id = PUBLIC_TOURNAMENTS_CHANNEL
         
-        for tournament in upcoming_tournaments:
+        async with db.transaction() as tx:
             # Mark notification as sent
-            cursor.execute(
+            await tx.execute(
                 "UPDATE tournaments SET notification_sent = 1 WHERE id = ?",
                 (tournament['id'],)
             )
             
             # Get participants to mention
-            cursor.execute(
+            participants = await tx.fetchall(
                 "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
                 (tournament['id'],)
             )
-            
-            participants = cursor.fetchall()
             participant_mentions = " ".join([f"<@{p['user_id']}>" for p in participants])
             
-            # Get the appropriate channel
-            if tournament['type'] == 'private':
-                channel_id = PRIVATE_TOURNAMENTS_CHANNEL
-            else:
-                channel_id = PUBLIC_TOURNAMENTS_CHANNEL
+            # Уведомление уходит через outbox вместе с отметкой notification_sent
+            await outbox.send(
+                tx,
+                channel_id,
+                content=f"**ВНИМАНИЕ! ТУРНИР СКОРО НАЧНЕТСЯ!** {participant_mentions}",
+                embeds=[create_tournament_notification_embed(tournament)],
+                dedup_key=f"tournament-notify:{tournament['id']}",
+                priority=HIGH
+            )
+    
+    async def start_tournament(self, tournament_id: int):
+        """Start a tournament whose start time has come: create the first round or cancel it."""
+        # Статус меняется под блокировкой турнира, как и в остальных изменениях сетки
+        async with tournament_locks.hold(tournament_id):
+            tournament = await db.fetchone(
+                """
+                SELECT t.*, u.username as creator_name 
+                FROM tournaments t
+                LEFT JOIN players u ON t.creator_id = u.user_id
+                WHERE t.id = ?
+                AND t.status = 'approved'
+                AND t.started = 0
+                """,
+                (tournament_id,)
+            )
+            if not tournament:
+                return
             
-            channel = self.bot.get_channel(channel_id)
-            if channel:
-                embed = create_tournament_notification_embed(tournament)
-                await channel.send(content=f"**ВНИМАНИЕ! ТУРНИР СКОРО НАЧНЕТСЯ!** {participant_mentions}", embed=embed)
-        
-        # 2. Get tournaments that should have started but status is still 'approved'
-        # Сначала проверим, есть ли турниры, которые должны начаться
-        cursor.execute(
-            """
-            SELECT id, name, tournament_date
-            FROM tournaments 
-            WHERE tournament_date <= ?
-            AND status = 'approved'
-            AND started = 0
-            """,
-            (now.strftime('%Y-%m-%d %H:%M:%S'),)
-        )
-        
-        pending_tournaments = cursor.fetchall()
-        
-        logger.info(f"Found {len(pending_tournaments)} tournaments that should start: {pending_tournaments}")
-        
-        # Теперь получим полную информацию с данными создателя
-        cursor.execute(
-            """
-            SELECT t.*, u.username as creator_name 
-            FROM tournaments t
-            LEFT JOIN players u ON t.creator_id = u.user_id
-            WHERE t.tournament_date <= ?
-            AND t.status = 'approved'
-            AND t.started = 0
-            """,
-            (now.strftime('%Y-%m-%d %H:%M:%S'),)
-        )
-        
-        started_tournaments = cursor.fetchall()
-        logger.info(f"After JOIN with players: {len(started_tournaments)} tournaments")
-        
-        for tournament in started_tournaments:
             logger.info(f"Starting tournament {tournament['id']} - {tournament['name']}")
             
             try:
-                # Mark tournament as started
-                cursor.execute(
-                    "UPDATE tournaments SET started = 1, status = 'in_progress' WHERE id = ?",
-                    (tournament['id'],)
-                )
-                
                 # Выберем канал для коммуникации в зависимости от типа турнира
                 if tournament['type'] == 'private':
                     channel_id = PRIVATE_TOURNAMENTS_CHANNEL
                 else:
                     channel_id = PUBLIC_TOURNAMENTS_CHANNEL
-                                
-                # Получаем всех участников турнира
-                cursor.execute(
-                    "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
-                    (tournament['id'],)
-                )
                 
-                participants = cursor.fetchall()
+                # Чего не хватило для начала турнира: 'participants' / 'teams'
+                not_enough = None
                 
-                # Need at least 2 participants for a tournament
-                if len(participants) < 2:
-                    logger.warning(f"Tournament {tournament['id']} has less than 2 participants, cancelling")
+                async with db.transaction() as tx:
+                    # Mark tournament as started
+                    await tx.execute(
+                        "UPDATE tournaments SET started = 1, status = 'in_progress' WHERE id = ?",
+                        (tournament['id'],)
+                    )
                     
-                    # Отменяем турнир из-за недостаточного количества участников
-                    cursor.execute(
-                        "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
-                        ("Недостаточно участников для начала турнира", tournament['id'])
+                    # Получаем всех участников турнира
+                    participants = await tx.fetchall(
+                        "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
+                        (tournament['id'],)
                     )
                     
-                    # Фиксируем транзакцию
-                    db.commit()
+                    # Need at least 2 participants for a tournament
+                    if len(participants) < 2:
+                        logger.warning(f"Tournament {tournament['id']} has less than 2 participants, cancelling")
+                        not_enough = 'participants'
+                    
+                    # Начинаем создание матчей в зависимости от типа турнира
+                    elif tournament['type'] == 'private':
+                        # Участники расставляются по посеву турнира, лишние места сетки - пропуски игры у верхних номеров
+                        participant_ids = await seed_entrants(tx, Tournament.from_row(tournament))
+                        bracket = await brackets.start(tx, tournament['id'], participant_ids)
+                        await create_matches(tx, bracket, bracket.playable())
+                        await brackets.save(tx, bracket)
                     
-                    # Отправляем уведомление об отмене турнира
-                    channel = self.bot.get_channel(channel_id)
+                    # For public tournaments (team-based)
+                    else:
+                        teams = await tx.fetchall(
+                            "SELECT id, team_name FROM tournament_teams WHERE tournament_id = ?",
+                            (tournament['id'],)
+                        )
+                        
+                        # Need at least 2 teams for a tournament
+                        if len(teams) < 2:
+                            logger.warning(f"Tournament {tournament['id']} has less than 2 teams, cancelling")
+                            not_enough = 'teams'
+                        else:
+                            team_ids = await seed_entrants(tx, Tournament.from_row(tournament))
+                            bracket = await brackets.start(tx, tournament['id'], team_ids, is_team=True)
+                            await create_matches(tx, bracket, bracket.playable())
+                            await brackets.save(tx, bracket)
                     
-                    if channel:
+                    if not_enough == 'participants':
+                        # Отменяем турнир из-за недостаточного количества участников
+                        await tx.execute(
+                            "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
+                            ("Недостаточно участников для начала турнира", tournament['id'])
+                        )
+                        
+                        # Уведомление об отмене ставим в outbox в той же транзакции
                         embed = discord.Embed(
                             title=f"❌ Турнир отменен: {tournament['name']}",
                             description=f"Турнир был автоматически отменен из-за недостаточного количества участников.",
@@ -468,119 +457,55 @@ class Tournaments(commands.Cog):
                         mentions = ' '.join([f"<@{p['user_id']}>" for p in participants])
                         if tournament.get('creator_id'):
                             mentions += f" <@{tournament['creator_id']}>"
-                            
-                        await channel.send(content=f"**ВНИМАНИЕ! ТУРНИР ОТМЕНЕН!** {mentions}", embed=embed)
-                        
-                    # Пропускаем дальнейшую обработку этого турнира
-                    continue
-
-                # Начинаем создание матчей в зависимости от типа турнира
-                if tournament['type'] == 'private':
-                    
-                    # Create initial matches for the first round - shuffle participants for random matchmaking
-                    import random
-                    participant_ids = [p['user_id'] for p in participants]
-                    random.shuffle(participant_ids)
-                    
-                    # Create matches by pairing participants
-                    for i in range(0, len(participant_ids), 2):
-                        if i + 1 < len(participant_ids):  # Make sure we have a pair
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, player1_id, player2_id, creation_date)
-                                VALUES (?, 1, ?, ?, ?)
-                                """,
-                                (
-                                    tournament['id'], 
-                                    participant_ids[i], 
-                                    participant_ids[i+1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        else:  # Odd number of participants, one gets a bye
-                            # In the future, implement proper bye handling
-                            logger.info(f"Player {participant_ids[i]} gets a bye in first round")
-                
-                # For public tournaments (team-based)
-                else:
-                    cursor.execute(
-                        "SELECT id, team_name FROM tournament_teams WHERE tournament_id = ?",
-                        (tournament['id'],)
-                    )
-                    
-                    teams = cursor.fetchall()
-                    
-                    # Need at least 2 teams for a tournament
-                    if len(teams) < 2:
-                        logger.warning(f"Tournament {tournament['id']} has less than 2 teams, cancelling")
                         
+                        await outbox.send(
+                            tx,
+                            channel_id,
+                            content=f"**ВНИМАНИЕ! ТУРНИР ОТМЕНЕН!** {mentions}",
+                            embeds=[embed],
+                            dedup_key=f"tournament-cancel:{tournament['id']}",
+                            priority=HIGH
+                        )
+                    elif not_enough == 'teams':
                         # Отменяем турнир из-за недостаточного количества команд
-                        cursor.execute(
+                        await tx.execute(
                             "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
                             ("Недостаточно команд для начала турнира", tournament['id'])
                         )
                         
-                        # Отправляем уведомление об отмене турнира
-                        channel_id = PUBLIC_TOURNAMENTS_CHANNEL
-                        channel = self.bot.get_channel(channel_id)
+                        embed = discord.Embed(
+                            title=f"❌ Турнир отменен: {tournament['name']}",
+                            description=f"Турнир был автоматически отменен из-за недостаточного количества команд.",
+                            color=0xE74C3C  # Red
+                        )
                         
-                        if channel:
-                            embed = discord.Embed(
-                                title=f"❌ Турнир отменен: {tournament['name']}",
-                                description=f"Турнир был автоматически отменен из-за недостаточного количества команд.",
-                                color=0xE74C3C  # Red
-                            )
-                            
-                            # Уведомляем о проблеме и упоминаем создателя
-                            mentions = ""
-                            if tournament.get('creator_id'):
-                                mentions = f"<@{tournament['creator_id']}>"
-                                
-                            await channel.send(mentions, embed=embed)
-                            
-                        # Пропускаем дальнейшую обработку этого турнира
-                        continue
-                    
-                    # Create initial matches for the first round - shuffle teams for random matchmaking
-                    import random
-                    team_ids = [t['id'] for t in teams]
-                    random.shuffle(team_ids)
-                    
-                    # Create matches by pairing teams
-                    for i in range(0, len(team_ids), 2):
-                        if i + 1 < len(team_ids):  # Make sure we have a pair
-                            cursor.execute(
-                                """
-                                INSERT INTO tournament_matches 
-                                (tournament_id, round, team1_id, team2_id, creation_date)
-                                VALUES (?, 1, ?, ?, ?)
-                                """,
-                                (
-                                    tournament['id'], 
-                                    team_ids[i], 
-                                    team_ids[i+1],
-                                    datetime.datetime.now()
-                                )
-                            )
-                        else:  # Odd number of teams, one gets a bye
-                            # In the future, implement proper bye handling
-                            logger.info(f"Team {team_ids[i]} gets a bye in first round") 
-                
-                # Вначале убедимся, что есть матчи для турнира
-                # Проверим, сколько матчей создалось
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ?",
-                    (tournament['id'],)
-                )
-                match_count = cursor.fetchone()['count']
-                logger.info(f"Created {match_count} matches for tournament {tournament['id']}")
+                        # Уведомляем о проблеме и упоминаем создателя
+                        mentions = ""
+                        if tournament.get('creator_id'):
+                            mentions = f"<@{tournament['creator_id']}>"
+                        
+                        await outbox.send(
+                            tx,
+                            PUBLIC_TOURNAMENTS_CHANNEL,
+                            content=mentions,
+                            embeds=[embed],
+                            dedup_key=f"tournament-cancel:{tournament['id']}",
+                            priority=HIGH
+                        )
+                    else:
+                        # Проверим, сколько матчей создалось
+                        match_count = (await tx.fetchone(
+                            "SELECT COUNT(*) as count FROM tournament_matches WHERE tournament_id = ?",
+                            (tournament['id'],)
+                        ))['count']
+                        logger.info(f"Created {match_count} matches for tournament {tournament['id']}")
                 
-                # Зафиксируем транзакцию, чтобы матчи стали доступны для следующего запроса
-                db.commit()
+                if not_enough:
+                    # Турнир отменен, уведомление уже в outbox
+                    return
                 
                 # Генерируем турнирную сетку
-                success, bracket = generate_tournament_bracket(tournament['id'])
+                success, bracket = await generate_tournament_bracket(tournament['id'])
                 
                 # Логируем успешное создание турнирной сетки
                 logger.info(f"Tournament {tournament['id']} - {tournament['name']} bracket generation: {success}")
@@ -591,8 +516,6 @@ class Tournaments(commands.Cog):
                         channel_id = PRIVATE_TOURNAMENTS_CHANNEL
                     else:
                         channel_id = PUBLIC_TOURNAMENTS_CHANNEL
-                        
-                    channel = self.bot.get_channel(channel_id)
                     
                     # Получаем тип матчей (BO1, BO3 и т.д.)
                     match_type = tournament.get('match_type', 'BO1')
@@ -609,12 +532,10 @@ class Tournaments(commands.Cog):
                     logger.info(tournament_start_message)
                     
                     # Get participants to mention
-                    cursor.execute(
+                    participants = await db.fetchall(
                         "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
                         (tournament['id'],)
                     )
-                    
-                    participants = cursor.fetchall()
                     mentions = ' '.join([f"<@{p['user_id']}>" for p in participants])
                     
                     # Логируем участников
@@ -662,175 +583,159 @@ class Tournaments(commands.Cog):
                     
                     tournament_start_embed.set_footer(text=f"Турнир ID: {tournament['id']}")
                     
-                    if channel:
-                        # Отправляем уведомление о начале турнира
-                        try:
-                            await channel.send(
-                                f"🏆 **ТУРНИР НАЧАЛСЯ!** Участники: {mentions}", 
-                                embeds=[tournament_start_embed, bracket]
-                            )
-                            
-                            # Отправляем в канал результатов также
-                            results_channel = self.bot.get_channel(TOURNAMENT_RESULTS_CHANNEL)
-                            if results_channel:
-                                await results_channel.send(
-                                    f"🏆 **ТУРНИР НАЧАЛСЯ!** Следите за результатами.", 
-                                    embeds=[tournament_start_embed, bracket]
-                                )
-                            
-                            logger.info(f"Successfully sent tournament start notification and bracket for tournament {tournament['id']}")
-                        except Exception as e:
-                            logger.error(f"Error sending tournament start notification: {e}")
-                    else:
-                        # Логируем, что не удалось найти канал, но иначе всё работает
-                        logger.warning(f"Cannot find channel {channel_id} to send tournament start notification")
-                        logger.info(f"Would have sent tournament start notification for {tournament['name']} (ID: {tournament['id']})")
-                        logger.info(f"Tournament bracket would contain {len(participants)} participants")
-                    
+                    # Сетка строится по зафиксированным матчам, поэтому уведомления о начале
+                    # ставятся в outbox отдельно от транзакции старта
+                    async with db.transaction() as tx:
+                        await outbox.send(
+                            tx,
+                            channel_id,
+                            content=f"🏆 **ТУРНИР НАЧАЛСЯ!** Участники: {mentions}",
+                            embeds=[tournament_start_embed, bracket],
+                            dedup_key=f"tournament-start:{tournament['id']}",
+                            priority=HIGH
+                        )
                         
+                        # Отправляем в канал результатов также
+                        await outbox.send(
+                            tx,
+                            TOURNAMENT_RESULTS_CHANNEL,
+                            content=f"🏆 **ТУРНИР НАЧАЛСЯ!** Следите за результатами.",
+                            embeds=[tournament_start_embed, bracket],
+                            dedup_key=f"tournament-start-results:{tournament['id']}",
+                            priority=HIGH
+                        )
+                    
+                    logger.info(f"Queued tournament start notification and bracket for tournament {tournament['id']}")
+            
             except Exception as e:
                 logger.error(f"Error starting tournament {tournament['id']}: {e}")
-                # Don't roll back - we want to keep the 'started' flag true to prevent repeated errors
-                # But also don't mark the tournament as in_progress if it failed
-                cursor.execute(
+                # Keep the 'started' flag true to prevent repeated errors
+                # But don't mark the tournament as in_progress if it failed
+                await db.execute(
                     "UPDATE tournaments SET started = 1 WHERE id = ?",
                     (tournament['id'],)
                 )
-        
-        db.commit()
     
-    async def check_approved_tournaments_participants(self):
-        """Проверка одобренных турниров на недостаточное количество участников."""
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Получаем все одобренные турниры
-        cursor.execute(
+    async def check_tournament_participants(self, tournament_id: int):
+        """Проверка одобренного турнира на недостаточное количество участников за час до начала."""
+        tournament = await db.fetchone(
             """
             SELECT t.*, u.username as creator_name 
             FROM tournaments t
             JOIN players u ON t.creator_id = u.user_id
-            WHERE t.status = 'approved'
+            WHERE t.id = ?
+            AND t.status = 'approved'
             AND t.started = 0
-            """
+            """,
+            (tournament_id,)
         )
+        if not tournament:
+            return
         
-        approved_tournaments = cursor.fetchall()
+        logger.info(f"Checking participants for tournament {tournament['id']} - {tournament['name']}")
         
-        for tournament in approved_tournaments:
-            logger.info(f"Checking participants for tournament {tournament['id']} - {tournament['name']}")
+        # Проверяем достаточное ли количество участников
+        if tournament['type'] == 'private':
+            # Для индивидуальных турниров
+            count = (await db.fetchone(
+                "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
+                (tournament['id'],)
+            ))['count']
             
-            # Проверяем достаточное ли количество участников
-            if tournament['type'] == 'private':
-                # Для индивидуальных турниров
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
-                    (tournament['id'],)
-                )
+            # Нужно минимум 2 участника
+            if count < 2:
+                deadline = parse_tournament_date(tournament['tournament_date']) - datetime.timedelta(hours=1)
+                now = datetime.datetime.now()
                 
-                count = cursor.fetchone()['count']
-                
-                # Нужно минимум 2 участника
-                if count < 2:
-                    deadline = datetime.datetime.strptime(tournament['tournament_date'], "%Y-%m-%d %H:%M:%S") - datetime.timedelta(hours=1)
-                    now = datetime.datetime.now()
+                # Если осталось меньше часа, отменяем турнир
+                if now >= deadline:
+                    logger.warning(f"Tournament {tournament['id']} has less than 2 participants and less than 1 hour left, cancelling")
                     
-                    # Если осталось меньше часа, отменяем турнир
-                    if now >= deadline:
-                        logger.warning(f"Tournament {tournament['id']} has less than 2 participants and less than 1 hour left, cancelling")
-                        
+                    async with db.transaction() as tx:
                         # Отменяем турнир из-за недостаточного количества участников
-                        cursor.execute(
+                        await tx.execute(
                             "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
                             ("Недостаточно участников для проведения турнира", tournament['id'])
                         )
                         
                         # Получаем список участников для уведомления
-                        cursor.execute(
+                        participants = await tx.fetchall(
                             "SELECT user_id FROM tournament_participants WHERE tournament_id = ?",
                             (tournament['id'],)
                         )
                         
-                        participants = cursor.fetchall()
+                        # Отправляем уведомление об отмене турнира через outbox
+                        embed = discord.Embed(
+                            title=f"❌ Турнир отменен: {tournament['name']}",
+                            description=f"Турнир был автоматически отменен из-за недостаточного количества участников.",
+                            color=0xE74C3C  # Red
+                        )
                         
-                        # Отправляем уведомление об отмене турнира
-                        channel_id = PRIVATE_TOURNAMENTS_CHANNEL
-                        channel = self.bot.get_channel(channel_id)
+                        embed.add_field(name="Организатор", value=f"<@{tournament['creator_id']}>", inline=True)
+                        embed.add_field(name="Минимальное количество участников", value="2", inline=True)
+                        embed.add_field(name="Зарегистрировано", value=str(count), inline=True)
+                        
+                        # Упоминаем всех зарегистрированных участников и создателя
+                        mentions = ' '.join([f"<@{p['user_id']}>" for p in participants])
+                        if tournament.get('creator_id'):
+                            mentions += f" <@{tournament['creator_id']}>"
                         
-                        if channel:
-                            embed = discord.Embed(
-                                title=f"❌ Турнир отменен: {tournament['name']}",
-                                description=f"Турнир был автоматически отменен из-за недостаточного количества участников.",
-                                color=0xE74C3C  # Red
-                            )
-                            
-                            embed.add_field(name="Организатор", value=f"<@{tournament['creator_id']}>", inline=True)
-                            embed.add_field(name="Минимальное количество участников", value="2", inline=True)
-                            embed.add_field(name="Зарегистрировано", value=str(count), inline=True)
-                            
-                            # Упоминаем всех зарегистрированных участников и создателя
-                            mentions = ' '.join([f"<@{p['user_id']}>" for p in participants])
-                            if tournament.get('creator_id'):
-                                mentions += f" <@{tournament['creator_id']}>"
-                                
-                            await channel.send(mentions, embed=embed)
+                        await outbox.send(
+                            tx,
+                            PRIVATE_TOURNAMENTS_CHANNEL,
+                            content=mentions,
+                            embeds=[embed],
+                            dedup_key=f"tournament-cancel:{tournament['id']}",
+                            priority=HIGH
+                        )
+        
+        else:
+            # Для командных турниров
+            count = (await db.fetchone(
+                "SELECT COUNT(*) as count FROM tournament_teams WHERE tournament_id = ?",
+                (tournament['id'],)
+            ))['count']
             
-            else:
-                # Для командных турниров
-                cursor.execute(
-                    "SELECT COUNT(*) as count FROM tournament_teams WHERE tournament_id = ?",
-                    (tournament['id'],)
-                )
-                
-                count = cursor.fetchone()['count']
+            # Нужно минимум 2 команды
+            if count < 2:
+                deadline = parse_tournament_date(tournament['tournament_date']) - datetime.timedelta(hours=1)
+                now = datetime.datetime.now()
                 
-                # Нужно минимум 2 команды
-                if count < 2:
-                    deadline = datetime.datetime.strptime(tournament['tournament_date'], "%Y-%m-%d %H:%M:%S") - datetime.timedelta(hours=1)
-                    now = datetime.datetime.now()
+                # Если осталось меньше часа, отменяем турнир
+                if now >= deadline:
+                    logger.warning(f"Tournament {tournament['id']} has less than 2 teams and less than 1 hour left, cancelling")
                     
-                    # Если осталось меньше часа, отменяем турнир
-                    if now >= deadline:
-                        logger.warning(f"Tournament {tournament['id']} has less than 2 teams and less than 1 hour left, cancelling")
-                        
+                    async with db.transaction() as tx:
                         # Отменяем турнир из-за недостаточного количества команд
-                        cursor.execute(
+                        await tx.execute(
                             "UPDATE tournaments SET status = 'cancelled', cancellation_reason = ? WHERE id = ?",
                             ("Недостаточно команд для проведения турнира", tournament['id'])
                         )
                         
-                        # Отправляем уведомление об отмене турнира
-                        channel_id = PUBLIC_TOURNAMENTS_CHANNEL
-                        channel = self.bot.get_channel(channel_id)
+                        # Отправляем уведомление об отмене турнира через outbox
+                        embed = discord.Embed(
+                            title=f"❌ Турнир отменен: {tournament['name']}",
+                            description=f"Турнир был автоматически отменен из-за недостаточного количества команд.",
+                            color=0xE74C3C  # Red
+                        )
                         
-                        if channel:
-                            embed = discord.Embed(
-                                title=f"❌ Турнир отменен: {tournament['name']}",
-                                description=f"Турнир был автоматически отменен из-за недостаточного количества команд.",
-                                color=0xE74C3C  # Red
-                            )
-                            
-                            embed.add_field(name="Организатор", value=f"<@{tournament['creator_id']}>", inline=True)
-                            embed.add_field(name="Минимальное количество команд", value="2", inline=True)
-                            embed.add_field(name="Зарегистрировано", value=str(count), inline=True)
-                            
-                            # Уведомляем о проблеме и упоминаем создателя
-                            mentions = ""
-                            if tournament.get('creator_id'):
-                                mentions = f"<@{tournament['creator_id']}>"
-                                
-                            await channel.send(mentions, embed=embed)
-        
-        # Сохраняем изменения
-        db.commit()
-    
-    @check_upcoming_tournaments.before_loop
-    async def before_check_upcoming_tournaments(self):
-        # Wait until the bot is ready
-        await self.bot.wait_until_ready()
-        
-        # Логируем, что задача запущена
-        logger.info("check_upcoming_tournaments task is initialized and will be running periodically")
+                        embed.add_field(name="Организатор", value=f"<@{tournament['creator_id']}>", inline=True)
+                        embed.add_field(name="Минимальное количество команд", value="2", inline=True)
+                        embed.add_field(name="Зарегистрировано", value=str(count), inline=True)
+                        
+                        # Уведомляем о проблеме и упоминаем создателя
+                        mentions = ""
+                        if tournament.get('creator_id'):
+                            mentions = f"<@{tournament['creator_id']}>"
+                        
+                        await outbox.send(
+                            tx,
+                            PUBLIC_TOURNAMENTS_CHANNEL,
+                            content=mentions,
+                            embeds=[embed],
+                            dedup_key=f"tournament-cancel:{tournament['id']}",
+                            priority=HIGH
+                        )
     
     @app_commands.command(
         name="tournament-create-private",
@@ -854,14 +759,12 @@ class Tournaments(commands.Cog):
         max_participants: int,
         entry_fee: Optional[int] = 0
     ):
-        # Проверяем, не обрабатывали ли мы уже это взаимодействие
+        # Помечаем взаимодействие как обработанное, повторная доставка пропускается
         interaction_id = str(interaction.id)
-        if interaction_id in self.processed_interactions:
+        if not await interaction_dedup.claim(interaction_id):
             logger.warning(f"Skipping duplicate interaction {interaction_id}")
             return
             
-        # Помечаем взаимодействие как обработанное
-        self.processed_interactions.add(interaction_id)
         logger.info(f"Processing private tournament creation, interaction ID: {interaction_id}")
         
         try:
@@ -897,10 +800,6 @@ class Tournaments(commands.Cog):
                 await interaction.response.send_message("Дата турнира должна быть в будущем.", ephemeral=True)
                 return
             
-            # Get database connection
-            db = get_db()
-            cursor = db.cursor()
-            
             # Проверка типа матча
             valid_types = ["BO1", "BO3", "BO5", "BO7"]
             if match_type.upper() not in valid_types:
@@ -910,36 +809,37 @@ class Tournaments(commands.Cog):
                 )
                 return
             
-            # Create tournament in the database
-            cursor.execute(
-                """
-                INSERT INTO tournaments 
-                (name, type, weapon_type, entry_fee, tournament_date, max_participants, creator_id, status, creation_date, match_type) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    name, 
-                    'private', 
-                    weapon_type,
-                    entry_fee,
-                    parsed_date.strftime('%Y-%m-%d %H:%M:%S'),
-                    max_participants,
-                    interaction.user.id,
-                    'pending',
-                    datetime.datetime.now(),
-                    match_type.upper()
+            async with db.transaction() as tx:
+                # Create tournament in the database
+                result = await tx.execute(
+                    """
+                    INSERT INTO tournaments 
+                    (name, type, weapon_type, entry_fee, tournament_date, max_participants, creator_id, status, creation_date, match_type) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        name, 
+                        'private', 
+                        weapon_type,
+                        entry_fee,
+                        parsed_date.strftime('%Y-%m-%d %H:%M:%S'),
+                        max_participants,
+                        interaction.user.id,
+                        'pending',
+                        datetime.datetime.now(),
+                        match_type.upper()
+                    )
+                )
+        
+                tournament_id = result.lastrowid
+        
+                # Add creator to players table if not exists
+                await tx.execute(
+                    "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
+                    (interaction.user.id, interaction.user.name)
                 )
-            )
-            
-            tournament_id = cursor.lastrowid
-            
-            # Add creator to players table if not exists
-            cursor.execute(
-                "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
-                (interaction.user.id, interaction.user.name)
-            )
             
-            db.commit()
+            await scheduler.refresh(tournament_id)
             
             # Create embed for moderation
             embed = discord.Embed(
@@ -967,7 +867,7 @@ class Tournaments(commands.Cog):
                 
             await approval_channel.send(
                 embed=embed,
-                view=ApprovalView(tournament_id=tournament_id, bot=self.bot)
+                view=approval_view(tournament_id)
             )
             
             await interaction.response.send_message(
@@ -1004,14 +904,12 @@ class Tournaments(commands.Cog):
         tournament_date: str,
         entry_fee: Optional[int] = 0
     ):
-        # Проверяем, не обрабатывали ли мы уже это взаимодействие
+        # Помечаем взаимодействие как обработанное, повторная доставка пропускается
         interaction_id = str(interaction.id)
-        if interaction_id in self.processed_interactions:
+        if not await interaction_dedup.claim(interaction_id):
             logger.warning(f"Skipping duplicate interaction {interaction_id}")
             return
             
-        # Помечаем взаимодействие как обработанное
-        self.processed_interactions.add(interaction_id)
         logger.info(f"Processing public tournament creation, interaction ID: {interaction_id}")
         
         try:
@@ -1047,10 +945,6 @@ class Tournaments(commands.Cog):
                 await interaction.response.send_message("Дата турнира должна быть в будущем.", ephemeral=True)
                 return
             
-            # Get database connection
-            db = get_db()
-            cursor = db.cursor()
-            
             # Валидация типа матча
             valid_types = ["BO1", "BO3", "BO5", "BO7"]
             if match_type.upper() not in valid_types:
@@ -1059,38 +953,39 @@ class Tournaments(commands.Cog):
                     ephemeral=True
                 )
                 return
-
-            # Create tournament in the database - use max_participants as participants_per_team * 2 for now
-            cursor.execute(
-                """
-                INSERT INTO tournaments 
-                (name, type, rules, entry_fee, tournament_date, max_participants, participants_per_team, creator_id, status, creation_date, match_type) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    name, 
-                    'public', 
-                    rules,
-                    entry_fee,
-                    parsed_date.strftime('%Y-%m-%d %H:%M:%S'),
-                    participants_per_team * 2,  # Max participants is participants per team * 2 teams
-                    participants_per_team,
-                    interaction.user.id,
-                    'pending',
-                    datetime.datetime.now(),
-                    match_type.upper()
-                )
-            )
             
-            tournament_id = cursor.lastrowid
-            
-            # Add creator to players table if not exists
-            cursor.execute(
-                "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
-                (interaction.user.id, interaction.user.name)
-            )
+            async with db.transaction() as tx:
+                # Create tournament in the database - use max_participants as participants_per_team * 2 for now
+                result = await tx.execute(
+                    """
+                    INSERT INTO tournaments 
+                    (name, type, rules, entry_fee, tournament_date, max_participants, participants_per_team, creator_id, status, creation_date, match_type) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        name, 
+                        'public', 
+                        rules,
+                        entry_fee,
+                        parsed_date.strftime('%Y-%m-%d %H:%M:%S'),
+                        participants_per_team * 2,  # Max participants is participants per team * 2 teams
+                        participants_per_team,
+                        interaction.user.id,
+                        'pending',
+                        datetime.datetime.now(),
+                        match_type.upper()
+                    )
+                )
+        
+                tournament_id = result.lastrowid
+        
+                # Add creator to players table if not exists
+                await tx.execute(
+                    "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
+                    (interaction.user.id, interaction.user.name)
+                )
             
-            db.commit()
+            await scheduler.refresh(tournament_id)
             
             # Create embed for moderation
             embed = discord.Embed(
@@ -1118,7 +1013,7 @@ class Tournaments(commands.Cog):
                 
             await approval_channel.send(
                 embed=embed,
-                view=ApprovalView(tournament_id=tournament_id, bot=self.bot)
+                view=approval_view(tournament_id)
             )
             
             await interaction.response.send_message(
@@ -1145,21 +1040,15 @@ class Tournaments(commands.Cog):
         interaction: discord.Interaction,
         team_name: str
     ):
-        # Проверяем, не обрабатывали ли мы уже это взаимодействие
+        # Помечаем взаимодействие как обработанное, повторная доставка пропускается
         interaction_id = str(interaction.id)
-        if interaction_id in self.processed_interactions:
+        if not await interaction_dedup.claim(interaction_id):
             logger.warning(f"Skipping duplicate interaction {interaction_id}")
             return
             
-        # Помечаем взаимодействие как обработанное
-        self.processed_interactions.add(interaction_id)
         logger.info(f"Processing tournament registration, interaction ID: {interaction_id}")
-        # Get database connection
-        db = get_db()
-        cursor = db.cursor()
-        
         # Get active public tournaments
-        cursor.execute(
+        active_tournaments = await db.fetchall(
             """
             SELECT id, name FROM tournaments 
             WHERE type = 'public' AND status = 'approved' AND tournament_date > ?
@@ -1167,8 +1056,6 @@ class Tournaments(commands.Cog):
             (datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),)
         )
         
-        active_tournaments = cursor.fetchall()
-        
         if not active_tournaments:
             await interaction.response.send_message("В настоящее время нет активных публичных турниров.", ephemeral=True)
             return
@@ -1189,67 +1076,20 @@ class Tournaments(commands.Cog):
             # Get selected tournament
             tournament_id = int(select.values[0])
             
-            # Check if the team is already registered
-            cursor.execute(
-                "SELECT COUNT(*) FROM tournament_teams WHERE tournament_id = ? AND team_name = ?",
-                (tournament_id, team_name)
-            )
-            
-            if cursor.fetchone()[0] > 0:
-                await interaction.response.send_message(f"Команда '{team_name}' уже зарегистрирована на этот турнир!", ephemeral=True)
-                return
-                
-            # Check if there's room for more teams
-            cursor.execute(
-                """
-                SELECT COUNT(*) as team_count, (SELECT participants_per_team FROM tournaments WHERE id = ?) as max_teams
-                FROM tournament_teams
-                WHERE tournament_id = ?
-                """,
-                (tournament_id, tournament_id)
-            )
-            
-            result = cursor.fetchone()
-            if result and result['team_count'] >= 2:  # Currently supporting only 2 teams
-                await interaction.response.send_message("Все места для команд в этом турнире уже заняты!", ephemeral=True)
-                return
+            # Блокировка турнира снимается до отправки сообщений
+            async with tournament_locks.hold(tournament_id):
+                reply, embed = await self.add_public_team(tournament_id, team_name, interaction.user)
             
-            # Add team to tournament
             try:
-                cursor.execute(
-                    "INSERT INTO tournament_teams (tournament_id, team_name, captain_id, registration_date) VALUES (?, ?, ?, ?)",
-                    (tournament_id, team_name, interaction.user.id, datetime.datetime.now())
-                )
-                
-                db.commit()
-                
-                # Get tournament details
-                cursor.execute("SELECT name FROM tournaments WHERE id = ?", (tournament_id,))
-                tournament_name = cursor.fetchone()['name']
-                
-                # Create embed to notify mods for approval
-                embed = discord.Embed(
-                    title=f"🔹 Заявка на участие в публичном турнире",
-                    description=f"Капитан: {interaction.user.mention}",
-                    color=0xE67E22  # Orange
-                )
-                
-                embed.add_field(name="Турнир", value=tournament_name, inline=True)
-                embed.add_field(name="Команда", value=team_name, inline=True)
-                
                 # Send to moderation channel
                 approval_channel = self.bot.get_channel(TOURNAMENT_APPROVAL_CHANNEL)
-                if approval_channel:
+                if embed is not None and approval_channel:
                     await approval_channel.send(embed=embed)
                 
-                await interaction.response.send_message(
-                    f"Заявка на участие команды '{team_name}' в турнире отправлена на рассмотрение.",
-                    ephemeral=True
-                )
+                await interaction.response.send_message(reply, ephemeral=True)
                 
             except Exception as e:
                 logger.error(f"Error registering team for tournament: {e}")
-                db.rollback()
                 await interaction.response.send_message("Произошла ошибка при регистрации команды.", ephemeral=True)
         
         select.callback = select_callback
@@ -1257,6 +1097,60 @@ class Tournaments(commands.Cog):
         
         await interaction.response.send_message("Выберите турнир для регистрации команды:", view=view, ephemeral=True)
         
+    async def add_public_team(self, tournament_id: int, team_name: str, captain) -> tuple:
+        """
+        Register a team for a public tournament; the caller holds the tournament lock.
+        
+        Returns the reply for the captain and the embed for the moderators,
+        or None instead of the embed if the team was not registered.
+        """
+        # Check if the team is already registered
+        existing = await db.fetchone(
+            "SELECT COUNT(*) as count FROM tournament_teams WHERE tournament_id = ? AND team_name = ?",
+            (tournament_id, team_name)
+        )
+        
+        if existing['count'] > 0:
+            return f"Команда '{team_name}' уже зарегистрирована на этот турнир!", None
+            
+        # Check if there's room for more teams
+        result = await db.fetchone(
+            """
+            SELECT COUNT(*) as team_count, (SELECT participants_per_team FROM tournaments WHERE id = ?) as max_teams
+            FROM tournament_teams
+            WHERE tournament_id = ?
+            """,
+            (tournament_id, tournament_id)
+        )
+        if result and result['team_count'] >= 2:  # Currently supporting only 2 teams
+            return "Все места для команд в этом турнире уже заняты!", None
+        
+        # Add team to tournament
+        try:
+            await db.execute(
+                "INSERT INTO tournament_teams (tournament_id, team_name, captain_id, registration_date) VALUES (?, ?, ?, ?)",
+                (tournament_id, team_name, captain.id, datetime.datetime.now())
+            )
+            
+            # Get tournament details
+            tournament_name = (await db.fetchone("SELECT name FROM tournaments WHERE id = ?", (tournament_id,)))['name']
+            
+        except Exception as e:
+            logger.error(f"Error registering team for tournament: {e}")
+            return "Произошла ошибка при регистрации команды.", None
+        
+        # Create embed to notify mods for approval
+        embed = discord.Embed(
+            title=f"🔹 Заявка на участие в публичном турнире",
+            description=f"Капитан: {captain.mention}",
+            color=0xE67E22  # Orange
+        )
+        
+        embed.add_field(name="Турнир", value=tournament_name, inline=True)
+        embed.add_field(name="Команда", value=team_name, inline=True)
+        
+        return f"Заявка на участие команды '{team_name}' в турнире отправлена на рассмотрение.", embed
+    
     @app_commands.command(
         name="tournament-bracket",
         description="Показать турнирную сетку"
@@ -1269,7 +1163,7 @@ class Tournaments(commands.Cog):
         
         try:
             # Создаем турнирную сетку
-            success, result = generate_tournament_bracket(tournament_id)
+            success, result = await generate_tournament_bracket(tournament_id)
             
             if success:
                 await interaction.followup.send(embed=result)
@@ -1292,31 +1186,17 @@ class Tournaments(commands.Cog):
     async def tournament_team_add(self, interaction: discord.Interaction, tournament_id: int, team_name: str, members: str):
         await interaction.response.defer(ephemeral=True)
         
-        db = get_db()
-        cursor = db.cursor()
-        
         try:
             # Проверяем, что турнир существует и является публичным
-            cursor.execute(
+            tournament = await db.fetchone(
                 "SELECT * FROM tournaments WHERE id = ? AND type = 'public' AND status = 'approved'",
                 (tournament_id,)
             )
-            tournament = cursor.fetchone()
             
             if not tournament:
                 await interaction.followup.send("Публичный турнир с указанным ID не найден или не подтвержден.", ephemeral=True)
                 return
             
-            # Проверяем, что команда с таким названием еще не зарегистрирована
-            cursor.execute(
-                "SELECT COUNT(*) FROM tournament_teams WHERE tournament_id = ? AND team_name = ?",
-                (tournament_id, team_name)
-            )
-            
-            if cursor.fetchone()[0] > 0:
-                await interaction.followup.send(f"Команда '{team_name}' уже зарегистрирована на этот турнир!", ephemeral=True)
-                return
-            
             # Извлекаем ID участников из строки с упоминаниями
             member_ids = []
             for member_mention in members.split(','):
@@ -1338,74 +1218,81 @@ class Tournaments(commands.Cog):
                 )
                 return
             
+            # Проверка названия и запись команды выполняются под блокировкой турнира
+            async with tournament_locks.hold(tournament_id):
+                registered = await self.add_team(tournament_id, team_name, member_ids)
+            
+            if not registered:
+                await interaction.followup.send(f"Команда '{team_name}' уже зарегистрирована на этот турнир!", ephemeral=True)
+                return
+            
+            # Отправляем сообщение об успешной регистрации
+            members_mentions = ", ".join([f"<@{user_id}>" for user_id in member_ids])
+            await interaction.followup.send(
+                f"✅ Команда '{team_name}' успешно зарегистрирована на турнир #{tournament_id}!\n"
+                f"Участники: {members_mentions}",
+                ephemeral=False
+            )
+            
+        except Exception as e:
+            logger.error(f"Error registering team: {e}")
+            await interaction.followup.send(f"Произошла ошибка при регистрации команды: {e}", ephemeral=True)
+
+    async def add_team(self, tournament_id: int, team_name: str, member_ids: list) -> bool:
+        """Register a team with its members unless the name is taken; the caller holds the tournament lock."""
+        # Проверяем, что команда с таким названием еще не зарегистрирована
+        existing = await db.fetchone(
+            "SELECT COUNT(*) as count FROM tournament_teams WHERE tournament_id = ? AND team_name = ?",
+            (tournament_id, team_name)
+        )
+        
+        if existing['count'] > 0:
+            return False
+        
+        async with db.transaction() as tx:
             # Регистрируем команду
-            cursor.execute(
+            await tx.execute(
                 "INSERT INTO tournament_teams (tournament_id, team_name, captain_id, registration_date) VALUES (?, ?, ?, ?)",
                 (tournament_id, team_name, member_ids[0], datetime.datetime.now())
             )
             
-            team_id = cursor.lastrowid
-            
             # Добавляем всех участников
             for user_id in member_ids:
                 # Добавляем участника в таблицу players, если его еще нет
-                cursor.execute(
+                await tx.execute(
                     "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
                     (user_id, f"User{user_id}")
                 )
                 
                 # Добавляем участие в турнире
-                cursor.execute(
+                await tx.execute(
                     "INSERT INTO tournament_participants (tournament_id, user_id, join_date) VALUES (?, ?, ?)",
                     (tournament_id, user_id, datetime.datetime.now())
                 )
             
-            db.commit()
-            
-            # Отправляем сообщение об успешной регистрации
-            members_mentions = ", ".join([f"<@{user_id}>" for user_id in member_ids])
-            await interaction.followup.send(
-                f"✅ Команда '{team_name}' успешно зарегистрирована на турнир #{tournament_id}!\n"
-                f"Участники: {members_mentions}",
-                ephemeral=False
-            )
-            
             # Обновляем сообщение с анонсом турнира
-            channel = self.bot.get_channel(PUBLIC_TOURNAMENTS_CHANNEL)
-            if channel:
-                try:
-                    async for message in channel.history(limit=200):
-                        for embed in message.embeds:
-                            if embed.fields and any(field.name == "ID Турнира" and field.value == f"#{tournament_id}" for field in embed.fields):
-                                # Получаем количество зарегистрированных команд
-                                cursor.execute(
-                                    "SELECT COUNT(*) FROM tournament_teams WHERE tournament_id = ?",
-                                    (tournament_id,)
-                                )
-                                team_count = cursor.fetchone()[0]
-                                
-                                # Обновляем embed с новым количеством команд
-                                new_embed = discord.Embed(
-                                    title=embed.title,
-                                    description=embed.description,
-                                    color=embed.color
-                                )
-                                
-                                for field in embed.fields:
-                                    if field.name == "Зарегистрировано команд":
-                                        new_embed.add_field(name=field.name, value=f"{team_count}", inline=field.inline)
-                                    else:
-                                        new_embed.add_field(name=field.name, value=field.value, inline=field.inline)
-                                
-                                await message.edit(embed=new_embed)
-                                break
-                except Exception as e:
-                    logger.error(f"Error updating tournament message: {e}")
-            
+            await refresh_announcement(tournament_id, tx=tx)
+        
+        return True
+
+    @app_commands.command(
+        name="tournament-rebuild-announcements",
+        description="Найти анонсы турниров, опубликованные до появления реестра сообщений (только для администраторов)"
+    )
+    async def tournament_rebuild_announcements(self, interaction: discord.Interaction):
+        if not await is_admin(interaction):
+            await interaction.response.send_message("У вас нет прав для этого действия!", ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        
+        try:
+            # Однократный просмотр истории каналов для старых анонсов
+            recovered = await recover_announcements(self.bot, [PRIVATE_TOURNAMENTS_CHANNEL, PUBLIC_TOURNAMENTS_CHANNEL])
+            await interaction.followup.send(f"Восстановлено анонсов: {recovered}", ephemeral=True)
         except Exception as e:
-            logger.error(f"Error registering team: {e}")
-            db.rollback()
-            await interaction.followup.send(f"Произошла ошибка при регистрации команды: {e}", ephemeral=True)
+            logger.error(f"Error rebuilding tournament announcements: {e}")
+            await interaction.followup.send("Произошла ошибка при восстановлении анонсов.", ephemeral=True)
 
 
 async def setup(bot: commands.Bot):
@@ -3,6 +3,7 @@ import logging
 import asyncio
 from dotenv import load_dotenv
 from bot import setup_bot
+from utils.db import pool, db
 
 # Load environment variables from .env file
 load_dotenv()
@@ -32,6 +33,8 @@ async def main():
     finally:
         if not bot.is_closed():
             await bot.close()
+        db.close()
+        pool.close_all()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,135 @@
+import re
+import logging
+
+from utils.db import db
+from utils.embeds import create_private_tournament_embed, create_public_tournament_embed
+from utils.outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+# Kinds of registered tournament messages
+ANNOUNCEMENT = 'announcement'
+BRACKET = 'bracket'  # live bracket in the results channel
+
+# "ID Турнира" field value of announcement embeds
+TOURNAMENT_ID_FIELD = re.compile(r'^#(\d+)$')
+
+async def register_message(tournament_id: int, channel_id: int, message_id: int, kind: str = ANNOUNCEMENT, tx=None):
+    """Remember where a tournament message was posted, replacing an older entry of the same kind."""
+    await (tx or db).execute(
+        """
+        INSERT INTO tournament_messages (tournament_id, kind, channel_id, message_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (tournament_id, kind) DO UPDATE SET
+            channel_id = excluded.channel_id,
+            message_id = excluded.message_id
+        """,
+        (tournament_id, kind, channel_id, message_id)
+    )
+
+async def get_message(tournament_id: int, kind: str = ANNOUNCEMENT, tx=None):
+    """Return (channel_id, message_id) of a registered message, or None."""
+    row = await (tx or db).fetchone(
+        "SELECT channel_id, message_id FROM tournament_messages WHERE tournament_id = ? AND kind = ?",
+        (tournament_id, kind)
+    )
+    return (row['channel_id'], row['message_id']) if row else None
+
+async def build_announcement_embed(tournament_id: int, tx=None):
+    """Build the announcement embed of a tournament with its current registration counts."""
+    executor = tx or db
+    tournament = await executor.fetchone(
+        """
+        SELECT t.*, u.username as creator_name
+        FROM tournaments t
+        LEFT JOIN players u ON t.creator_id = u.user_id
+        WHERE t.id = ?
+        """,
+        (tournament_id,)
+    )
+    if not tournament:
+        return None
+
+    if tournament['type'] == 'private':
+        participant_count = (await executor.fetchone(
+            "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
+            (tournament_id,)
+        ))['count']
+        return create_private_tournament_embed(tournament, participant_count)
+
+    team_count = (await executor.fetchone(
+        "SELECT COUNT(*) as count FROM tournament_teams WHERE tournament_id = ?",
+        (tournament_id,)
+    ))['count']
+    return create_public_tournament_embed(tournament, team_count)
+
+async def refresh_announcement(tournament_id: int, tx=None) -> bool:
+    """
+    Queue an edit of the tournament announcement with current counts.
+
+    The message is addressed directly by its registered id, so no channel
+    history is read. Returns False if the announcement is not registered
+    (posted before the registry existed and not recovered yet).
+    """
+    location = await get_message(tournament_id, tx=tx)
+    if not location:
+        logger.warning(f"No registered announcement for tournament {tournament_id}")
+        return False
+
+    embed = await build_announcement_embed(tournament_id, tx=tx)
+    if embed is None:
+        return False
+
+    channel_id, message_id = location
+    await outbox.edit(tx, channel_id, message_id, embeds=[embed])
+    return True
+
+def announced_tournament_id(message):
+    """Return the tournament id of an announcement message, or None."""
+    for embed in message.embeds:
+        fields = {field.name: field.value for field in embed.fields}
+        # Reminders carry the tournament id too, but have no organizer field
+        if "Организатор" not in fields:
+            continue
+        match = TOURNAMENT_ID_FIELD.match(fields.get("ID Турнира") or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+async def recover_announcements(bot, channel_ids) -> int:
+    """
+    Register announcements posted before the registry existed.
+
+    Scans the full history of the given channels once, newest first, and
+    registers the latest bot announcement of every active tournament that
+    has no entry yet. Returns the number of registered messages.
+    """
+    missing = {
+        row['id'] for row in await db.fetchall(
+            """
+            SELECT t.id FROM tournaments t
+            LEFT JOIN tournament_messages m ON m.tournament_id = t.id AND m.kind = ?
+            WHERE t.status IN ('approved', 'in_progress') AND m.tournament_id IS NULL
+            """,
+            (ANNOUNCEMENT,)
+        )
+    }
+    recovered = 0
+    for channel_id in channel_ids:
+        if not missing:
+            break
+        channel = bot.get_channel(channel_id)
+        if not channel:
+            continue
+        async for message in channel.history(limit=None):
+            if message.author.id != bot.user.id:
+                continue
+            tournament_id = announced_tournament_id(message)
+            if tournament_id in missing:
+                await register_message(tournament_id, channel.id, message.id)
+                missing.discard(tournament_id)
+                recovered += 1
+                if not missing:
+                    break
+    logger.info(f"Recovered {recovered} tournament announcements, {len(missing)} not found")
+    return recovered
@@ -0,0 +1,463 @@
+import os
+import json
+import datetime
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from utils.db import db, dict_factory
+from utils.models import Match
+from utils import match_log
+from utils.match_log import MatchEvent, SEEDED, MATCH_CREATED
+
+logger = logging.getLogger(__name__)
+
+BRACKET_CACHE_SIZE = int(os.getenv('BRACKET_CACHE_SIZE', '64'))  # tournaments kept in memory
+# "auto": the next match is created as soon as both of its sides are known,
+# "manual": moderators open every round with /tournament-next-match
+BRACKET_PROGRESSION = os.getenv('BRACKET_PROGRESSION', 'auto')
+# Events folded on top of a stored bracket before a new snapshot is written
+BRACKET_SNAPSHOT_INTERVAL = int(os.getenv('BRACKET_SNAPSHOT_INTERVAL', '50'))
+
+
+@dataclass(slots=True)
+class Bracket:
+    """
+    Single-elimination tree of a tournament stored as a binary heap.
+
+    Node 1 is the final, the children of node n are 2n and 2n + 1 and the
+    `size` leaves (size..2*size-1) hold the seeded entrants (player ids or
+    team ids, None for a bye). An inner node holds the winner of the match
+    played between its children, so recording a result fills the parent's
+    slot in O(1) without looking at the rest of the round.
+
+    The tree is the fold of the tournament's match_events (see
+    utils.match_log); `event_id` is the last event applied to it.
+    """
+    tournament_id: int
+    size: int  # number of leaves, a power of two
+    is_team: bool = False
+    slots: list = None  # node -> entrant: seeds on leaves, winners on inner nodes
+    match_ids: list = None  # inner node -> id of its tournament_matches row
+    event_id: int = 0
+    snapshot_id: Optional[int] = field(default=None, repr=False)  # event id of the stored snapshot
+    pending_events: int = field(default=0, repr=False)  # events applied since that snapshot
+    _nodes: dict = field(init=False, repr=False)  # match id -> node
+
+    def __post_init__(self):
+        if self.slots is None:
+            self.slots = [None] * (2 * self.size)
+        if self.match_ids is None:
+            self.match_ids = [None] * self.size
+        self._nodes = {match_id: node for node, match_id in enumerate(self.match_ids) if match_id is not None}
+
+    @classmethod
+    def create(cls, tournament_id: int, entrants, is_team: bool = False) -> 'Bracket':
+        """
+        Place the entrants, given in seed order, on the standard seed lines.
+
+        The field is padded to a power of two with byes. Seed k meets seed
+        size + 1 - k in the first round, so the byes go to the top seeds, no
+        pair gets two of them, and seeds 1 and 2 can only meet in the final.
+        Entrants facing a bye advance right away.
+        """
+        entrants = list(entrants)
+        size = max(2, 1 << (len(entrants) - 1).bit_length())
+        bracket = cls(tournament_id, size, is_team)
+        bracket.place([entrants[seed - 1] if seed <= len(entrants) else None for seed in seed_positions(size)])
+        return bracket
+
+    def place(self, leaves):
+        """Put entrants (None for a bye) on the leaves, top to bottom, and advance those facing a bye."""
+        self.slots[self.size:] = leaves
+        for leaf in range(self.size, 2 * self.size, 2):
+            if self.slots[leaf] is not None and self.slots[leaf + 1] is None:
+                self._advance(leaf)
+
+    @property
+    def leaves(self) -> list:
+        return self.slots[self.size:]
+
+    @classmethod
+    def from_matches(cls, tournament_id: int, matches, is_team: bool = False) -> Optional['Bracket']:
+        """
+        Rebuild the tree of a tournament started before brackets were stored.
+
+        First-round matches become consecutive pairs of leaves, later matches
+        are attached to the node whose two sides they were played between.
+        Returns None if the matches do not form a single-elimination bracket
+        (e.g. a pair that played more than one match).
+        """
+        first_round = [match for match in matches if match.round == 1]
+        pairs = {frozenset((match.side1_id, match.side2_id)) for match in first_round}
+        if not first_round or len(pairs) != len(first_round):
+            return None
+
+        size = max(2, 1 << (2 * len(first_round) - 1).bit_length())
+        bracket = cls(tournament_id, size, is_team)
+        for pair, match in enumerate(first_round):
+            leaf = size + 2 * pair
+            bracket.slots[leaf], bracket.slots[leaf + 1] = match.side1_id, match.side2_id
+            bracket.attach(leaf >> 1, match.id)
+
+        for match in sorted(matches, key=lambda m: (m.round, m.id)):
+            node = bracket.node_of(match.id)
+            if node is None:
+                candidates = {frozenset(bracket.sides(n)): n for n in bracket.playable()}
+                node = candidates.get(frozenset((match.side1_id, match.side2_id)))
+                if node is None:
+                    logger.warning(f"Match {match.id} of tournament {tournament_id} does not fit the bracket")
+                    continue
+                bracket.attach(node, match.id)
+            if match.completed:
+                winner = decided_winner(match)
+                if winner is not None:
+                    bracket.record(match.id, winner)
+        return bracket
+
+    @property
+    def rounds(self) -> int:
+        return self.size.bit_length() - 1
+
+    @property
+    def champion(self):
+        return self.slots[1]
+
+    @property
+    def current_round(self) -> int:
+        """Latest round that has a match, 0 before the first round."""
+        return max((self.round_of(node) for node in self._nodes.values()), default=0)
+
+    def round_of(self, node: int) -> int:
+        """Round of an inner node: 1 for the first round, `rounds` for the final."""
+        return self.rounds - node.bit_length() + 1
+
+    def round_nodes(self, round_number: int) -> range:
+        return range(self.size >> round_number, self.size >> (round_number - 1))
+
+    def sides(self, node: int) -> tuple:
+        return self.slots[2 * node], self.slots[2 * node + 1]
+
+    def node_of(self, match_id: int) -> Optional[int]:
+        return self._nodes.get(match_id)
+
+    def attach(self, node: int, match_id: int):
+        """Link the match played at `node`."""
+        self.match_ids[node] = match_id
+        self._nodes[match_id] = node
+
+    def is_playable(self, node: int) -> bool:
+        """Both sides are known and the match was not created yet."""
+        side1, side2 = self.sides(node)
+        return (side1 is not None and side2 is not None
+                and self.slots[node] is None and self.match_ids[node] is None)
+
+    def playable(self) -> list:
+        """Inner nodes whose match can be created now, earliest rounds first."""
+        return [node for node in range(self.size - 1, 0, -1) if self.is_playable(node)]
+
+    def record(self, match_id: int, winner) -> Optional[int]:
+        """
+        Put the winner of a match into its node.
+
+        Returns the parent node if its match became playable, otherwise None.
+        """
+        node = self._nodes[match_id]
+        if winner not in self.sides(node):
+            raise ValueError(f"{winner} did not play match {match_id}")
+        self.slots[node] = winner
+        node = self._advance(node)
+        parent = node >> 1
+        return parent if parent and self.is_playable(parent) else None
+
+    def dependents(self, match_id: int) -> list:
+        """Ids of the later matches that `invalidate(match_id)` would drop."""
+        node = self._nodes[match_id]
+        dropped = []
+        carried = self.slots[node]
+        while node > 1 and carried is not None:
+            node >>= 1
+            if self.match_ids[node] is not None:
+                dropped.append(self.match_ids[node])
+            carried = self.slots[node]
+        return dropped
+
+    def invalidate(self, match_id: int) -> list:
+        """
+        Take back the result of a match and everything built on it.
+
+        Only the path from the match towards the final is touched: each
+        later match the winner reached is detached and the slots filled from
+        it are cleared, while the rest of the tree keeps its results. Costs
+        O(depth). Returns the ids of the detached matches.
+        """
+        dropped = self.dependents(match_id)
+        node = self._nodes[match_id]
+        carried = self.slots[node]
+        self.slots[node] = None
+        while node > 1 and carried is not None:
+            node >>= 1
+            if self.match_ids[node] is not None:
+                del self._nodes[self.match_ids[node]]
+                self.match_ids[node] = None
+            carried, self.slots[node] = self.slots[node], None
+        return dropped
+
+    def _empty(self, node: int) -> bool:
+        """No entrant can ever come out of the subtree."""
+        if node >= self.size:
+            return self.slots[node] is None
+        return self._empty(2 * node) and self._empty(2 * node + 1)
+
+    def _advance(self, node: int) -> int:
+        """Move the entrant at `node` up past byes; returns the node it stops at."""
+        while node > 1 and self._empty(node ^ 1):
+            self.slots[node >> 1] = self.slots[node]
+            node >>= 1
+        return node
+
+    def to_row(self) -> tuple:
+        return (
+            self.tournament_id, self.size, int(self.is_team),
+            json.dumps(self.slots, separators=(',', ':')),
+            json.dumps(self.match_ids, separators=(',', ':')),
+            self.event_id
+        )
+
+    @classmethod
+    def from_row(cls, row) -> 'Bracket':
+        event_id = row.get('event_id') or 0
+        return cls(
+            row['tournament_id'], row['size'], bool(row['is_team']),
+            json.loads(row['slots']), json.loads(row['match_ids']),
+            event_id, event_id
+        )
+
+    def same_state(self, other: 'Bracket') -> bool:
+        """Both trees hold the same entrants, winners and matches."""
+        return (self.size, self.slots, self.match_ids) == (other.size, other.slots, other.match_ids)
+
+
+def seed_positions(size: int) -> list:
+    """
+    Seed number on each leaf of a bracket of `size` leaves, top to bottom.
+
+    Built by doubling: every seed s of the smaller bracket is paired with
+    2 * len + 1 - s, e.g. [1, 4, 2, 3] for 4 leaves, [1, 8, 4, 5, 2, 7, 3, 6] for 8.
+    """
+    positions = [1]
+    while len(positions) < size:
+        mirror = 2 * len(positions) + 1
+        positions = [seed for top in positions for seed in (top, mirror - top)]
+    return positions
+
+
+def decided_winner(match: Match):
+    """Side with the higher score of a completed match, None for a draw."""
+    score1, score2 = match.team1_score or 0, match.team2_score or 0
+    if score1 > score2:
+        return match.side1_id
+    if score2 > score1:
+        return match.side2_id
+    return None
+
+
+async def create_matches(tx, bracket: Bracket, nodes) -> list:
+    """Insert the matches of playable nodes and attach them to the bracket. Returns the new match ids."""
+    now = datetime.datetime.now()
+    rows = [(bracket.tournament_id, bracket.round_of(node), *bracket.sides(node), node, now) for node in nodes]
+    if not rows:
+        return []
+    if bracket.is_team:
+        await tx.execute_many(
+            """
+            INSERT INTO tournament_matches
+            (tournament_id, round, team1_id, team2_id, bracket_node, creation_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+    else:
+        await tx.execute_many(
+            """
+            INSERT INTO tournament_matches
+            (tournament_id, round, player1_id, player2_id, bracket_node, creation_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+    events = []
+    wanted = set(nodes)
+    for round_number in sorted({bracket.round_of(node) for node in nodes}):
+        for row in await tx.fetchall(
+            "SELECT id, bracket_node FROM tournament_matches WHERE tournament_id = ? AND round = ? AND completed = 0",
+            (bracket.tournament_id, round_number)
+        ):
+            node = row['bracket_node']
+            if node in wanted and bracket.match_ids[node] is None:
+                wanted.discard(node)
+                events.append(MatchEvent(bracket.tournament_id, MATCH_CREATED, row['id'], node))
+    await match_log.append_many(tx, bracket, events)
+    return [event.match_id for event in events]
+
+
+class BracketStore:
+    """
+    Loads brackets lazily and keeps the most recently used ones in memory.
+
+    A bracket is a snapshot row of tournament_brackets plus the
+    match_events logged after it, folded on load. Tournaments started before
+    the log existed are rebuilt from their matches on first use. Callers
+    that change a bracket load it with `for_update=True`, which takes it out
+    of the cache, log their changes through utils.match_log and `save()` it
+    in the same transaction; it is cached again only after the commit, so a
+    rollback never leaves a changed tree behind.
+
+    The cache is per process: it is only coherent while a single bot
+    process writes the database. Every tree carries the event_id it was
+    folded to and the store remembers the version of the last committed
+    save, so a reader without a transaction that read the tree before a
+    concurrent writer committed cannot cache it over the writer's tree.
+    """
+
+    def __init__(self, size: int = BRACKET_CACHE_SIZE):
+        self.size = size
+        self._cache = OrderedDict()  # tournament id -> Bracket
+        self._versions = {}  # tournament id -> event_id of the last committed save, kept past eviction
+        self._stats = {
+            'hits': 0,
+            'loads': 0,
+            'rebuilds': 0,
+            'saves': 0,
+            'snapshots': 0,
+            'folded_events': 0,
+            'replays': 0,
+            'stale': 0,
+        }
+
+    async def start(self, tx, tournament_id: int, entrants, is_team: bool = False) -> Bracket:
+        """Seed a new bracket and log the placement as its first event."""
+        bracket = Bracket.create(tournament_id, entrants, is_team)
+        await match_log.append(tx, bracket, SEEDED, data=bracket.leaves)
+        return bracket
+
+    async def load(self, tournament_id: int, tx=None, for_update: bool = False) -> Optional[Bracket]:
+        """Return the bracket of the tournament, or None if it has none."""
+        bracket = self._cache.get(tournament_id)
+        if bracket is not None:
+            self._stats['hits'] += 1
+            if for_update:
+                del self._cache[tournament_id]
+            else:
+                self._cache.move_to_end(tournament_id)
+            return bracket
+
+        row = await (tx or db).fetchone("SELECT * FROM tournament_brackets WHERE tournament_id = ?", (tournament_id,))
+        if row:
+            self._stats['loads'] += 1
+            bracket = Bracket.from_row(row)
+            events = await match_log.fetch_events(tournament_id, bracket.event_id, tx)
+            match_log.fold(bracket, events)
+            self._stats['folded_events'] += len(events)
+        else:
+            bracket = await self._rebuild(tournament_id, tx)
+        if bracket is not None and not for_update:
+            self._remember(bracket)
+        return bracket
+
+    async def _rebuild(self, tournament_id: int, tx=None) -> Optional[Bracket]:
+        rows = await (tx or db).fetchall(
+            """
+            SELECT m.*, t.type as tournament_type
+            FROM tournament_matches m
+            JOIN tournaments t ON m.tournament_id = t.id
+            WHERE m.tournament_id = ?
+            ORDER BY m.round, m.id
+            """,
+            (tournament_id,),
+            factory=dict_factory
+        )
+        if not rows:
+            return None
+        self._stats['rebuilds'] += 1
+        return Bracket.from_matches(tournament_id, [Match.from_row(row) for row in rows], rows[0]['tournament_type'] == 'public')
+
+    async def save(self, tx, bracket: Bracket):
+        """
+        Finish a change to the bracket in the transaction and cache it once committed.
+
+        The events are already logged; a new snapshot is written only for a
+        bracket without one and every BRACKET_SNAPSHOT_INTERVAL events, so
+        loads fold a short tail instead of the whole log.
+        """
+        if bracket.snapshot_id is None or bracket.pending_events >= BRACKET_SNAPSHOT_INTERVAL:
+            await tx.execute(
+                """
+                INSERT INTO tournament_brackets (tournament_id, size, is_team, slots, match_ids, event_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (tournament_id) DO UPDATE SET
+                    size = excluded.size,
+                    is_team = excluded.is_team,
+                    slots = excluded.slots,
+                    match_ids = excluded.match_ids,
+                    event_id = excluded.event_id
+                """,
+                bracket.to_row()
+            )
+            bracket.snapshot_id = bracket.event_id
+            bracket.pending_events = 0
+            self._stats['snapshots'] += 1
+        self._stats['saves'] += 1
+        self._cache.pop(bracket.tournament_id, None)
+        tx.after_commit(lambda: self._committed(bracket))
+
+    async def replay(self, tournament_id: int, tx=None) -> Optional[Bracket]:
+        """
+        Rebuild the bracket from its whole event log, ignoring snapshots.
+
+        Deterministic: the same log always folds into the same tree, so the
+        result can be compared with the stored state in an audit. Returns
+        None for tournaments whose log does not start with the seeding.
+        """
+        events = await match_log.fetch_events(tournament_id, 0, tx)
+        if not events or events[0].kind != SEEDED:
+            return None
+        self._stats['replays'] += 1
+        bracket = Bracket(tournament_id, len(events[0].data))
+        snapshot = await (tx or db).fetchone(
+            "SELECT is_team FROM tournament_brackets WHERE tournament_id = ?",
+            (tournament_id,)
+        )
+        bracket.is_team = bool(snapshot and snapshot['is_team'])
+        return match_log.fold(bracket, events)
+
+    def discard(self, tournament_id: int):
+        self._cache.pop(tournament_id, None)
+
+    def _committed(self, bracket: Bracket):
+        """Cache a bracket saved by a committed transaction and remember its version."""
+        version = self._versions.get(bracket.tournament_id, 0)
+        self._versions[bracket.tournament_id] = max(version, bracket.event_id)
+        self._remember(bracket)
+
+    def _remember(self, bracket: Bracket):
+        if bracket.event_id < self._versions.get(bracket.tournament_id, 0):
+            # Дерево прочитано до фиксации более новой записи
+            self._stats['stale'] += 1
+            return
+        self._cache[bracket.tournament_id] = bracket
+        self._cache.move_to_end(bracket.tournament_id)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return load counters since startup and the number of cached brackets."""
+        stats = dict(self._stats)
+        stats['cached'] = len(self._cache)
+        return stats
+
+
+# Shared bracket cache
+brackets = BracketStore()
@@ -1,9 +1,48 @@
 import discord
 import logging
+from utils.models import Match, Tournament
+from utils.bracket_engine import brackets
+from utils.announcements import BRACKET, get_message
+from utils.outbox import outbox, LOW
+from utils.constants import TOURNAMENT_RESULTS_CHANNEL
 
 logger = logging.getLogger(__name__)
 
 
+# Embed limits: 1024 characters per field, 6000 in total
+FIELD_LIMIT = 1024
+EMBED_LIMIT = 5500
+
+
+def round_title(round_num, total_rounds):
+    """Name of a round counted from the final."""
+    if round_num == total_rounds:
+        return "Финал"
+    if round_num == total_rounds - 1:
+        return "Полуфинал"
+    if round_num == total_rounds - 2:
+        return "Четвертьфинал"
+    return f"Раунд {round_num}"
+
+
+def format_match(match, is_team_tournament):
+    """One line of a bracket: participants and, for completed matches, the score."""
+    if is_team_tournament:
+        side1 = match.team1_name or '?'
+        side2 = match.team2_name or '?'
+    else:
+        # Используем ID для тегов и имя как запасной вариант
+        side1 = f"<@{match.player1_id}>" if match.player1_id else match.player1_name or '?'
+        side2 = f"<@{match.player2_id}>" if match.player2_id else match.player2_name or '?'
+    
+    # Add scores if match is completed
+    if match.completed == 1:
+        score1 = match.team1_score or 0
+        score2 = match.team2_score or 0
+        return f"Матч #{match.id}: {side1} **{score1}** - **{score2}** {side2}"
+    return f"Матч #{match.id}: {side1} vs {side2}"
+
+
 def create_tournament_bracket_embed(tournament_id, tournament_name, matches, match_type='BO1', round_name=None):
     """
     Create an embed with a textual representation of a tournament bracket.
@@ -11,7 +50,7 @@ def create_tournament_bracket_embed(tournament_id, tournament_name, matches, mat
     Args:
         tournament_id: ID of the tournament
         tournament_name: Name of the tournament
-        matches: List of match dictionaries with match data
+        matches: List of Match models
         match_type: Type of matches (BO1, BO3, BO5, BO7)
         round_name: Name of the specific round (optional)
         
@@ -19,14 +58,12 @@ def create_tournament_bracket_embed(tournament_id, tournament_name, matches, mat
         discord.Embed: Formatted embed for the tournament bracket
     """
     # Determine if this is a team tournament by checking first match
-    is_team_tournament = False
-    if matches and (matches[0].get('team1_name') or matches[0].get('team2_name')):
-        is_team_tournament = True
+    is_team_tournament = bool(matches) and matches[0].is_team_match
     
     # Group matches by rounds
     rounds = {}
     for match in matches:
-        round_num = match.get('round', 0)
+        round_num = match.round or 0
         if round_num not in rounds:
             rounds[round_num] = []
         rounds[round_num].append(match)
@@ -43,85 +80,107 @@ def create_tournament_bracket_embed(tournament_id, tournament_name, matches, mat
     
     # Add each round to the embed
     for round_num in sorted_rounds:
-        # Format round name based on the round number
-        if round_num == max(sorted_rounds):
-            round_title = "Финал"
-        elif round_num == max(sorted_rounds) - 1:
-            round_title = "Полуфинал"
-        elif round_num == max(sorted_rounds) - 2:
-            round_title = "Четвертьфинал"
-        else:
-            round_title = f"Раунд {round_num}"
-        
         # Format matches for this round
         matches_text = ""
-        for match in sorted(rounds[round_num], key=lambda m: m.get('id', 0)):
-            match_id = match.get('id', '?')
-            
-            # Format match participants based on tournament type
-            if is_team_tournament:
-                team1 = match.get('team1_name', '?')
-                team2 = match.get('team2_name', '?')
-                
-                # Add scores if match is completed
-                if match.get('completed', 0) == 1:
-                    score1 = match.get('team1_score', 0)
-                    score2 = match.get('team2_score', 0)
-                    matches_text += f"Матч #{match_id}: {team1} **{score1}** - **{score2}** {team2}\n"
-                else:
-                    matches_text += f"Матч #{match_id}: {team1} vs {team2}\n"
-            else:
-                # Individual tournament
-                # Используем ID для тегов и имя как запасной вариант
-                player1_id = match.get('player1_id')
-                player2_id = match.get('player2_id')
-                player1_name = match.get('player1_name', '?')
-                player2_name = match.get('player2_name', '?')
-                
-                # Форматируем для отображения - предпочитаем теги, но используем имена если теги не работают
-                player1 = f"<@{player1_id}>" if player1_id else player1_name if player1_name != '?' else '?'
-                player2 = f"<@{player2_id}>" if player2_id else player2_name if player2_name != '?' else '?'
-                
-                # Add scores if match is completed
-                if match.get('completed', 0) == 1:
-                    score1 = match.get('team1_score', 0)
-                    score2 = match.get('team2_score', 0)
-                    matches_text += f"Матч #{match_id}: {player1} **{score1}** - **{score2}** {player2}\n"
-                else:
-                    matches_text += f"Матч #{match_id}: {player1} vs {player2}\n"
+        for match in sorted(rounds[round_num], key=lambda m: m.id):
+            matches_text += format_match(match, is_team_tournament) + "\n"
         
         # Add the formatted matches to the embed
-        embed.add_field(name=round_title, value=matches_text or "Нет матчей", inline=False)
+        embed.add_field(name=round_title(round_num, max(sorted_rounds)), value=matches_text or "Нет матчей", inline=False)
+    
+    return embed
+
+
+def create_bracket_tree_embed(tournament, bracket, matches, team_names=None):
+    """
+    Create an embed of the whole single-elimination tree, future rounds included.
+    
+    Args:
+        tournament: Tournament model
+        bracket: Bracket of the tournament
+        matches: Dict of match id -> Match model
+        team_names: Dict of team id -> team name (team tournaments)
+        
+    Returns:
+        discord.Embed: Formatted embed for the tournament bracket
+    """
+    team_names = team_names or {}
+    
+    def label(entrant):
+        if entrant is None:
+            return '?'
+        return team_names.get(entrant, '?') if bracket.is_team else f"<@{entrant}>"
+    
+    embed = discord.Embed(
+        title=f"🏆 Турнирная сетка: {tournament.name}",
+        description=f"ID турнира: #{tournament.id} | Формат: {tournament.match_type}",
+        color=0xF1C40F  # Gold
+    )
+    
+    total = len(embed.title) + len(embed.description)
+    for round_num in range(1, bracket.rounds + 1):
+        lines = []
+        waiting = 0
+        for node in bracket.round_nodes(round_num):
+            side1, side2 = bracket.sides(node)
+            match = matches.get(bracket.match_ids[node])
+            if match is not None:
+                lines.append(format_match(match, bracket.is_team))
+            elif bracket.slots[node] is not None:
+                lines.append(f"{label(bracket.slots[node])} проходит без игры")
+            elif side1 is None and side2 is None:
+                waiting += 1
+            else:
+                lines.append(f"{label(side1)} vs {label(side2)}")
+        if waiting:
+            lines.append(f"Ожидают соперников: {waiting}")
+        
+        # Большие сетки обрезаются до лимитов Discord
+        value = ""
+        for shown, line in enumerate(lines):
+            rest = f"… и еще {len(lines) - shown}"
+            if len(value) + len(line) + len(rest) + 2 > FIELD_LIMIT or total + len(value) + len(line) + len(rest) > EMBED_LIMIT:
+                value += rest
+                break
+            value += line + "\n"
+        
+        name = round_title(round_num, bracket.rounds)
+        total += len(name) + len(value)
+        embed.add_field(name=name, value=value or "Нет матчей", inline=False)
+        if total >= EMBED_LIMIT:
+            break
+    
+    if bracket.champion is not None:
+        embed.add_field(name="Победитель", value=label(bracket.champion), inline=False)
     
     return embed
 
 
-def generate_tournament_bracket(tournament_id):
+async def generate_tournament_bracket(tournament_id, tx=None):
     """
-    Generate a tournament bracket based on matches in the database.
+    Generate a tournament bracket from the stored bracket tree and its matches.
     
     Args:
         tournament_id: ID of the tournament
+        tx: Transaction to read uncommitted results from (optional)
         
     Returns:
         tuple: (success, embed or error message)
     """
-    from utils.db import get_db
-    
-    # Get database connection
-    db = get_db()
-    cursor = db.cursor()
+    from utils.db import db, dict_factory
+    executor = tx or db
     
     try:
         # Get tournament info
-        cursor.execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
-        tournament = cursor.fetchone()
+        row = await executor.fetchone("SELECT * FROM tournaments WHERE id = ?", (tournament_id,))
         
-        if not tournament:
+        if not row:
             return (False, "Турнир не найден")
         
+        tournament = Tournament.from_row(row)
+        
         # Get all matches for this tournament including player information
-        cursor.execute(
+        rows = await executor.fetchall(
             """SELECT m.*, 
                   t1.team_name as team1_name, t2.team_name as team2_name,
                   p1.username as player1_name, p2.username as player2_name
@@ -132,25 +191,65 @@ def generate_tournament_bracket(tournament_id):
                LEFT JOIN players p2 ON m.player2_id = p2.user_id
                WHERE m.tournament_id = ? 
                ORDER BY m.round, m.id""", 
-            (tournament_id,)
+            (tournament_id,),
+            factory=dict_factory
         )
         
-        matches = cursor.fetchall()
+        matches = [Match.from_row(r) for r in rows]
+        # Дерево, прочитанное внутри транзакции, не кешируется до ее коммита
+        bracket = await brackets.load(tournament_id, tx=tx, for_update=tx is not None)
         
-        if not matches:
-            logger.warning(f"No matches found for tournament {tournament_id}")
-            return (False, "Для этого турнира еще не создано матчей")
+        # Матчи вне дерева (турниры, не сводимые к сетке) показываются списком
+        if bracket is None or any(bracket.node_of(match.id) is None for match in matches):
+            if not matches:
+                logger.warning(f"No matches found for tournament {tournament_id}")
+                return (False, "Для этого турнира еще не создано матчей")
+            
+            embed = create_tournament_bracket_embed(
+                tournament_id, 
+                tournament.name,
+                matches,
+                tournament.match_type
+            )
+            return (True, embed)
         
-        # Create the bracket embed
-        embed = create_tournament_bracket_embed(
-            tournament_id, 
-            tournament['name'],
-            matches,
-            tournament.get('match_type', 'BO1')
-        )
+        team_names = {}
+        if bracket.is_team:
+            team_names = {
+                team['id']: team['team_name'] for team in await executor.fetchall(
+                    "SELECT id, team_name FROM tournament_teams WHERE tournament_id = ?",
+                    (tournament_id,)
+                )
+            }
+        
+        embed = create_bracket_tree_embed(tournament, bracket, {match.id: match for match in matches}, team_names)
         
         return (True, embed)
         
     except Exception as e:
         logger.error(f"Error generating tournament bracket: {e}")
         return (False, f"Ошибка при создании турнирной сетки: {str(e)}")
+
+
+async def publish_bracket(tournament_id, tx=None, channel_id=TOURNAMENT_RESULTS_CHANNEL):
+    """
+    Show the current bracket in the tournament's live bracket message.
+    
+    The first call posts the message and registers it, later calls queue
+    coalesced edits of it, so the results channel keeps one bracket per
+    tournament instead of a new copy after every result.
+    
+    Returns:
+        bool: False if the bracket could not be built
+    """
+    success, embed = await generate_tournament_bracket(tournament_id, tx=tx)
+    if not success:
+        return False
+    
+    location = await get_message(tournament_id, BRACKET, tx=tx)
+    if location:
+        message_channel_id, message_id = location
+        await outbox.edit(tx, message_channel_id, message_id, embeds=[embed])
+    else:
+        await outbox.send(tx, channel_id, embeds=[embed], priority=LOW, register=(tournament_id, BRACKET))
+    return True
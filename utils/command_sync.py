@@ -0,0 +1,51 @@
+import json
+import time
+import hashlib
+import datetime
+import logging
+
+from utils.db import db
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = 'global'
+
+def scope_name(guild=None) -> str:
+    """Return the command_sync key of a sync scope."""
+    return GLOBAL_SCOPE if guild is None else f"guild:{guild.id}"
+
+def tree_fingerprint(tree, guild=None) -> str:
+    """Hash the payload that tree.sync() would upload for the scope."""
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+async def sync_commands(tree, guild=None, force: bool = False):
+    """
+    Sync the command tree for one scope if it changed since the last sync.
+
+    The fingerprint of the last uploaded payload is kept in command_sync, so
+    restarts and reconnects with an unchanged tree cost no REST call.
+    Returns the synced commands, or None if the sync was skipped.
+    """
+    scope = scope_name(guild)
+    fingerprint = tree_fingerprint(tree, guild)
+    if not force:
+        row = await db.fetchone("SELECT fingerprint FROM command_sync WHERE scope = ?", (scope,))
+        if row and row['fingerprint'] == fingerprint:
+            logger.info(f"Commands for {scope} unchanged, sync skipped")
+            return None
+
+    started = time.perf_counter()
+    synced = await tree.sync(guild=guild)
+    await db.execute(
+        """
+        INSERT INTO command_sync (scope, fingerprint, synced_at) VALUES (?, ?, ?)
+        ON CONFLICT (scope) DO UPDATE SET
+            fingerprint = excluded.fingerprint,
+            synced_at = excluded.synced_at
+        """,
+        (scope, fingerprint, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    )
+    logger.info(f"Synced {len(synced)} commands to {scope} in {time.perf_counter() - started:.2f}s: {', '.join(cmd.name for cmd in synced)}")
+    return synced
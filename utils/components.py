@@ -0,0 +1,69 @@
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+# action -> async handler(interaction, target_id)
+_handlers = {}
+
+
+def custom_id(action: str, target_id: int) -> str:
+    """Build the custom_id of a routed component, e.g. "join:42"."""
+    return f"{action}:{target_id}"
+
+
+def action(name: str):
+    """Register the decorated coroutine as the handler of `name` buttons."""
+    def decorator(handler):
+        if name in _handlers:
+            raise ValueError(f"Component action {name!r} is already registered")
+        _handlers[name] = handler
+        return handler
+    return decorator
+
+
+async def dispatch(interaction: discord.Interaction, name: str, target_id: int):
+    """Run the handler registered for `name`."""
+    handler = _handlers.get(name)
+    if handler is None:
+        logger.warning(f"No handler for component {custom_id(name, target_id)}")
+        await interaction.response.send_message("Эта кнопка больше не поддерживается.", ephemeral=True)
+        return
+    await handler(interaction, target_id)
+
+
+class ActionButton(discord.ui.DynamicItem[discord.ui.Button], template=r'(?P<action>[a-z_]+):(?P<target_id>[0-9]+)'):
+    """
+    Button whose custom_id carries the action and the target id.
+
+    The class is registered once with `bot.add_dynamic_items`, so discord.py
+    does not keep a View per message: every click is matched by its
+    custom_id and routed to the handler registered with `@action`, which
+    also works for buttons posted before a restart.
+    """
+
+    def __init__(self, action: str, target_id: int, label: str = None,
+                 style: discord.ButtonStyle = discord.ButtonStyle.secondary, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            disabled=disabled,
+            custom_id=custom_id(action, target_id)
+        ))
+        self.action = action
+        self.target_id = target_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['action'], int(match['target_id']))
+
+    async def callback(self, interaction: discord.Interaction):
+        await dispatch(interaction, self.action, self.target_id)
+
+
+def build_view(*buttons: ActionButton) -> discord.ui.View:
+    """Return a view of routed buttons, to be passed to send() or edit()."""
+    view = discord.ui.View(timeout=None)
+    for button in buttons:
+        view.add_item(button)
+    return view
@@ -1,13 +1,50 @@
 import sqlite3
 import os
+import time
+import asyncio
+import functools
 import logging
+import threading
+import traceback
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
+from collections import namedtuple
 from sqlite3 import Connection
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Database path
+# Database backend: "sqlite" (DB_PATH) or "postgres" (DATABASE_URL)
+DB_BACKEND = os.getenv('DB_BACKEND', 'sqlite')
 DB_PATH = "tournaments.db"
+DATABASE_URL = os.getenv('DATABASE_URL', '')
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_LEAK_THRESHOLD = float(os.getenv('DB_LEAK_THRESHOLD', '60'))
+
+# Async executor settings. With WAL readers do not block each other or the
+# writer, so several threads can serve reads while writes stay serialized.
+DB_EXECUTOR_THREADS = int(os.getenv('DB_EXECUTOR_THREADS', '4'))
+DB_QUEUE_SIZE = int(os.getenv('DB_QUEUE_SIZE', '256'))
+
+# Pragma profile applied to every pooled connection (empty value = SQLite default)
+DB_PRAGMAS = {
+    'journal_mode': os.getenv('DB_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('DB_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.getenv('DB_BUSY_TIMEOUT', '5000'),  # ms
+    'cache_size': os.getenv('DB_CACHE_SIZE', '-16000'),  # negative = KiB
+    'mmap_size': os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)),
+    'temp_store': os.getenv('DB_TEMP_STORE', 'MEMORY'),
+    'journal_size_limit': os.getenv('DB_JOURNAL_SIZE_LIMIT', str(16 * 1024 * 1024)),
+}
+
+# WAL checkpoint settings: a passive checkpoint runs every interval, and the
+# WAL is truncated once it grows past the size limit.
+DB_CHECKPOINT_INTERVAL = float(os.getenv('DB_CHECKPOINT_INTERVAL', '300'))
+DB_WAL_SIZE_LIMIT = int(os.getenv('DB_WAL_SIZE_LIMIT', str(16 * 1024 * 1024)))
 
 def dict_factory(cursor, row):
     """Convert database row objects to a dictionary."""
@@ -16,159 +53,703 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
-def get_db() -> Connection:
-    """Get a connection to the database with row factory set to dict_factory."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    return conn
 
-def create_tables():
-    """Create database tables if they don't exist."""
-    conn = get_db()
+class Row(sqlite3.Row):
+    """
+    Lightweight read-only row used as the connection row factory.
+    
+    Values stay in the C-level sqlite3.Row and column names are shared per
+    statement, so no per-row dict is built. Supports the dict-style access
+    used by the cogs: row['field'], row.get('field', default),
+    'field' in row and row.keys().
+    
+    Lookups by name scan the column names, so reading many fields of many
+    rows costs about twice as much as with dicts. Hot paths that turn whole
+    result sets into models fetch them with `fetchall(..., factory=dict_factory)`.
+    """
+    __slots__ = ()
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except IndexError:
+            return default
+    
+    def __contains__(self, key):
+        return key in self.keys()
+    
+    def items(self):
+        return zip(self.keys(), tuple(self))
+    
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def apply_pragmas(conn, pragmas: dict):
+    """Apply a pragma profile to a connection. journal_mode goes first, it may change the others."""
+    for name in sorted(pragmas, key=lambda name: name != 'journal_mode'):
+        value = pragmas[name]
+        if value is None or value == '':
+            continue
+        result = conn.execute(f"PRAGMA {name} = {value}").fetchone()
+        if name == 'journal_mode' and result and str(result[0]).lower() != str(value).lower():
+            # In-memory and some network file systems cannot use WAL
+            logger.warning(f"journal_mode {value} is not available for this database, using {result[0]}")
+
+
+def fetch_rows(conn, sql: str, params=(), factory=None) -> list:
+    """Fetch all rows of a statement, built by `factory` instead of the connection's row factory if given."""
     cursor = conn.cursor()
+    if factory is not None:
+        cursor.row_factory = factory
+    return cursor.execute(sql, params).fetchall()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled sqlite3 connection.
+    
+    Behaves like a regular connection, but `close()` returns the underlying
+    connection to the pool instead of closing it. Can also be used as a
+    context manager: the connection is released on exit.
+    """
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        # Reclaim the connection if the proxy is garbage collected unreleased
+        self._finalizer = weakref.finalize(self, pool._reclaim, conn)
+    
+    def __getattr__(self, name):
+        if self._released:
+            raise sqlite3.ProgrammingError("Connection has already been returned to the pool")
+        return getattr(self._conn, name)
+    
+    def close(self):
+        """Return the connection to the pool."""
+        if self._released:
+            return
+        self._released = True
+        self._finalizer.detach()
+        self._pool.release(self._conn)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections.
+    
+    Connections are created lazily up to `size` and reused afterwards.
+    Checkouts that outlive `leak_threshold` seconds are reported as leaks,
+    and connections dropped without being released are reclaimed.
+    """
+    
+    dialect = 'sqlite'
+    
+    def __init__(self, path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 leak_threshold: float = DB_LEAK_THRESHOLD, pragmas: dict = None):
+        self.path = path
+        self.pragmas = DB_PRAGMAS if pragmas is None else pragmas
+        self.errors = (sqlite3.Error,)
+        self.size = size
+        self.timeout = timeout
+        self.leak_threshold = leak_threshold
+        self._idle = []
+        self._checked_out = {}  # id(conn) -> (checkout time, stack summary)
+        self._created = 0
+        self._lock = threading.Condition()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'leaks': 0,
+        }
+    
+    def _connect(self) -> Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
     
-    try:
-        # Create players table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0
-        )
-        ''')
+    def acquire(self) -> PooledConnection:
+        """Check out a connection, waiting up to `timeout` seconds if the pool is exhausted."""
+        with self._lock:
+            conn = None
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats['hits'] += 1
+            elif self._created < self.size:
+                self._created += 1
+                self._stats['misses'] += 1
+            else:
+                self._stats['waits'] += 1
+                started = time.monotonic()
+                deadline = started + self.timeout
+                while not self._idle:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._lock.wait(remaining):
+                        if self._idle:
+                            break
+                        self._stats['wait_time'] += time.monotonic() - started
+                        self._stats['timeouts'] += 1
+                        self._report_leaks()
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                conn = self._idle.pop()
+                self._stats['wait_time'] += time.monotonic() - started
         
-        # Create tournaments table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tournaments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,  -- "private" / "public"
-            weapon_type TEXT,
-            rules TEXT,
-            prize INTEGER DEFAULT 0,
-            entry_fee INTEGER DEFAULT 0,
-            tournament_date DATETIME,
-            max_participants INTEGER,
-            participants_per_team INTEGER,
-            creator_id INTEGER,
-            winner_id INTEGER,
-            winner_team_id INTEGER,
-            status TEXT DEFAULT 'pending',  -- "pending" / "approved" / "rejected" / "in_progress" / "completed" / "cancelled"
-            approved_by INTEGER,
-            rejection_reason TEXT,
-            cancellation_reason TEXT,
-            creation_date DATETIME,
-            notification_sent INTEGER DEFAULT 0,
-            started INTEGER DEFAULT 0,
-            FOREIGN KEY (creator_id) REFERENCES players(user_id),
-            FOREIGN KEY (winner_id) REFERENCES players(user_id)
-        )
-        ''')
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                    self._lock.notify()
+                raise
         
-        # Create tournament participants table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tournament_participants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER,
-            user_id INTEGER,
-            join_date DATETIME,
-            FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
-            FOREIGN KEY (user_id) REFERENCES players(user_id)
-        )
-        ''')
+        with self._lock:
+            self._checked_out[id(conn)] = (time.monotonic(), traceback.extract_stack(limit=6)[:-1])
+        return PooledConnection(self, conn)
+    
+    def release(self, conn: Connection):
+        """Return a connection to the pool, rolling back any unfinished transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except self.errors as e:
+            logger.error(f"Discarding broken pooled connection: {e}")
+            with self._lock:
+                self._checked_out.pop(id(conn), None)
+                self._created -= 1
+                self._lock.notify()
+            return
         
-        # Create tournament teams table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tournament_teams (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER,
-            team_name TEXT,
-            captain_id INTEGER,
-            registration_date DATETIME,
-            FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
-            FOREIGN KEY (captain_id) REFERENCES players(user_id)
-        )
-        ''')
+        with self._lock:
+            self._checked_out.pop(id(conn), None)
+            self._idle.append(conn)
+            self._lock.notify()
+    
+    def _reclaim(self, conn: Connection):
+        with self._lock:
+            self._stats['leaks'] += 1
+            checkout = self._checked_out.get(id(conn))
+        origin = ''.join(traceback.format_list(checkout[1])) if checkout else 'unknown'
+        logger.warning(f"Database connection was never returned to the pool, reclaiming it. Checked out at:\n{origin}")
+        self.release(conn)
+    
+    def _report_leaks(self):
+        now = time.monotonic()
+        for checked_out_at, stack in list(self._checked_out.values()):
+            held = now - checked_out_at
+            if held >= self.leak_threshold:
+                logger.warning(
+                    f"Database connection held for {held:.1f}s, possible leak. Checked out at:\n"
+                    + ''.join(traceback.format_list(stack))
+                )
+    
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def stats(self) -> dict:
+        """Return a snapshot of pool counters."""
+        with self._lock:
+            self._report_leaks()
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['created'] = self._created
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._checked_out)
+            checkouts = stats['hits'] + stats['misses'] + stats['waits']
+            stats['hit_rate'] = round(stats['hits'] / checkouts * 100, 1) if checkouts else 0.0
+            stats['avg_wait_ms'] = round(stats['wait_time'] / stats['waits'] * 1000, 2) if stats['waits'] else 0.0
+            return stats
+    
+    def close_all(self):
+        """Close all idle connections. Checked out connections are closed when released."""
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+
+
+# Result of a write statement
+QueryResult = namedtuple('QueryResult', ['lastrowid', 'rowcount'])
+
+
+class Transaction:
+    """
+    A single pooled connection used for a group of statements.
+    
+    Every statement runs on the database executor thread. Obtained through
+    `AsyncDatabase.transaction()`, which commits or rolls back on exit.
+    """
+    
+    def __init__(self, database, conn):
+        self._database = database
+        self._conn = conn
+        self._after_commit = []
+    
+    def after_commit(self, callback):
+        """Call `callback()` once the transaction has been committed (not on rollback)."""
+        self._after_commit.append(callback)
+    
+    def _execute(self, sql, params):
+        cursor = self._conn.execute(sql, params)
+        return QueryResult(cursor.lastrowid, cursor.rowcount)
+    
+    def _execute_many(self, sql, seq_of_params):
+        cursor = self._conn.executemany(sql, seq_of_params)
+        return QueryResult(cursor.lastrowid, cursor.rowcount)
+    
+    def _fetchone(self, sql, params):
+        return self._conn.execute(sql, params).fetchone()
+    
+    def _fetchall(self, sql, params, factory):
+        return fetch_rows(self._conn, sql, params, factory)
+    
+    async def execute(self, sql: str, params=()) -> QueryResult:
+        """Execute a statement inside the transaction."""
+        return await self._database._submit(self._execute, sql, params)
+    
+    async def execute_many(self, sql: str, seq_of_params) -> QueryResult:
+        """Execute a statement for every parameter set inside the transaction."""
+        return await self._database._submit(self._execute_many, sql, list(seq_of_params))
+    
+    async def fetchone(self, sql: str, params=()):
+        """Fetch a single row inside the transaction."""
+        return await self._database._submit(self._fetchone, sql, params)
+    
+    async def fetchall(self, sql: str, params=(), factory=None):
+        """Fetch all rows inside the transaction, optionally with another row factory."""
+        return await self._database._submit(self._fetchall, sql, params, factory)
+
+
+class AsyncDatabase:
+    """
+    Non-blocking access to the database from the event loop.
+    
+    Statements run on a dedicated executor thread using pooled connections,
+    so slow queries never stall the gateway. At most `queue_size` statements
+    may be waiting at once; further callers wait asynchronously for a slot.
+    Write transactions are serialized to avoid SQLite lock contention.
+    """
+    
+    def __init__(self, pool: ConnectionPool, threads: int = DB_EXECUTOR_THREADS, queue_size: int = DB_QUEUE_SIZE):
+        self.pool = pool
+        self.threads = threads
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='db')
+        self._slots = None
+        self._write_lock = None
+        self._pending = 0
+        self._stats = {
+            'statements': 0,
+            'transactions': 0,
+            'errors': 0,
+            'max_pending': 0,
+            'checkpoints': 0,
+            'checkpoint_busy': 0,
+            'wal_frames': 0,
+        }
+    
+    def _primitives(self):
+        # Created lazily so they bind to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._write_lock = asyncio.Lock()
+        return self._slots, self._write_lock
+    
+    async def _submit(self, func, *args, **kwargs):
+        slots, _ = self._primitives()
+        async with slots:
+            self._pending += 1
+            self._stats['max_pending'] = max(self._stats['max_pending'], self._pending)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+            finally:
+                self._pending -= 1
+                self._stats['statements'] += 1
+    
+    def _with_connection(self, func, *args, commit=False):
+        with self.pool.connection() as conn:
+            result = func(conn, *args)
+            if commit:
+                conn.commit()
+            return result
+    
+    async def fetchone(self, sql: str, params=()):
+        """Fetch a single row (or None)."""
+        return await self._submit(self._with_connection, lambda conn: conn.execute(sql, params).fetchone())
+    
+    async def fetchall(self, sql: str, params=(), factory=None):
+        """Fetch all rows, optionally built by another row factory (e.g. dict_factory)."""
+        return await self._submit(self._with_connection, lambda conn: fetch_rows(conn, sql, params, factory))
+    
+    async def execute(self, sql: str, params=()) -> QueryResult:
+        """Execute a single write statement and commit it."""
+        def run(conn):
+            cursor = conn.execute(sql, params)
+            return QueryResult(cursor.lastrowid, cursor.rowcount)
+        
+        _, write_lock = self._primitives()
+        async with write_lock:
+            return await self._submit(self._with_connection, run, commit=True)
+    
+    async def execute_many(self, sql: str, seq_of_params) -> QueryResult:
+        """Execute a write statement for every parameter set and commit once."""
+        seq_of_params = list(seq_of_params)
         
-        # Create tournament matches table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tournament_matches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER,
-            round INTEGER,
-            team1_id INTEGER,
-            team2_id INTEGER,
-            player1_id INTEGER,
-            player2_id INTEGER,
-            team1_score INTEGER,
-            team2_score INTEGER,
-            completed INTEGER DEFAULT 0,
-            notes TEXT,
-            creation_date DATETIME,
-            completion_date DATETIME,
-            FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
-            FOREIGN KEY (team1_id) REFERENCES tournament_teams(id),
-            FOREIGN KEY (team2_id) REFERENCES tournament_teams(id),
-            FOREIGN KEY (player1_id) REFERENCES players(user_id),
-            FOREIGN KEY (player2_id) REFERENCES players(user_id)
-        )
-        ''')
+        def run(conn):
+            cursor = conn.executemany(sql, seq_of_params)
+            return QueryResult(cursor.lastrowid, cursor.rowcount)
         
-        # Create player_stats table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS player_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            tournament_id INTEGER,
-            place INTEGER,
-            tournament_type TEXT,  -- "private" / "public"
-            FOREIGN KEY (user_id) REFERENCES players(user_id),
-            FOREIGN KEY (tournament_id) REFERENCES tournaments(id)
-        )
-        ''')
+        _, write_lock = self._primitives()
+        async with write_lock:
+            return await self._submit(self._with_connection, run, commit=True)
+    
+    async def run_sync(self, func, *args):
+        """Run a blocking function on the database executor thread."""
+        return await self._submit(func, *args)
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Run several statements atomically on one connection.
         
-        # Create achievements table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS achievements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT
-        )
-        ''')
+        Commits when the block exits normally and rolls back on error.
+        Do not call the non-transactional write methods inside the block.
+        """
+        _, write_lock = self._primitives()
+        async with write_lock:
+            conn = await self._submit(self.pool.acquire)
+            try:
+                tx = Transaction(self, conn)
+                yield tx
+                await self._submit(conn.commit)
+                self._stats['transactions'] += 1
+            except BaseException:
+                await asyncio.shield(self._submit(conn.rollback))
+                raise
+            finally:
+                await asyncio.shield(self._submit(conn.close))
         
-        # Create player_achievements table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS player_achievements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            achievement_id INTEGER,
-            earned_date DATETIME,
-            FOREIGN KEY (user_id) REFERENCES players(user_id),
-            FOREIGN KEY (achievement_id) REFERENCES achievements(id)
-        )
-        ''')
+        for callback in tx._after_commit:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in after-commit callback: {e}")
+    
+    def wal_size(self) -> int:
+        """Size of the WAL file in bytes (0 when there is none)."""
+        try:
+            return os.path.getsize(f"{self.pool.path}-wal")
+        except OSError:
+            return 0
+    
+    async def checkpoint(self, mode: str = 'PASSIVE'):
+        """
+        Copy WAL frames back into the database file.
         
-        # Create player_penalties table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS player_penalties (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            points INTEGER,
-            reason TEXT,
-            issued_by INTEGER,
-            issue_date DATETIME,
-            FOREIGN KEY (user_id) REFERENCES players(user_id),
-            FOREIGN KEY (issued_by) REFERENCES players(user_id)
-        )
-        ''')
+        PASSIVE never waits for readers or writers. RESTART and TRUNCATE wait
+        for the write lock, so they run after queued writes, and may still
+        report busy if a long reader holds an old snapshot. Returns the
+        (busy, wal frames, checkpointed frames) row of wal_checkpoint.
+        """
+        def run(conn):
+            return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
         
-        conn.commit()
-        logger.info("Database tables created successfully")
+        if self.pool.dialect != 'sqlite':
+            return (0, 0, 0)
         
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
-        conn.rollback()
+        if mode.upper() == 'PASSIVE':
+            result = await self._submit(self._with_connection, run)
+        else:
+            _, write_lock = self._primitives()
+            async with write_lock:
+                result = await self._submit(self._with_connection, run)
         
-    finally:
-        conn.close()
+        busy, frames, checkpointed = result
+        self._stats['checkpoints'] += 1
+        self._stats['checkpoint_busy'] += busy
+        self._stats['wal_frames'] = frames
+        return result
+    
+    async def maintain_wal(self, size_limit: int = DB_WAL_SIZE_LIMIT):
+        """Run a passive checkpoint, truncating the WAL if it has grown past `size_limit` bytes."""
+        if self.wal_size() > size_limit:
+            result = await self.checkpoint('TRUNCATE')
+            logger.info(f"WAL exceeded {size_limit} bytes, truncating checkpoint: {result}")
+            return result
+        return await self.checkpoint('PASSIVE')
+    
+    def stats(self) -> dict:
+        """Return executor counters (statements run, queue depth, errors, checkpoints)."""
+        stats = dict(self._stats)
+        stats['pending'] = self._pending
+        stats['queue_size'] = self.queue_size
+        stats['threads'] = self.threads
+        stats['wal_size'] = self.wal_size()
+        return stats
+    
+    def close(self):
+        """Stop the executor thread after pending statements finish."""
+        self._executor.shutdown(wait=True)
+
+
+def create_pool(backend: str = DB_BACKEND) -> ConnectionPool:
+    """Create the connection pool for the configured backend."""
+    if backend == 'postgres':
+        from utils.postgres import PostgresPool
+        return PostgresPool(DATABASE_URL)
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown DB_BACKEND: {backend}")
+    return ConnectionPool(DB_PATH)
+
+# Shared pool used by all cogs
+pool = create_pool()
+
+# Shared async database API used by all cogs
+db = AsyncDatabase(pool)
+
+def get_db() -> PooledConnection:
+    """
+    Check out a pooled connection with row factory set to Row.
+    
+    Call `close()` (or use it as a context manager) to return it to the pool.
+    """
+    return pool.acquire()
+
+def get_pool_stats() -> dict:
+    """Return connection pool counters (hits, misses, waits, wait time, leaks)."""
+    return pool.stats()
+
+# Secondary indexes for the hot lookup predicates: name -> (table, columns)
+# Indexes with the idx_ prefix that are not listed here are dropped at startup.
+INDEXES = {
+    'idx_tournament_participants_tournament_user': ('tournament_participants', ('tournament_id', 'user_id')),
+    'idx_tournament_matches_tournament_round': ('tournament_matches', ('tournament_id', 'round', 'completed')),
+    'idx_tournament_teams_tournament_name': ('tournament_teams', ('tournament_id', 'team_name')),
+    'idx_player_stats_user_type_place': ('player_stats', ('user_id', 'tournament_type', 'place')),
+    'idx_player_achievements_user_achievement': ('player_achievements', ('user_id', 'achievement_id')),
+    'idx_tournaments_status_started_date': ('tournaments', ('status', 'started', 'tournament_date')),
+    'idx_outbox_status_next_attempt': ('outbox', ('status', 'next_attempt_at')),
+    'idx_outbox_message_status': ('outbox', ('message_id', 'status')),
+    'idx_interaction_dedup_expires': ('interaction_dedup', ('expires_at',)),
+    'idx_match_events_tournament': ('match_events', ('tournament_id', 'id')),
+}
+
+def create_indexes(cursor):
+    """
+    Bring the secondary indexes in line with INDEXES.
+    
+    Missing indexes are created, indexes whose columns changed are rebuilt
+    and stale idx_* indexes are dropped. Safe to run on every startup.
+    """
+    postgres = getattr(cursor, 'dialect', 'sqlite') == 'postgres'
+    if postgres:
+        cursor.execute("SELECT indexname as name FROM pg_indexes WHERE schemaname = current_schema() AND indexname LIKE 'idx\\_%'")
+    else:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'")
+    existing = {row['name'] for row in cursor.fetchall()}
+    
+    # Tables added by later migrations get their indexes when they are created
+    if postgres:
+        cursor.execute("SELECT table_name as name FROM information_schema.tables WHERE table_schema = current_schema()")
+    else:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row['name'] for row in cursor.fetchall()}
+    
+    for name in existing - INDEXES.keys():
+        logger.info(f"Dropping stale index {name}")
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    
+    for name, (table, columns) in INDEXES.items():
+        if table not in tables:
+            continue
+        if name in existing:
+            if postgres:
+                cursor.execute(
+                    """
+                    SELECT a.attname as name, array_position(i.indkey::int2[], a.attnum) as seqno
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                    WHERE c.relname = ?
+                    """,
+                    (name,)
+                )
+            else:
+                cursor.execute(f"PRAGMA index_info({name})")
+            current = tuple(row['name'] for row in sorted(cursor.fetchall(), key=lambda r: r['seqno']))
+            if current == tuple(columns):
+                continue
+            logger.info(f"Rebuilding index {name}: {current} -> {columns}")
+            cursor.execute(f"DROP INDEX {name}")
+        
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+def create_schema(cursor):
+    """
+    Create all tables and secondary indexes using the given cursor.
+    
+    This is the baseline schema; later changes live in utils.migrations.
+    """
+    # Create players table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS players (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0
+    )
+    ''')
+    
+    # Create tournaments table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tournaments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,  -- "private" / "public"
+        weapon_type TEXT,
+        rules TEXT,
+        prize INTEGER DEFAULT 0,
+        entry_fee INTEGER DEFAULT 0,
+        tournament_date DATETIME,
+        max_participants INTEGER,
+        participants_per_team INTEGER,
+        creator_id INTEGER,
+        winner_id INTEGER,
+        winner_team_id INTEGER,
+        status TEXT DEFAULT 'pending',  -- "pending" / "approved" / "rejected" / "in_progress" / "completed" / "cancelled"
+        approved_by INTEGER,
+        rejection_reason TEXT,
+        cancellation_reason TEXT,
+        creation_date DATETIME,
+        notification_sent INTEGER DEFAULT 0,
+        started INTEGER DEFAULT 0,
+        FOREIGN KEY (creator_id) REFERENCES players(user_id),
+        FOREIGN KEY (winner_id) REFERENCES players(user_id)
+    )
+    ''')
+    
+    # Create tournament participants table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tournament_participants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tournament_id INTEGER,
+        user_id INTEGER,
+        join_date DATETIME,
+        FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
+        FOREIGN KEY (user_id) REFERENCES players(user_id)
+    )
+    ''')
+    
+    # Create tournament teams table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tournament_teams (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tournament_id INTEGER,
+        team_name TEXT,
+        captain_id INTEGER,
+        registration_date DATETIME,
+        FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
+        FOREIGN KEY (captain_id) REFERENCES players(user_id)
+    )
+    ''')
+    
+    # Create tournament matches table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tournament_matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tournament_id INTEGER,
+        round INTEGER,
+        team1_id INTEGER,
+        team2_id INTEGER,
+        player1_id INTEGER,
+        player2_id INTEGER,
+        team1_score INTEGER,
+        team2_score INTEGER,
+        completed INTEGER DEFAULT 0,
+        notes TEXT,
+        creation_date DATETIME,
+        completion_date DATETIME,
+        FOREIGN KEY (tournament_id) REFERENCES tournaments(id),
+        FOREIGN KEY (team1_id) REFERENCES tournament_teams(id),
+        FOREIGN KEY (team2_id) REFERENCES tournament_teams(id),
+        FOREIGN KEY (player1_id) REFERENCES players(user_id),
+        FOREIGN KEY (player2_id) REFERENCES players(user_id)
+    )
+    ''')
+    
+    # Create player_stats table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        tournament_id INTEGER,
+        place INTEGER,
+        tournament_type TEXT,  -- "private" / "public"
+        FOREIGN KEY (user_id) REFERENCES players(user_id),
+        FOREIGN KEY (tournament_id) REFERENCES tournaments(id)
+    )
+    ''')
+    
+    # Create achievements table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT
+    )
+    ''')
+    
+    # Create player_achievements table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        achievement_id INTEGER,
+        earned_date DATETIME,
+        FOREIGN KEY (user_id) REFERENCES players(user_id),
+        FOREIGN KEY (achievement_id) REFERENCES achievements(id)
+    )
+    ''')
+    
+    # Create player_penalties table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_penalties (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        points INTEGER,
+        reason TEXT,
+        issued_by INTEGER,
+        issue_date DATETIME,
+        FOREIGN KEY (user_id) REFERENCES players(user_id),
+        FOREIGN KEY (issued_by) REFERENCES players(user_id)
+    )
+    ''')
+    
+    # Secondary indexes
+    create_indexes(cursor)
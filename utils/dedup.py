@@ -0,0 +1,98 @@
+import os
+import time
+import datetime
+import logging
+
+from utils.db import db
+from utils.resolver import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Interaction tokens live 15 minutes, a redelivery cannot come later than that
+INTERACTION_DEDUP_TTL = float(os.getenv('INTERACTION_DEDUP_TTL', '900'))  # seconds
+INTERACTION_DEDUP_SIZE = int(os.getenv('INTERACTION_DEDUP_SIZE', '10000'))
+# "memory" (one process) or "db" (shared by all workers on the database, survives restarts)
+INTERACTION_DEDUP_BACKEND = os.getenv('INTERACTION_DEDUP_BACKEND', 'memory')
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class DedupStore:
+    """
+    Remembers processed keys (interaction ids) for `ttl` seconds.
+
+    Keys are kept in a size-bounded LRU, so memory stays constant however
+    long the process runs. With the "db" backend a key is also claimed in
+    the interaction_dedup table, which makes the check hold across restarts
+    and between bot workers sharing the database; expired rows are purged
+    at most once per TTL.
+    """
+
+    def __init__(self, ttl: float = INTERACTION_DEDUP_TTL, size: int = INTERACTION_DEDUP_SIZE,
+                 backend: str = INTERACTION_DEDUP_BACKEND):
+        self.ttl = ttl
+        self.backend = backend
+        self._seen = TTLCache(size, ttl)
+        self._last_purge = 0.0
+        self._stats = {
+            'claimed': 0,
+            'duplicates': 0,
+            'purged': 0,
+        }
+
+    async def claim(self, key) -> bool:
+        """Mark `key` as processed. Returns False if it was already claimed."""
+        key = str(key)
+        if self._seen.get(key):
+            self._stats['duplicates'] += 1
+            return False
+        self._seen.set(key, True)
+
+        if self.backend == 'db':
+            try:
+                if not await self._claim_in_db(key):
+                    self._stats['duplicates'] += 1
+                    return False
+            except Exception as e:
+                # Без базы остаётся проверка в памяти этого процесса
+                logger.error(f"Error claiming {key} in the dedup table: {e}")
+
+        self._stats['claimed'] += 1
+        return True
+
+    async def _claim_in_db(self, key: str) -> bool:
+        now = datetime.datetime.now()
+        expires_at = (now + datetime.timedelta(seconds=self.ttl)).strftime(TIME_FORMAT)
+        # An expired row is taken over, a live one means another worker got the key first
+        result = await db.execute(
+            """
+            INSERT INTO interaction_dedup (key, expires_at) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at
+            WHERE interaction_dedup.expires_at < ?
+            """,
+            (key, expires_at, now.strftime(TIME_FORMAT))
+        )
+        if time.monotonic() - self._last_purge >= self.ttl:
+            await self.purge()
+        return result.rowcount > 0
+
+    async def purge(self) -> int:
+        """Delete expired keys from the dedup table."""
+        self._last_purge = time.monotonic()
+        result = await db.execute(
+            "DELETE FROM interaction_dedup WHERE expires_at < ?",
+            (datetime.datetime.now().strftime(TIME_FORMAT),)
+        )
+        self._stats['purged'] += result.rowcount
+        return result.rowcount
+
+    def stats(self) -> dict:
+        """Return claim counters since startup and the number of keys in memory."""
+        stats = dict(self._stats)
+        stats['backend'] = self.backend
+        stats['cached'] = len(self._seen)
+        return stats
+
+
+# Shared store for duplicate interaction deliveries
+interaction_dedup = DedupStore()
@@ -1,12 +1,14 @@
 import discord
 import datetime
+from utils.models import normalize_match_type
 
-def create_private_tournament_embed(tournament):
+def create_private_tournament_embed(tournament, participant_count=0):
     """
     Create an embed for a private tournament announcement.
     
     Args:
         tournament: Dictionary with tournament data from the database
+        participant_count: Number of registered participants
         
     Returns:
         discord.Embed: Formatted embed for the tournament
@@ -26,8 +28,8 @@ def create_private_tournament_embed(tournament):
     # Добавление ID турнира в основные поля
     embed.add_field(name="ID Турнира", value=f"#{tournament['id']}", inline=True)
     embed.add_field(name="Дата", value=tournament_date, inline=True)
-    embed.add_field(name="Тип матчей", value=tournament.get('match_type', 'BO1'), inline=True)
-    embed.add_field(name="Участники", value=f"0/{tournament['max_participants']}", inline=True)
+    embed.add_field(name="Тип матчей", value=normalize_match_type(tournament.get('match_type')), inline=True)
+    embed.add_field(name="Участники", value=f"{participant_count}/{tournament['max_participants']}", inline=True)
     
     if tournament['entry_fee'] > 0:
         embed.add_field(name="Вступительный взнос", value=f"{tournament['entry_fee']}$ (передать организатору)", inline=False)
@@ -39,12 +41,13 @@ def create_private_tournament_embed(tournament):
     
     return embed
 
-def create_public_tournament_embed(tournament):
+def create_public_tournament_embed(tournament, team_count=0):
     """
     Create an embed for a public tournament announcement.
     
     Args:
         tournament: Dictionary with tournament data from the database
+        team_count: Number of registered teams
         
     Returns:
         discord.Embed: Formatted embed for the tournament
@@ -64,8 +67,9 @@ def create_public_tournament_embed(tournament):
     # Добавление ID турнира в основные поля
     embed.add_field(name="ID Турнира", value=f"#{tournament['id']}", inline=True)
     embed.add_field(name="Дата", value=tournament_date, inline=True)
-    embed.add_field(name="Тип матчей", value=tournament.get('match_type', 'BO1'), inline=True)
+    embed.add_field(name="Тип матчей", value=normalize_match_type(tournament.get('match_type')), inline=True)
     embed.add_field(name="Участников на команду", value=str(tournament['participants_per_team']), inline=True)
+    embed.add_field(name="Зарегистрировано команд", value=str(team_count), inline=True)
     
     if tournament['entry_fee'] > 0:
         embed.add_field(name="Вступительный взнос", value=f"{tournament['entry_fee']}$ (передать организатору)", inline=False)
@@ -108,100 +112,59 @@ def create_tournament_notification_embed(tournament):
     # Добавление ID турнира, даты и типа матча
     embed.add_field(name="ID Турнира", value=f"#{tournament['id']}", inline=True)
     embed.add_field(name="Дата и время", value=tournament_date, inline=True)
-    embed.add_field(name="Тип матчей", value=tournament.get('match_type', 'BO1'), inline=True)
+    embed.add_field(name="Тип матчей", value=normalize_match_type(tournament.get('match_type')), inline=True)
     
     # Добавление футера с ID для удобства использования в командах
     embed.set_footer(text=f"Для взаимодействия с этим турниром используйте ID: {tournament['id']}")
     
     return embed
 
-def create_match_result_embed(match, score_team1, score_team2):
+def create_match_result_embed(match, score_team1, score_team2, winner_id=None):
     """
     Create an embed for match results.
     
     Args:
-        match: Dictionary with match data from the database
+        match: Match model with tournament name and match type
         score_team1: Score for team 1
         score_team2: Score for team 2
+        winner_id: Winning team or player, as credited in the stats and the bracket
         
     Returns:
         discord.Embed: Formatted embed for the match results
     """
     embed = discord.Embed(
-        title=f"🏁 Результаты матча: {match['tournament_name']}",
-        description=f"Матч #{match['id']} завершен!",
+        title=f"🏁 Результаты матча: {match.tournament_name}",
+        description=f"Матч #{match.id} завершен!",
         color=0xF1C40F  # Gold for results
     )
     
     # Добавляем ID турнира для удобного отслеживания
-    embed.add_field(name="ID Турнира", value=f"#{match['tournament_id']}", inline=True)
-    embed.add_field(name="Раунд", value=f"{match.get('round', '?')}", inline=True)
-    embed.add_field(name="Тип матча", value=match.get('match_type', 'BO1'), inline=True)
+    embed.add_field(name="ID Турнира", value=f"#{match.tournament_id}", inline=True)
+    embed.add_field(name="Раунд", value=f"{match.round or '?'}", inline=True)
+    embed.add_field(name="Тип матча", value=match.match_type, inline=True)
     
     # Determine if this is a team match or player match
-    if match.get('team1_name') and match.get('team2_name'):
+    if match.is_team_match:
         # Team match
-        embed.add_field(name=match['team1_name'], value=str(score_team1), inline=True)
-        embed.add_field(name="VS", value="-", inline=True)
-        embed.add_field(name=match['team2_name'], value=str(score_team2), inline=True)
-        
-        # Определяем количество побед, необходимое для победы в матче
-        match_type = match.get('match_type', 'BO1')
-        wins_needed = 1  # Default for BO1
-        if match_type == 'BO3':
-            wins_needed = 2
-        elif match_type == 'BO5':
-            wins_needed = 3
-        elif match_type == 'BO7':
-            wins_needed = 4
-            
-        # Determine winner
-        if score_team1 >= wins_needed:
-            embed.add_field(name="Победитель", value=match['team1_name'], inline=False)
-            winner_id = match.get('team1_id', None)
-            winner_type = 'Команда'
-        elif score_team2 >= wins_needed:
-            embed.add_field(name="Победитель", value=match['team2_name'], inline=False)
-            winner_id = match.get('team2_id', None)
-            winner_type = 'Команда'
-        else:
-            # Матч еще не завершен, показываем текущий счет
-            embed.add_field(name="Текущий счет", value=f"{score_team1} - {score_team2}", inline=False)
-            winner_id = None
-            winner_type = None
+        side1_name = match.team1_name
+        side2_name = match.team2_name
+        winner_type = 'Команда'
     else:
         # Player match
-        player1_name = f"<@{match['player1_id']}>"
-        player2_name = f"<@{match['player2_id']}>"
-        
-        embed.add_field(name=player1_name, value=str(score_team1), inline=True)
-        embed.add_field(name="VS", value="-", inline=True)
-        embed.add_field(name=player2_name, value=str(score_team2), inline=True)
-        
-        # Определяем количество побед, необходимое для победы в матче
-        match_type = match.get('match_type', 'BO1')
-        wins_needed = 1  # Default for BO1
-        if match_type == 'BO3':
-            wins_needed = 2
-        elif match_type == 'BO5':
-            wins_needed = 3
-        elif match_type == 'BO7':
-            wins_needed = 4
-            
-        # Determine winner
-        if score_team1 >= wins_needed:
-            embed.add_field(name="Победитель", value=player1_name, inline=False)
-            winner_id = match.get('player1_id', None)
-            winner_type = 'Игрок'
-        elif score_team2 >= wins_needed:
-            embed.add_field(name="Победитель", value=player2_name, inline=False)
-            winner_id = match.get('player2_id', None) 
-            winner_type = 'Игрок'
-        else:
-            # Матч еще не завершен, показываем текущий счет
-            embed.add_field(name="Текущий счет", value=f"{score_team1} - {score_team2}", inline=False)
-            winner_id = None
-            winner_type = None
+        side1_name = f"<@{match.player1_id}>"
+        side2_name = f"<@{match.player2_id}>"
+        winner_type = 'Игрок'
+    
+    embed.add_field(name=side1_name, value=str(score_team1), inline=True)
+    embed.add_field(name="VS", value="-", inline=True)
+    embed.add_field(name=side2_name, value=str(score_team2), inline=True)
+    
+    # Победитель приходит от вызывающего кода, тот же, что получил статистику и место в сетке
+    if winner_id is not None:
+        embed.add_field(name="Победитель", value=side1_name if winner_id == match.side1_id else side2_name, inline=False)
+    else:
+        # Матч еще не завершен, показываем текущий счет
+        embed.add_field(name="Текущий счет", value=f"{score_team1} - {score_team2}", inline=False)
     
     # Добавляем информацию о следующем раунде
     if winner_id:
@@ -212,10 +175,10 @@ def create_match_result_embed(match, score_team1, score_team2):
         embed.add_field(name="Следующий раунд", value=f"{winner_display} переходит в следующий раунд", inline=False)
     
     # Add notes if available
-    if match.get('notes') and match['notes'].strip():
-        embed.add_field(name="Заметки", value=match['notes'], inline=False)
+    if match.notes and match.notes.strip():
+        embed.add_field(name="Заметки", value=match.notes, inline=False)
     
     # Добавление футера с ID турнира и матча
-    embed.set_footer(text=f"Турнир #{match['tournament_id']} | Матч #{match['id']}")
+    embed.set_footer(text=f"Турнир #{match.tournament_id} | Матч #{match.id}")
     
     return embed
@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import datetime
+import logging
+import discord
+from dataclasses import dataclass, field
+
+from utils.db import db
+from utils.resolver import resolver, UserNotFound, DMsClosed
+
+logger = logging.getLogger(__name__)
+
+DM_FANOUT_CONCURRENCY = int(os.getenv('DM_FANOUT_CONCURRENCY', '5'))
+DM_FANOUT_RATE = float(os.getenv('DM_FANOUT_RATE', '5'))  # DMs per second across all fan-outs
+DM_FANOUT_RETRIES = int(os.getenv('DM_FANOUT_RETRIES', '2'))  # extra attempts after a 429
+DM_FORBIDDEN_SKIP_HOURS = float(os.getenv('DM_FORBIDDEN_SKIP_HOURS', '24'))
+
+# Failure reasons stored in dm_failures
+FORBIDDEN = 'forbidden'  # DMs closed or the bot is blocked
+NOT_FOUND = 'not_found'  # deleted account
+ERROR = 'error'
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@dataclass(slots=True)
+class FanoutResult:
+    """Outcome of a DM fan-out."""
+    delivered: list = field(default_factory=list)
+    failed: list = field(default_factory=list)  # (user_id, reason)
+    skipped: list = field(default_factory=list)  # recently closed DMs
+
+    @property
+    def total(self) -> int:
+        return len(self.delivered) + len(self.failed) + len(self.skipped)
+
+    def summary(self) -> str:
+        """Short report for the moderator who triggered the fan-out."""
+        text = f"Личные сообщения: доставлено {len(self.delivered)} из {self.total}."
+        closed = [user_id for user_id, reason in self.failed if reason == FORBIDDEN] + self.skipped
+        other = [user_id for user_id, reason in self.failed if reason != FORBIDDEN]
+        if closed:
+            text += f"\nЗакрытые ЛС: {' '.join(f'<@{user_id}>' for user_id in closed)}"
+        if other:
+            text += f"\nНе доставлено: {' '.join(f'<@{user_id}>' for user_id in other)}"
+        return text
+
+
+class RateLimiter:
+    """Spaces out calls to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self._interval
+
+
+class DMFanout:
+    """
+    Sends direct messages to many users in parallel.
+
+    Users are resolved through the shared UserResolver, sends run under a
+    concurrency limit and a shared rate limit, and a 429 that discord.py
+    gives up on is retried after its retry_after. Users
+    whose DMs are closed are recorded in dm_failures and skipped for
+    DM_FORBIDDEN_SKIP_HOURS, so repeated 403s do not count against the
+    invalid request limit. The outbox delivers its DMs through the same
+    instance, so all DMs share one limit.
+    """
+
+    def __init__(self, concurrency: int = DM_FANOUT_CONCURRENCY, rate: float = DM_FANOUT_RATE):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = RateLimiter(rate)
+        self._stats = {
+            'delivered': 0,
+            'failed': 0,
+            'skipped': 0,
+            'rate_limited': 0,
+        }
+
+    async def deliver(self, bot, user_id: int, **kwargs):
+        """Send one DM under the concurrency and rate limits. Raises on failure."""
+        async with self._semaphore:
+            user = await resolver.resolve_dm_target(bot, user_id)
+            for attempt in range(DM_FANOUT_RETRIES + 1):
+                await self._limiter.wait()
+                try:
+                    await user.send(**kwargs)
+                    return
+                except discord.Forbidden:
+                    resolver.mark_dm_closed(user_id)
+                    raise
+                except discord.HTTPException as e:
+                    if e.status != 429 or attempt == DM_FANOUT_RETRIES:
+                        raise
+                    self._stats['rate_limited'] += 1
+                    retry_after = getattr(e, 'retry_after', None) or 2 ** attempt
+                    logger.warning(f"DM to {user_id} rate limited, retrying in {retry_after:.1f}s")
+                    await asyncio.sleep(retry_after)
+
+    async def _send_one(self, bot, user_id: int, context: str, result: FanoutResult, kwargs: dict):
+        try:
+            await self.deliver(bot, user_id, **kwargs)
+        except Exception as e:
+            if isinstance(e, (discord.Forbidden, DMsClosed)):
+                reason = FORBIDDEN
+            elif isinstance(e, (discord.NotFound, UserNotFound)):
+                reason = NOT_FOUND
+            else:
+                reason = ERROR
+            logger.error(f"Could not send DM to user {user_id} ({context}): {e}")
+            result.failed.append((user_id, reason))
+            await self.record_failure(user_id, context, reason, e)
+            return
+        result.delivered.append(user_id)
+
+    async def send(self, bot, user_ids, context: str, content=None, embed=None) -> FanoutResult:
+        """
+        Send the same DM to every user and return who got it.
+
+        `context` names the notification (e.g. "tournament-cancel:12") in
+        dm_failures.
+        """
+        result = FanoutResult()
+        user_ids = list(dict.fromkeys(user_ids))
+        closed = await self.closed_dms(user_ids)
+        result.skipped = [user_id for user_id in user_ids if user_id in closed]
+
+        kwargs = {'content': content}
+        if embed is not None:
+            kwargs['embed'] = embed
+        await asyncio.gather(*(
+            self._send_one(bot, user_id, context, result, kwargs)
+            for user_id in user_ids if user_id not in closed
+        ))
+
+        self._stats['delivered'] += len(result.delivered)
+        self._stats['failed'] += len(result.failed)
+        self._stats['skipped'] += len(result.skipped)
+        logger.info(f"DM fan-out {context}: {len(result.delivered)} delivered, {len(result.failed)} failed, {len(result.skipped)} skipped")
+        return result
+
+    async def record_failure(self, user_id: int, context: str, reason: str, error):
+        """Persist a failed DM so moderators can see who missed a notification."""
+        try:
+            await db.execute(
+                """
+                INSERT INTO dm_failures (user_id, context, reason, error, failed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, context) DO UPDATE SET
+                    reason = excluded.reason,
+                    error = excluded.error,
+                    failed_at = excluded.failed_at
+                """,
+                (user_id, context, reason, str(error), datetime.datetime.now().strftime(TIME_FORMAT))
+            )
+        except Exception as e:
+            logger.error(f"Error recording DM failure for user {user_id}: {e}")
+
+    async def closed_dms(self, user_ids) -> set:
+        """Return the users among `user_ids` whose DMs were closed recently."""
+        if not user_ids:
+            return set()
+        since = datetime.datetime.now() - datetime.timedelta(hours=DM_FORBIDDEN_SKIP_HOURS)
+        placeholders = ', '.join('?' for _ in user_ids)
+        rows = await db.fetchall(
+            f"""
+            SELECT DISTINCT user_id FROM dm_failures
+            WHERE reason = ? AND failed_at >= ? AND user_id IN ({placeholders})
+            """,
+            (FORBIDDEN, since.strftime(TIME_FORMAT), *user_ids)
+        )
+        return {row['user_id'] for row in rows}
+
+    def stats(self) -> dict:
+        """Return fan-out counters since startup."""
+        return dict(self._stats)
+
+
+# Shared fan-out, so every DM in the bot counts against the same limits
+fanout = DMFanout()
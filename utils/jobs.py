@@ -0,0 +1,141 @@
+import os
+import asyncio
+import datetime
+import logging
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', '200'))  # finished jobs kept for /job-status
+
+STATUS_LABELS = {
+    RUNNING: "⏳ выполняется",
+    DONE: "✅ выполнена",
+    FAILED: "❌ ошибка",
+}
+
+
+@dataclass(slots=True)
+class Job:
+    """A moderator command running in the background after it was acknowledged."""
+    id: int
+    name: str
+    user_id: int
+    interaction: object = field(default=None, repr=False)
+    status: str = RUNNING
+    progress: str = ''
+    error: Optional[str] = None
+    created_at: datetime.datetime = field(default_factory=datetime.datetime.now)
+    finished_at: Optional[datetime.datetime] = None
+    status_message: object = field(default=None, repr=False)
+    task: object = field(default=None, repr=False)
+
+    @property
+    def duration(self) -> float:
+        return ((self.finished_at or datetime.datetime.now()) - self.created_at).total_seconds()
+
+    def details(self) -> str:
+        text = f"{STATUS_LABELS[self.status]} ({self.duration:.1f} с)"
+        if self.progress:
+            text += f"\n{self.progress}"
+        if self.error:
+            text += f"\nОшибка: {self.error}"
+        return text
+
+    def describe(self) -> str:
+        return f"Задача #{self.id} «{self.name}»: {self.details()}"
+
+    async def send(self, *args, **kwargs):
+        """Send a followup to the moderator (same arguments as followup.send)."""
+        return await self.interaction.followup.send(*args, **kwargs)
+
+    async def update(self, progress: str):
+        """Report progress by editing the job's status message."""
+        self.progress = progress
+        if self.status_message is None:
+            return
+        try:
+            await self.status_message.edit(content=self.describe())
+        except Exception as e:
+            # The interaction token expires after 15 minutes, the job keeps running
+            logger.warning(f"Could not update status of job {self.id}: {e}")
+
+
+class JobManager:
+    """
+    Runs heavy commands as tracked background jobs.
+
+    `run()` acknowledges the interaction right away, so the command never
+    misses Discord's 3 second deadline, posts an ephemeral status message
+    and starts the work as a task. The work reports progress with
+    `job.update()` and answers with `job.send()` (followups). Running and
+    recently finished jobs can be looked up by id for /job-status.
+    """
+
+    def __init__(self, history: int = JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()  # job id -> Job, oldest first
+        self._ids = itertools.count(1)
+
+    async def run(self, interaction, name: str, work) -> Job:
+        """Defer the interaction and run `await work(job)` in the background."""
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+        job = Job(next(self._ids), name, interaction.user.id, interaction=interaction)
+        self._remember(job)
+        try:
+            # The first followup replaces the "thinking" message, later ones keep their own visibility
+            job.status_message = await interaction.followup.send(job.describe(), ephemeral=True, wait=True)
+        except Exception as e:
+            logger.warning(f"Could not post status of job {job.id}: {e}")
+        job.task = asyncio.create_task(self._execute(job, work))
+        return job
+
+    async def _execute(self, job: Job, work):
+        logger.info(f"Job {job.id} ({job.name}) started by {job.user_id}")
+        try:
+            await work(job)
+            # Work that handles its own errors reports them through job.error
+            job.status = FAILED if job.error else DONE
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.name}) failed: {e}")
+            job.status = FAILED
+            job.error = str(e)
+        job.finished_at = datetime.datetime.now()
+        logger.info(f"Job {job.id} ({job.name}) {job.status} in {job.duration:.1f}s")
+        await job.update(job.progress)
+
+    def _remember(self, job: Job):
+        self._jobs[job.id] = job
+        # Forget the oldest finished jobs, running ones are always kept
+        finished = [job_id for job_id, known in self._jobs.items() if known.status != RUNNING]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def recent(self, user_id: int = None, limit: int = 10) -> list:
+        """Return the latest jobs, newest first, optionally of one moderator."""
+        jobs = [job for job in reversed(self._jobs.values()) if user_id is None or job.user_id == user_id]
+        return jobs[:limit]
+
+    def stats(self) -> dict:
+        """Return the number of tracked jobs per state."""
+        stats = {RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            stats[job.status] += 1
+        return stats
+
+
+# Shared job manager for moderator commands
+jobs = JobManager()
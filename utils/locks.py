@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Entry:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0  # holder and waiters
+
+
+class KeyedLocks:
+    """
+    One asyncio.Lock per key, created on demand.
+
+    Mutations of the same key (e.g. a tournament) run one at a time while
+    different keys proceed in parallel. An entry is dropped as soon as
+    nobody holds or waits for it, so memory only grows with the number of
+    keys in use at the same moment. The locks are per process: several bot
+    workers still need the database to serialize them.
+    """
+
+    def __init__(self):
+        self._entries = {}  # key -> _Entry
+        self._stats = {
+            'acquired': 0,
+            'contended': 0,  # had to wait for another holder
+        }
+
+    @asynccontextmanager
+    async def hold(self, key):
+        """Hold the lock of `key` for the duration of the block."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.users += 1
+        if entry.lock.locked():
+            self._stats['contended'] += 1
+        try:
+            async with entry.lock:
+                self._stats['acquired'] += 1
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+
+    async def run(self, key, func, *args):
+        """Await `func(*args)` while holding the lock of `key`."""
+        async with self.hold(key):
+            return await func(*args)
+
+    def locked(self, key) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return lock counters since startup and the number of live entries."""
+        stats = dict(self._stats)
+        stats['active'] = len(self._entries)
+        return stats
+
+
+# Serializes registrations and result submissions per tournament id
+tournament_locks = KeyedLocks()
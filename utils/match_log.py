@@ -0,0 +1,131 @@
+import json
+import datetime
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.db import db, dict_factory
+
+logger = logging.getLogger(__name__)
+
+# Event kinds
+SEEDED = 'seeded'  # entrants placed on the leaves, data = leaves top to bottom
+MATCH_CREATED = 'match_created'  # match_id is played at node
+RESULT_SET = 'result_set'  # winner of match_id, with the score
+RESULT_REVERTED = 'result_reverted'  # result of match_id taken back, later matches on its path dropped
+WALKOVER = 'walkover'  # winner of match_id without a game
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@dataclass(slots=True)
+class MatchEvent:
+    """A row of match_events, the append-only log of a tournament's bracket."""
+    tournament_id: int
+    kind: str
+    match_id: Optional[int] = None
+    node: Optional[int] = None
+    winner: Optional[int] = None
+    score1: Optional[int] = None
+    score2: Optional[int] = None
+    data: Optional[list] = None
+    id: Optional[int] = None  # position in the log, set once stored
+    created_at: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row) -> 'MatchEvent':
+        return cls(
+            row['tournament_id'], row['kind'], row['match_id'], row['node'], row['winner'],
+            row['score1'], row['score2'], json.loads(row['data']) if row['data'] else None,
+            row['id'], row['created_at']
+        )
+
+    def to_params(self) -> tuple:
+        return (
+            self.tournament_id, self.kind, self.match_id, self.node, self.winner, self.score1, self.score2,
+            json.dumps(self.data, separators=(',', ':')) if self.data is not None else None,
+            self.created_at
+        )
+
+
+def apply(bracket, event: MatchEvent):
+    """
+    Fold one event into the bracket.
+
+    Returns what the matching Bracket method returns: the parent node that
+    became playable for results and walkovers, the dropped match ids for a
+    revert, None otherwise.
+    """
+    result = None
+    if event.kind == SEEDED:
+        bracket.place(event.data)
+    elif event.kind == MATCH_CREATED:
+        bracket.attach(event.node, event.match_id)
+    elif event.kind in (RESULT_SET, WALKOVER):
+        result = bracket.record(event.match_id, event.winner)
+    elif event.kind == RESULT_REVERTED:
+        result = bracket.invalidate(event.match_id)
+    else:
+        raise ValueError(f"Unknown match event {event.kind}")
+    if event.id is not None:
+        bracket.event_id = event.id
+    bracket.pending_events += 1
+    return result
+
+
+def fold(bracket, events):
+    """Apply the events in log order."""
+    for event in events:
+        apply(bracket, event)
+    return bracket
+
+
+async def append(tx, bracket, kind: str, match_id=None, node=None, winner=None, score1=None, score2=None, data=None):
+    """Store an event in the transaction and apply it to the bracket. Returns the result of `apply`."""
+    event = MatchEvent(
+        bracket.tournament_id, kind, match_id, node, winner, score1, score2, data,
+        created_at=datetime.datetime.now().strftime(TIME_FORMAT)
+    )
+    result = apply(bracket, event)
+    stored = await tx.execute(
+        """
+        INSERT INTO match_events (tournament_id, kind, match_id, node, winner, score1, score2, data, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        event.to_params()
+    )
+    bracket.event_id = stored.lastrowid
+    return result
+
+
+async def append_many(tx, bracket, events):
+    """Store several events with one statement and apply them (e.g. the matches of a whole round)."""
+    events = list(events)
+    if not events:
+        return
+    created_at = datetime.datetime.now().strftime(TIME_FORMAT)
+    for event in events:
+        event.created_at = created_at
+        apply(bracket, event)
+    await tx.execute_many(
+        """
+        INSERT INTO match_events (tournament_id, kind, match_id, node, winner, score1, score2, data, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [event.to_params() for event in events]
+    )
+    row = await tx.fetchone(
+        "SELECT MAX(id) as id FROM match_events WHERE tournament_id = ?",
+        (bracket.tournament_id,)
+    )
+    bracket.event_id = row['id']
+
+
+async def fetch_events(tournament_id: int, after: int = 0, tx=None) -> list:
+    """Events of a tournament with an id above `after`, in log order."""
+    rows = await (tx or db).fetchall(
+        "SELECT * FROM match_events WHERE tournament_id = ? AND id > ? ORDER BY id",
+        (tournament_id, after),
+        factory=dict_factory
+    )
+    return [MatchEvent.from_row(row) for row in rows]
@@ -0,0 +1,364 @@
+import time
+import logging
+from collections import namedtuple
+
+from utils.db import pool, create_schema, create_indexes
+from utils.models import WINS_NEEDED
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per transaction by batched backfills
+BACKFILL_BATCH_SIZE = 500
+
+# A numbered schema change. `apply(conn)` runs inside a transaction unless
+# `batched` is set, in which case it manages its own commits (see backfill).
+Migration = namedtuple('Migration', ['version', 'description', 'apply', 'batched'])
+
+MIGRATIONS = []
+
+def migration(version: int, description: str, batched: bool = False):
+    """Register a function as the migration with the given version number."""
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, description, func, batched))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+def is_postgres(conn) -> bool:
+    return getattr(conn, 'dialect', 'sqlite') == 'postgres'
+
+def table_exists(conn, table: str) -> bool:
+    """Check whether a table exists."""
+    if is_postgres(conn):
+        row = conn.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = current_schema() AND table_name = ?",
+            (table,)
+        ).fetchone()
+    else:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+def column_exists(conn, table: str, column: str) -> bool:
+    """Check whether a column is present in a table."""
+    if is_postgres(conn):
+        row = conn.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ? AND column_name = ?
+            """,
+            (table, column)
+        ).fetchone()
+        return row is not None
+    return any(row['name'] == column for row in conn.execute(f"PRAGMA table_info({table})").fetchall())
+
+def add_column(conn, table: str, column: str, definition: str):
+    """Add a column unless it already exists (older databases were patched by hand)."""
+    if not column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def backfill(conn, table: str, assignment: str, condition: str, params=(), batch_size: int = BACKFILL_BATCH_SIZE):
+    """
+    Update rows matching `condition` in small committed batches.
+
+    Each batch is its own short transaction, so readers and the bot's own
+    writes can interleave with a backfill on a large table. Returns the
+    number of updated rows. (On PostgreSQL rowid is translated to ctid.)
+    """
+    total = 0
+    while True:
+        cursor = conn.execute(
+            f"""
+            UPDATE {table} SET {assignment}
+            WHERE rowid IN (SELECT rowid FROM {table} WHERE {condition} LIMIT ?)
+            """,
+            (*params, batch_size)
+        )
+        conn.commit()
+        total += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return total
+        # Give other connections a chance to take the write lock
+        time.sleep(0)
+
+
+@migration(1, "baseline schema")
+def baseline(conn):
+    create_schema(conn.cursor())
+
+@migration(2, "tournaments.match_type", batched=True)
+def tournament_match_type(conn):
+    add_column(conn, 'tournaments', 'match_type', "TEXT DEFAULT 'BO1'")
+    conn.commit()
+    updated = backfill(conn, 'tournaments', "match_type = 'BO1'", "match_type IS NULL")
+    logger.info(f"Backfilled match_type for {updated} tournaments")
+
+@migration(3, "outbox for Discord side effects")
+def outbox(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,  -- "channel" / "dm" / "edit"
+            target_id INTEGER NOT NULL,  -- channel or user id
+            message_id INTEGER,  -- message to edit
+            payload TEXT NOT NULL,  -- JSON: content and embeds
+            dedup_key TEXT UNIQUE,
+            status TEXT DEFAULT 'pending',  -- "pending" / "sending" / "delivered" / "failed"
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at DATETIME,
+            last_error TEXT,
+            created_at DATETIME,
+            delivered_at DATETIME
+        )
+        """
+    )
+    create_indexes(conn.cursor())
+
+@migration(4, "tournament message registry")
+def tournament_messages(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tournament_messages (
+            tournament_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,  -- "announcement"
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (tournament_id, kind)
+        )
+        """
+    )
+
+@migration(5, "outbox index for edit coalescing")
+def outbox_message_index(conn):
+    create_indexes(conn.cursor())
+
+@migration(6, "failed DM recipients")
+def dm_failures(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dm_failures (
+            user_id INTEGER NOT NULL,
+            context TEXT NOT NULL,  -- notification, e.g. "tournament-cancel:12"
+            reason TEXT NOT NULL,  -- "forbidden" / "not_found" / "error"
+            error TEXT,
+            failed_at DATETIME,
+            PRIMARY KEY (user_id, context)
+        )
+        """
+    )
+
+@migration(7, "outbox.priority")
+def outbox_priority(conn):
+    add_column(conn, 'outbox', 'priority', "INTEGER DEFAULT 1")
+
+@migration(8, "command tree sync fingerprints")
+def command_sync(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS command_sync (
+            scope TEXT PRIMARY KEY,  -- "global" / "guild:<id>"
+            fingerprint TEXT NOT NULL,
+            synced_at DATETIME
+        )
+        """
+    )
+
+@migration(9, "interaction deduplication keys")
+def interaction_dedup(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS interaction_dedup (
+            key TEXT PRIMARY KEY,  -- interaction id
+            expires_at DATETIME NOT NULL
+        )
+        """
+    )
+    create_indexes(conn.cursor())
+
+@migration(10, "stored single-elimination brackets")
+def tournament_brackets(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tournament_brackets (
+            tournament_id INTEGER PRIMARY KEY,
+            size INTEGER NOT NULL,  -- leaves of the tree, a power of two
+            is_team INTEGER NOT NULL DEFAULT 0,
+            slots TEXT NOT NULL,  -- JSON: heap node -> player or team id
+            match_ids TEXT NOT NULL  -- JSON: heap node -> tournament_matches.id
+        )
+        """
+    )
+    add_column(conn, 'tournament_matches', 'bracket_node', "INTEGER")
+
+@migration(11, "entrant seeding")
+def entrant_seeding(conn):
+    add_column(conn, 'tournaments', 'seeding', "TEXT DEFAULT 'random'")
+    add_column(conn, 'tournament_participants', 'seed', "INTEGER")
+    add_column(conn, 'tournament_teams', 'seed', "INTEGER")
+
+@migration(12, "best-of series state")
+def match_series(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_series (
+            match_id INTEGER PRIMARY KEY,  -- tournament_matches row decided by the series
+            tournament_id INTEGER NOT NULL,
+            match_type TEXT NOT NULL,  -- "BO3" / "BO5" / "BO7"
+            wins1 INTEGER NOT NULL DEFAULT 0,
+            wins2 INTEGER NOT NULL DEFAULT 0,
+            games INTEGER NOT NULL DEFAULT 0  -- result submissions
+        )
+        """
+    )
+    merged = merge_duel_games(conn)
+    logger.info(f"Merged the games of {merged} best-of duels into series")
+
+def merge_duel_games(conn) -> int:
+    """
+    Turn the per-game rows of old BO3/BO5/BO7 duels into one match each.
+
+    Duels used to get one tournament_matches row per game between the same
+    two sides. The first row becomes the series match with the wins as its
+    score, the counters go to match_series and the other game rows are
+    deleted. Returns the number of merged duels.
+    """
+    rows = conn.execute(
+        """
+        SELECT m.*, t.match_type
+        FROM tournament_matches m
+        JOIN tournaments t ON t.id = m.tournament_id
+        WHERE t.match_type IN ('BO3', 'BO5', 'BO7') AND m.bracket_node IS NULL
+        ORDER BY m.tournament_id, m.id
+        """
+    ).fetchall()
+    games_by_tournament = {}
+    for row in rows:
+        games_by_tournament.setdefault(row['tournament_id'], []).append(row)
+
+    merged = 0
+    for tournament_id, games in games_by_tournament.items():
+        first = games[0]
+        is_team = first['team1_id'] is not None or first['team2_id'] is not None
+        side = ('team1_id', 'team2_id') if is_team else ('player1_id', 'player2_id')
+        sides = (first[side[0]], first[side[1]])
+        # Только дуэли: все игры между одними и теми же сторонами
+        if len(games) < 2 or any({game[side[0]], game[side[1]]} != set(sides) for game in games):
+            continue
+
+        wins = {sides[0]: 0, sides[1]: 0}
+        played = [game for game in games if game['completed']]
+        for game in played:
+            score1, score2 = game['team1_score'] or 0, game['team2_score'] or 0
+            if score1 != score2:
+                wins[game[side[0]] if score1 > score2 else game[side[1]]] += 1
+        wins1, wins2 = wins[sides[0]], wins[sides[1]]
+        wins_needed = WINS_NEEDED[first['match_type']]
+        completed = max(wins1, wins2) >= wins_needed
+
+        conn.execute(
+            """
+            UPDATE tournament_matches
+            SET team1_score = ?, team2_score = ?, completed = ?, completion_date = ?
+            WHERE id = ?
+            """,
+            (
+                wins1 if completed else None, wins2 if completed else None, int(completed),
+                played[-1]['completion_date'] if completed else None, first['id']
+            )
+        )
+        conn.executemany("DELETE FROM tournament_matches WHERE id = ?", [(game['id'],) for game in games[1:]])
+        if played:
+            conn.execute(
+                """
+                INSERT INTO match_series (match_id, tournament_id, match_type, wins1, wins2, games)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (first['id'], tournament_id, first['match_type'], wins1, wins2, len(played))
+            )
+        merged += 1
+    return merged
+
+@migration(13, "match event log")
+def match_events(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS match_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,  -- seeded / match_created / result_set / result_reverted / walkover
+            match_id INTEGER,
+            node INTEGER,  -- bracket heap node of a created match
+            winner INTEGER,
+            score1 INTEGER,
+            score2 INTEGER,
+            data TEXT,  -- JSON: seeded leaves
+            created_at DATETIME
+        )
+        """
+    )
+    # Номер последнего события, вошедшего в снимок сетки
+    add_column(conn, 'tournament_brackets', 'event_id', "INTEGER NOT NULL DEFAULT 0")
+    create_indexes(conn.cursor())
+
+@migration(14, "player_achievements.source")
+def achievement_source(conn):
+    # "match" - выдано по статистике матчей, "manual" - вручную; старые записи не отзываются
+    add_column(conn, 'player_achievements', 'source', "TEXT DEFAULT 'manual'")
+
+
+def current_version(conn) -> int:
+    """Return the applied schema version, 0 for a database without schema_version."""
+    if not table_exists(conn, 'schema_version'):
+        return 0
+    row = conn.execute("SELECT MAX(version) as version FROM schema_version").fetchone()
+    return row['version'] or 0
+
+def migrate(conn=None) -> int:
+    """
+    Apply pending migrations and return the resulting schema version.
+
+    When the schema is already current this only reads schema_version and
+    runs no DDL, so it is cheap to call on every startup.
+    """
+    if conn is None:
+        with pool.connection() as conn:
+            return migrate(conn)
+
+    version = current_version(conn)
+    pending = [m for m in MIGRATIONS if m.version > version]
+    if not pending:
+        logger.info(f"Database schema is up to date (version {version})")
+        return version
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at DATETIME
+        )
+        """
+    )
+    conn.commit()
+
+    for m in pending:
+        started = time.perf_counter()
+        logger.info(f"Applying migration {m.version}: {m.description}")
+        try:
+            if not m.batched:
+                # Run DDL and data changes of the migration atomically
+                conn.execute("BEGIN")
+            m.apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, datetime('now'))",
+                (m.version, m.description)
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Migration {m.version} failed: {e}")
+            conn.rollback()
+            raise
+        logger.info(f"Migration {m.version} applied in {(time.perf_counter() - started) * 1000:.0f} ms")
+        version = m.version
+
+    return version
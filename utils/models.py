@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Match formats and the number of wins needed to take the series
+DEFAULT_MATCH_TYPE = 'BO1'
+WINS_NEEDED = {'BO1': 1, 'BO3': 2, 'BO5': 3, 'BO7': 4}
+SERIES_MATCH_TYPES = ('BO3', 'BO5', 'BO7')
+
+def normalize_match_type(match_type: Optional[str]) -> str:
+    """Return a known match type, falling back to BO1 for NULL or unknown values."""
+    return match_type if match_type in WINS_NEEDED else DEFAULT_MATCH_TYPE
+
+def wins_needed(match_type: Optional[str]) -> int:
+    """Number of wins needed to take a match of the given format."""
+    return WINS_NEEDED.get(match_type, 1)
+
+def series_length(match_type: Optional[str]) -> int:
+    """Maximum number of games in a series of the given format (BO3 -> 3)."""
+    return wins_needed(match_type) * 2 - 1
+
+
+@dataclass(slots=True)
+class Tournament:
+    """A row of the tournaments table with derived match format fields."""
+    id: int
+    name: str
+    type: str
+    status: str = 'pending'
+    match_type: str = DEFAULT_MATCH_TYPE
+    weapon_type: Optional[str] = None
+    rules: Optional[str] = None
+    entry_fee: int = 0
+    tournament_date: Optional[str] = None
+    max_participants: Optional[int] = None
+    participants_per_team: Optional[int] = None
+    creator_id: Optional[int] = None
+    creator_name: Optional[str] = None
+    winner_id: Optional[int] = None
+    winner_team_id: Optional[int] = None
+    started: int = 0
+    seeding: str = 'random'
+    # Derived once in __post_init__
+    wins_needed: int = field(init=False)
+    is_team: bool = field(init=False)
+    is_series: bool = field(init=False)
+
+    def __post_init__(self):
+        self.match_type = normalize_match_type(self.match_type)
+        self.wins_needed = WINS_NEEDED[self.match_type]
+        self.is_team = self.type == 'public'
+        self.is_series = self.match_type in SERIES_MATCH_TYPES
+
+    @classmethod
+    def from_row(cls, row) -> 'Tournament':
+        get = row.get
+        return cls(
+            row['id'], row['name'], row['type'], get('status', 'pending'), get('match_type'),
+            get('weapon_type'), get('rules'), get('entry_fee') or 0, get('tournament_date'),
+            get('max_participants'), get('participants_per_team'), get('creator_id'),
+            get('creator_name'), get('winner_id'), get('winner_team_id'), get('started') or 0,
+            get('seeding') or 'random'
+        )
+
+
+@dataclass(slots=True)
+class Match:
+    """A row of tournament_matches, optionally joined with names and format."""
+    id: int
+    tournament_id: int
+    round: int = 1
+    player1_id: Optional[int] = None
+    player2_id: Optional[int] = None
+    team1_id: Optional[int] = None
+    team2_id: Optional[int] = None
+    team1_score: Optional[int] = None
+    team2_score: Optional[int] = None
+    completed: int = 0
+    notes: Optional[str] = None
+    match_type: str = DEFAULT_MATCH_TYPE
+    tournament_name: Optional[str] = None
+    team1_name: Optional[str] = None
+    team2_name: Optional[str] = None
+    player1_name: Optional[str] = None
+    player2_name: Optional[str] = None
+    # Derived once in __post_init__
+    wins_needed: int = field(init=False)
+    is_team_match: bool = field(init=False)
+
+    def __post_init__(self):
+        self.match_type = normalize_match_type(self.match_type)
+        self.wins_needed = WINS_NEEDED[self.match_type]
+        self.is_team_match = self.team1_id is not None or self.team2_id is not None
+
+    @classmethod
+    def from_row(cls, row) -> 'Match':
+        get = row.get
+        return cls(
+            row['id'], row['tournament_id'], get('round', 1), get('player1_id'), get('player2_id'),
+            get('team1_id'), get('team2_id'), get('team1_score'), get('team2_score'),
+            get('completed') or 0, get('notes'), get('match_type'), get('tournament_name'),
+            get('team1_name'), get('team2_name'), get('player1_name'), get('player2_name')
+        )
+
+    @property
+    def side1_id(self) -> Optional[int]:
+        """Team or player on the first side, depending on the match kind."""
+        return self.team1_id if self.is_team_match else self.player1_id
+
+    @property
+    def side2_id(self) -> Optional[int]:
+        """Team or player on the second side, depending on the match kind."""
+        return self.team2_id if self.is_team_match else self.player2_id
+
+    def winner_side(self, score1: int, score2: int) -> int:
+        """Return 1 or 2 if that side reached the wins needed, otherwise 0."""
+        if score1 >= self.wins_needed:
+            return 1
+        if score2 >= self.wins_needed:
+            return 2
+        return 0
+
+
+@dataclass(slots=True)
+class Team:
+    """A row of tournament_teams."""
+    id: int
+    tournament_id: int
+    team_name: str
+    captain_id: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row) -> 'Team':
+        return cls(row['id'], row['tournament_id'], row['team_name'], row.get('captain_id'))
+
+
+@dataclass(slots=True)
+class Player:
+    """A row of the players table with the derived win rate."""
+    user_id: int
+    username: Optional[str] = None
+    wins: int = 0
+    losses: int = 0
+    # Derived once in __post_init__
+    win_rate: float = field(init=False)
+
+    def __post_init__(self):
+        games = self.wins + self.losses
+        self.win_rate = round(self.wins / games * 100, 1) if games > 0 else 0
+
+    @classmethod
+    def from_row(cls, row) -> 'Player':
+        return cls(row['user_id'], row.get('username'), row.get('wins') or 0, row.get('losses') or 0)
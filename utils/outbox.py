@@ -0,0 +1,497 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import datetime
+import logging
+import discord
+
+from utils.db import db
+from utils.fanout import fanout, FORBIDDEN, NOT_FOUND
+from utils.resolver import UserNotFound, DMsClosed
+
+logger = logging.getLogger(__name__)
+
+# Message kinds
+CHANNEL = 'channel'  # message to a channel
+DM = 'dm'  # direct message to a user
+EDIT = 'edit'  # edit of an existing channel message
+
+# Priorities: within a channel higher priority entries are sent first
+LOW = 0  # bracket reposts
+NORMAL = 1  # results, round notices
+HIGH = 2  # start, reschedule and cancel notices
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '5'))  # seconds, doubled per attempt
+OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX', '900'))
+OUTBOX_EDIT_INTERVAL = float(os.getenv('OUTBOX_EDIT_INTERVAL', '5'))  # seconds between edits of one message
+# Delivered entries are kept this long for inspection, then purged
+OUTBOX_RETENTION_DAYS = float(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+OUTBOX_PURGE_INTERVAL = float(os.getenv('OUTBOX_PURGE_INTERVAL', '3600'))  # seconds between purges
+
+# Per-channel token bucket, Discord allows about 5 messages per 5 seconds per channel
+OUTBOX_CHANNEL_BURST = int(os.getenv('OUTBOX_CHANNEL_BURST', '5'))
+OUTBOX_CHANNEL_RATE = float(os.getenv('OUTBOX_CHANNEL_RATE', '1'))  # tokens per second
+
+# Discord message limits, used when merging small messages into one post
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_TOTAL = 6000
+
+# Upper bound for a single sleep of the dispatcher
+MAX_SLEEP = 300
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _format_time(value: datetime.datetime) -> str:
+    return value.strftime(TIME_FORMAT)
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.strptime(value, TIME_FORMAT)
+
+def _embed_length(embed: dict) -> int:
+    """Number of characters Discord counts towards the 6000 limit."""
+    length = len(embed.get('title') or '') + len(embed.get('description') or '')
+    length += len((embed.get('footer') or {}).get('text') or '') + len((embed.get('author') or {}).get('name') or '')
+    for field in embed.get('fields', []):
+        length += len(field.get('name') or '') + len(field.get('value') or '')
+    return length
+
+def _merge_payloads(first: dict, second: dict):
+    """Return both messages as one post, or None if it would exceed Discord limits."""
+    contents = [content for content in (first.get('content'), second.get('content')) if content]
+    content = '\n'.join(contents) or None
+    embeds = first.get('embeds', []) + second.get('embeds', [])
+    if content and len(content) > MAX_CONTENT_LENGTH:
+        return None
+    if len(embeds) > MAX_EMBEDS or sum(_embed_length(embed) for embed in embeds) > MAX_EMBED_TOTAL:
+        return None
+    return {'content': content, 'embeds': embeds}
+
+
+class TokenBucket:
+    """Allows bursts of `capacity` calls, refilled at `rate` tokens per second."""
+
+    def __init__(self, capacity: int, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the time waited."""
+        self._refill()
+        waited = 0.0
+        if self._tokens < 1:
+            waited = (1 - self._tokens) / self.rate
+            await asyncio.sleep(waited)
+            self._refill()
+        self._tokens -= 1
+        return waited
+
+
+class Outbox:
+    """
+    Transactional outbox for Discord side effects.
+
+    Handlers enqueue messages, DMs and edits with the transaction that
+    changes the state they announce, so the write lock is never held across
+    a Discord round trip and a crash after commit does not lose the
+    notification. Entries with the same `dedup_key` are enqueued only once
+    while undelivered: delivery (or a permanent failure) releases the key,
+    so the same announcement can be posted again after an undo. Delivered
+    entries are purged after OUTBOX_RETENTION_DAYS.
+
+    The dispatcher claims due entries and hands channel messages and edits
+    to one queue per channel, ordered by priority. Each channel is served
+    by its own worker behind a token bucket, so a busy channel neither hits
+    429s nor delays the others, and adjacent small messages are merged into
+    one post. DMs go through the DM fan-out. Failures are retried with
+    exponential backoff. Delivery is at least once: entries claimed but not
+    delivered before a crash are sent again on restart.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_edits = {}  # message_id -> (delivered payload, delivery time)
+        self._queues = {}  # channel_id -> heap of (-priority, next_attempt_at, id, entry)
+        self._workers = {}  # channel_id -> worker task
+        self._buckets = {}  # channel_id -> TokenBucket
+        self._dm_tasks = set()
+        self._latency = {'count': 0, 'total': 0.0, 'max': 0.0}
+        self._last_purge = 0.0  # time.monotonic() of the last purge
+        self._stats = {
+            'delivered': 0,
+            'retried': 0,
+            'failed': 0,
+            'edits_coalesced': 0,
+            'edits_unchanged': 0,
+            'merged': 0,
+            'throttled': 0,
+            'purged': 0,
+        }
+
+    @staticmethod
+    def _payload(content, embeds, register=None) -> str:
+        payload = {
+            'content': content,
+            'embeds': [embed.to_dict() for embed in embeds],
+        }
+        if register is not None:
+            payload['register'] = list(register)
+        return json.dumps(payload, ensure_ascii=False)
+
+    async def _enqueue(self, tx, kind: str, target_id: int, payload: str, message_id=None, dedup_key=None,
+                       not_before=None, priority: int = NORMAL):
+        if not target_id:
+            logger.warning(f"Outbox {kind} message without a target skipped (dedup key {dedup_key})")
+            return
+        now = datetime.datetime.now()
+        next_attempt = max(now, not_before) if not_before else now
+
+        await (tx or db).execute(
+            """
+            INSERT OR IGNORE INTO outbox
+            (kind, target_id, message_id, payload, dedup_key, priority, status, attempts, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?)
+            """,
+            (kind, target_id, message_id, payload, dedup_key, priority, _format_time(next_attempt), _format_time(now))
+        )
+        if tx is not None:
+            tx.after_commit(self.wake)
+        else:
+            self.wake()
+
+    async def send(self, tx, channel_id: int, content=None, embeds=(), dedup_key=None, priority: int = NORMAL,
+                   register=None):
+        """
+        Queue a channel message. Pass tx=None to enqueue outside a transaction.
+
+        With `register=(tournament_id, kind)` the message is recorded in
+        tournament_messages once posted, so later updates can edit it. Until
+        then a newer send with the same registration replaces the content of
+        the pending one instead of posting a second message.
+        """
+        payload = self._payload(content, embeds, register)
+        if register is not None:
+            dedup_key = dedup_key or f"register:{register[0]}:{register[1]}"
+            result = await (tx or db).execute(
+                "UPDATE outbox SET payload = ? WHERE dedup_key = ? AND status = 'pending'",
+                (payload, dedup_key)
+            )
+            if result.rowcount:
+                self._stats['edits_coalesced'] += 1
+                return
+        await self._enqueue(tx, CHANNEL, channel_id, payload, dedup_key=dedup_key, priority=priority)
+
+    async def send_dm(self, tx, user_id: int, content=None, embeds=(), dedup_key=None):
+        """Queue a direct message to a user."""
+        await self._enqueue(tx, DM, user_id, self._payload(content, embeds), dedup_key=dedup_key)
+
+    async def edit(self, tx, channel_id: int, message_id: int, content=None, embeds=(), dedup_key=None):
+        """
+        Queue an edit of a message previously sent to a channel.
+
+        Edits of one message are coalesced: a newer edit replaces the content
+        of a pending one instead of queueing another request, an edit that
+        does not change the last delivered content is dropped, and a message
+        is edited at most once per OUTBOX_EDIT_INTERVAL seconds.
+        """
+        payload = self._payload(content, embeds)
+        executor = tx or db
+
+        pending = await executor.fetchone(
+            "SELECT id, payload FROM outbox WHERE message_id = ? AND status = 'pending' AND kind = ?",
+            (message_id, EDIT)
+        )
+        if pending and pending['payload'] == payload:
+            self._stats['edits_unchanged'] += 1
+            return
+        if pending:
+            result = await executor.execute(
+                "UPDATE outbox SET payload = ? WHERE id = ? AND status = 'pending'",
+                (payload, pending['id'])
+            )
+            if result.rowcount:
+                self._stats['edits_coalesced'] += 1
+                return
+            # Claimed by the dispatcher in the meantime, queue a new edit below
+
+        last_payload, last_edit = self._last_edits.get(message_id, (None, None))
+        if last_payload == payload:
+            self._stats['edits_unchanged'] += 1
+            return
+        not_before = last_edit + datetime.timedelta(seconds=OUTBOX_EDIT_INTERVAL) if last_edit else None
+        await self._enqueue(tx, EDIT, channel_id, payload, message_id=message_id, dedup_key=dedup_key, not_before=not_before)
+
+    def wake(self):
+        """Let the dispatcher pick up newly committed entries."""
+        self._wakeup.set()
+
+    def start(self, bot):
+        """Start the dispatcher task (once the event loop is running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(bot))
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+        for task in (*self._workers.values(), *self._dm_tasks):
+            task.cancel()
+
+    async def _target(self, bot, target_id: int):
+        return bot.get_channel(target_id) or await bot.fetch_channel(target_id)
+
+    async def _deliver(self, bot, entry, payload: dict):
+        content = payload.get('content')
+        embeds = [discord.Embed.from_dict(embed) for embed in payload.get('embeds', [])]
+        kwargs = {'content': content}
+        if embeds:
+            kwargs['embeds'] = embeds
+
+        if entry['kind'] == DM:
+            # Shares the concurrency and rate limits of the DM fan-out
+            await fanout.deliver(bot, entry['target_id'], **kwargs)
+            return
+
+        target = await self._target(bot, entry['target_id'])
+        if entry['kind'] == EDIT:
+            return await target.get_partial_message(entry['message_id']).edit(**kwargs)
+        return await target.send(**kwargs)
+
+    async def _process(self, bot, entries, payload: dict = None):
+        """Deliver one post made of one or more merged entries."""
+        entry = entries[0]
+        payload = payload or json.loads(entry['payload'])
+        try:
+            message = await self._deliver(bot, entry, payload)
+        except (discord.Forbidden, discord.NotFound, DMsClosed, UserNotFound) as e:
+            # Closed DMs, deleted channels and messages will not start working on retry
+            for failed in entries:
+                await self._fail(failed, e, permanent=True)
+            if entry['kind'] == DM:
+                reason = FORBIDDEN if isinstance(e, (discord.Forbidden, DMsClosed)) else NOT_FOUND
+                await fanout.record_failure(entry['target_id'], entry['dedup_key'] or f"outbox:{entry['id']}", reason, e)
+            return
+        except Exception as e:
+            for failed in entries:
+                await self._fail(failed, e)
+            return
+
+        now = datetime.datetime.now()
+        if entry['kind'] == EDIT:
+            self._last_edits[entry['message_id']] = (entry['payload'], now)
+        elif payload.get('register') and message is not None:
+            # Регистрируем до освобождения ключа, чтобы повторная отправка стала правкой
+            from utils.announcements import register_message
+            tournament_id, kind = payload['register']
+            try:
+                await register_message(tournament_id, message.channel.id, message.id, kind)
+            except Exception as e:
+                logger.error(f"Error registering {kind} message of tournament {tournament_id}: {e}")
+
+        for delivered in entries:
+            await db.execute(
+                """
+                UPDATE outbox SET status = 'delivered', attempts = attempts + 1, delivered_at = ?, dedup_key = NULL
+                WHERE id = ?
+                """,
+                (_format_time(now), delivered['id'])
+            )
+            latency = (now - _parse_time(delivered['created_at'])).total_seconds()
+            self._latency['count'] += 1
+            self._latency['total'] += latency
+            self._latency['max'] = max(self._latency['max'], latency)
+        self._stats['delivered'] += len(entries)
+        self._stats['merged'] += len(entries) - 1
+
+    async def _fail(self, entry, error, permanent: bool = False):
+        attempts = entry['attempts'] + 1
+        if permanent or attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Outbox entry {entry['id']} ({entry['kind']} to {entry['target_id']}) failed after {attempts} attempts: {error}")
+            await db.execute(
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ?, dedup_key = NULL WHERE id = ?",
+                (attempts, str(error), entry['id'])
+            )
+            self._stats['failed'] += 1
+            return
+
+        delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+        logger.warning(f"Outbox entry {entry['id']} failed, retrying in {delay:.0f}s: {error}")
+        await db.execute(
+            "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+            (attempts, str(error), _format_time(datetime.datetime.now() + datetime.timedelta(seconds=delay)), entry['id'])
+        )
+        self._stats['retried'] += 1
+        self.wake()
+
+    def _next_post(self, queue):
+        """Pop the head of a channel queue, merging following small messages into it."""
+        entry = heapq.heappop(queue)[-1]
+        entries = [entry]
+        payload = json.loads(entry['payload'])
+        if entry['kind'] != CHANNEL or 'register' in payload:
+            return entries, payload
+        while queue and queue[0][-1]['kind'] == CHANNEL:
+            following = json.loads(queue[0][-1]['payload'])
+            # Registered messages are posted alone, their id must point to them only
+            merged = _merge_payloads(payload, following) if 'register' not in following else None
+            if merged is None:
+                break
+            entries.append(heapq.heappop(queue)[-1])
+            payload = merged
+        return entries, payload
+
+    async def _release(self, entries):
+        """Return claimed entries that were not sent to the dispatcher."""
+        try:
+            await db.execute_many(
+                "UPDATE outbox SET status = 'pending' WHERE id = ? AND status = 'sending'",
+                [(entry['id'],) for entry in entries]
+            )
+        except Exception as e:
+            logger.error(f"Error releasing {len(entries)} outbox entries: {e}")
+
+    async def _serve_channel(self, bot, channel_id: int):
+        """Worker of one channel queue; exits when the queue is empty."""
+        queue = self._queues[channel_id]
+        bucket = self._buckets.setdefault(channel_id, TokenBucket(OUTBOX_CHANNEL_BURST, OUTBOX_CHANNEL_RATE))
+        entries = []
+        try:
+            while queue:
+                if await bucket.acquire():
+                    self._stats['throttled'] += 1
+                # Entries queued while waiting for the token can still outrank or merge
+                entries, payload = self._next_post(queue)
+                await self._process(bot, entries, payload)
+                entries = []
+        except asyncio.CancelledError:
+            # Остановка воркера: заявленные, но не отправленные записи сразу возвращаются в очередь
+            unsent = entries + [item[-1] for item in queue]
+            queue.clear()
+            await asyncio.shield(self._release(unsent))
+            raise
+        except Exception as e:
+            logger.error(f"Error in outbox worker of channel {channel_id}: {e}")
+            # Give the rest back to the dispatcher
+            unsent = [item[-1] for item in queue]
+            queue.clear()
+            await self._release(unsent)
+            self.wake()
+        finally:
+            self._workers.pop(channel_id, None)
+
+    async def _serve_dm(self, bot, entry):
+        try:
+            await self._process(bot, [entry])
+        except asyncio.CancelledError:
+            await asyncio.shield(self._release([entry]))
+            raise
+
+    def _dispatch(self, bot, entry):
+        if entry['kind'] == DM:
+            task = asyncio.create_task(self._serve_dm(bot, entry))
+            self._dm_tasks.add(task)
+            task.add_done_callback(self._dm_tasks.discard)
+            return
+
+        channel_id = entry['target_id']
+        queue = self._queues.setdefault(channel_id, [])
+        heapq.heappush(queue, (-(entry['priority'] or 0), entry['next_attempt_at'], entry['id'], entry))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._serve_channel(bot, channel_id))
+
+    async def _claim(self):
+        """Mark due entries as being sent and return them, highest priority first."""
+        async with db.transaction() as tx:
+            entries = await tx.fetchall(
+                """
+                SELECT * FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY priority DESC, next_attempt_at, id
+                LIMIT ?
+                """,
+                (_format_time(datetime.datetime.now()), OUTBOX_BATCH_SIZE)
+            )
+            await tx.execute_many(
+                "UPDATE outbox SET status = 'sending' WHERE id = ?",
+                [(entry['id'],) for entry in entries]
+            )
+        return entries
+
+    async def _next_delay(self) -> float:
+        row = await db.fetchone("SELECT MIN(next_attempt_at) as next_attempt_at FROM outbox WHERE status = 'pending'")
+        next_attempt = _parse_time(row['next_attempt_at']) if row else None
+        if next_attempt is None:
+            return MAX_SLEEP
+        return min(MAX_SLEEP, max(0.0, (next_attempt - datetime.datetime.now()).total_seconds()))
+
+    async def purge(self) -> int:
+        """Delete entries delivered more than OUTBOX_RETENTION_DAYS ago; returns the number removed."""
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=OUTBOX_RETENTION_DAYS)
+        result = await db.execute(
+            "DELETE FROM outbox WHERE status = 'delivered' AND delivered_at < ?",
+            (_format_time(cutoff),)
+        )
+        self._last_purge = time.monotonic()
+        if result.rowcount:
+            self._stats['purged'] += result.rowcount
+            logger.info(f"Purged {result.rowcount} delivered outbox entries")
+        return result.rowcount
+
+    async def run(self, bot):
+        """Hand due entries to the channel workers, then sleep until the next retry or a wake-up."""
+        await bot.wait_until_ready()
+        # Entries claimed by a previous run were not confirmed as delivered
+        await db.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        logger.info("Outbox dispatcher started")
+        while True:
+            try:
+                self._wakeup.clear()
+                if time.monotonic() - self._last_purge >= OUTBOX_PURGE_INTERVAL:
+                    await self.purge()
+                entries = await self._claim()
+                for entry in entries:
+                    self._dispatch(bot, entry)
+                if len(entries) == OUTBOX_BATCH_SIZE:
+                    continue
+                delay = await self._next_delay()
+            except Exception as e:
+                logger.error(f"Error in outbox dispatcher: {e}")
+                delay = OUTBOX_RETRY_BASE
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def queue_depth(self) -> dict:
+        """Return pending entries in the database and queued posts per channel."""
+        row = await db.fetchone("SELECT COUNT(*) as pending FROM outbox WHERE status = 'pending'")
+        return {
+            'pending': row['pending'],
+            'channels': {channel_id: len(queue) for channel_id, queue in self._queues.items() if queue},
+        }
+
+    def stats(self) -> dict:
+        """Return delivery, coalescing and latency counters since startup."""
+        stats = dict(self._stats)
+        stats['queued'] = sum(len(queue) for queue in self._queues.values())
+        stats['latency_avg'] = self._latency['total'] / self._latency['count'] if self._latency['count'] else 0.0
+        stats['latency_max'] = self._latency['max']
+        return stats
+
+
+# Shared outbox used by all cogs
+outbox = Outbox()
@@ -0,0 +1,174 @@
+import re
+import logging
+import functools
+
+from utils.db import ConnectionPool, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_LEAK_THRESHOLD
+
+try:
+    import psycopg2
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+    from psycopg2.extras import RealDictCursor
+except ImportError:  # Only needed with DB_BACKEND=postgres
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+# String literals are copied as is, placeholders are only rewritten outside them
+STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+# Whole-statement rewrites from the SQLite dialect used by the cogs
+REWRITES = [
+    (re.compile(r"datetime\('now'\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\browid\b", re.IGNORECASE), "ctid"),
+]
+
+# Column type rewrites, applied to CREATE/ALTER TABLE only.
+# Discord ids do not fit into a 32-bit INTEGER, so integers become BIGINT.
+DDL_REWRITES = [
+    (re.compile(r"\bINTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT\b", re.IGNORECASE), "BIGSERIAL PRIMARY KEY"),
+    (re.compile(r"\bINTEGER\b", re.IGNORECASE), "BIGINT"),
+    (re.compile(r"\bDATETIME\b", re.IGNORECASE), "TIMESTAMP"),
+]
+
+INSERT_OR_IGNORE = re.compile(r"^(\s*)INSERT\s+OR\s+IGNORE\s+INTO\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate_sql(sql: str, returning: bool = False):
+    """
+    Translate a statement written for SQLite into PostgreSQL.
+
+    Rewrites `?` placeholders to `%s`, escapes literal `%` for psycopg2,
+    maps SQLite-only functions and column types and turns INSERT OR IGNORE
+    into ON CONFLICT DO NOTHING. With `returning`, INSERT statements get
+    RETURNING * so the new row id can be reported as lastrowid.
+    Returns None for statements that have no PostgreSQL equivalent (BEGIN,
+    transactions are started implicitly by psycopg2).
+    """
+    statement = sql.strip().rstrip(';')
+    keyword = statement.split(None, 1)[0].upper() if statement else ''
+    if keyword == 'BEGIN':
+        return None
+
+    for pattern, replacement in REWRITES:
+        statement = pattern.sub(replacement, statement)
+    if keyword in ('CREATE', 'ALTER'):
+        for pattern, replacement in DDL_REWRITES:
+            statement = pattern.sub(replacement, statement)
+
+    ignore = INSERT_OR_IGNORE.match(statement)
+    if ignore:
+        statement = INSERT_OR_IGNORE.sub(r"\1INSERT INTO", statement)
+
+    parts = STRING_LITERAL.split(statement.replace('%', '%%'))
+    # Odd parts are string literals
+    statement = ''.join(part if i % 2 else part.replace('?', '%s') for i, part in enumerate(parts))
+
+    if ignore:
+        statement += " ON CONFLICT DO NOTHING"
+    if returning and keyword == 'INSERT' and 'RETURNING' not in statement.upper():
+        statement += " RETURNING *"
+    return statement
+
+
+class PostgresCursor:
+    """sqlite3-style cursor over a psycopg2 cursor that translates statements."""
+
+    dialect = 'postgres'
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.lastrowid = None
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, params=()):
+        statement = translate_sql(sql, returning=True)
+        if statement is None:
+            return self
+        self._cursor.execute(statement, tuple(params))
+        self.lastrowid = None
+        if statement.endswith(" RETURNING *"):
+            row = self._cursor.fetchone()
+            self.lastrowid = row.get('id') if row else None
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        statement = translate_sql(sql)
+        if statement is not None:
+            self._cursor.executemany(statement, [tuple(params) for params in seq_of_params])
+        self.lastrowid = None
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+    """
+    sqlite3-style connection over psycopg2.
+
+    Provides the subset of the sqlite3.Connection API used by utils.db and
+    the migrations, so pooled connections look the same to callers
+    regardless of the backend. Rows are RealDictRow, which supports the
+    same dict-style access as utils.db.Row.
+    """
+
+    dialect = 'postgres'
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self) -> PostgresCursor:
+        return PostgresCursor(self._conn.cursor(cursor_factory=RealDictCursor))
+
+    def execute(self, sql: str, params=()) -> PostgresCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params) -> PostgresCursor:
+        return self.cursor().executemany(sql, seq_of_params)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._conn.info.transaction_status != TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class PostgresPool(ConnectionPool):
+    """
+    Bounded pool of PostgreSQL connections.
+
+    Reuses the checkout, wait, leak tracking and stats logic of the SQLite
+    pool; only connecting differs. Several bot processes can share one
+    database through it.
+    """
+
+    dialect = 'postgres'
+
+    def __init__(self, dsn: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 leak_threshold: float = DB_LEAK_THRESHOLD):
+        if psycopg2 is None:
+            raise RuntimeError("DB_BACKEND=postgres requires psycopg2 (pip install psycopg2-binary)")
+        if not dsn:
+            raise RuntimeError("DB_BACKEND=postgres requires DATABASE_URL")
+        super().__init__(dsn, size=size, timeout=timeout, leak_threshold=leak_threshold, pragmas={})
+        self.errors = (psycopg2.Error,)
+
+    def _connect(self) -> PostgresConnection:
+        return PostgresConnection(psycopg2.connect(self.path))
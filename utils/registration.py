@@ -0,0 +1,61 @@
+import datetime
+import logging
+
+from utils.db import db
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of add_participant
+JOINED = 'joined'
+ALREADY_JOINED = 'already_joined'
+NOT_FOUND = 'not_found'
+FULL = 'full'
+
+
+async def add_participant(tournament_id: int, user_id: int, username: str, database=None, on_join=None) -> str:
+    """
+    Register a player for a tournament if a slot is free and return the outcome.
+
+    The capacity check and the insert are separate statements, so callers
+    hold utils.locks.tournament_locks for the tournament; without it
+    concurrent joins overfill it (benchmarks/join_stress.py). `on_join(tx)`
+    is awaited inside the inserting transaction, e.g. to queue the
+    announcement refresh with the new count.
+    """
+    database = database or db
+
+    # Check if user is already registered
+    result = await database.fetchone(
+        "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ? AND user_id = ?",
+        (tournament_id, user_id)
+    )
+    if result['count'] > 0:
+        return ALREADY_JOINED
+
+    tournament = await database.fetchone(
+        "SELECT max_participants FROM tournaments WHERE id = ?",
+        (tournament_id,)
+    )
+    if not tournament or tournament['max_participants'] is None:
+        return NOT_FOUND
+
+    participants = await database.fetchone(
+        "SELECT COUNT(*) as count FROM tournament_participants WHERE tournament_id = ?",
+        (tournament_id,)
+    )
+    if participants['count'] >= tournament['max_participants']:
+        return FULL
+
+    async with database.transaction() as tx:
+        # First ensure player exists in players table
+        await tx.execute(
+            "INSERT OR IGNORE INTO players (user_id, username) VALUES (?, ?)",
+            (user_id, username)
+        )
+        await tx.execute(
+            "INSERT INTO tournament_participants (tournament_id, user_id, join_date) VALUES (?, ?, ?)",
+            (tournament_id, user_id, datetime.datetime.now())
+        )
+        if on_join is not None:
+            await on_join(tx)
+    return JOINED
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+import discord
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '2048'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '3600'))  # seconds
+USER_NEGATIVE_TTL = float(os.getenv('USER_NEGATIVE_TTL', '21600'))  # "not found" / "DMs closed"
+
+# Cached result of a lookup of a deleted account
+NOT_FOUND = object()
+
+
+class UserNotFound(Exception):
+    """The user does not exist (cached NotFound from an earlier lookup)."""
+
+
+class DMsClosed(Exception):
+    """The user does not accept DMs from the bot (cached Forbidden)."""
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after `ttl` seconds."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+    def discard(self, key):
+        self._data.pop(key, None)
+
+
+class UserResolver:
+    """
+    Shared user lookup: gateway cache, then a TTL LRU, then REST.
+
+    Users that are not in the gateway cache (no shared guild) are kept in
+    the LRU after a fetch_user, so repeated notifications do not hit REST.
+    Deleted accounts and users with closed DMs are cached as negative
+    results for USER_NEGATIVE_TTL and raise UserNotFound / DMsClosed
+    without a request.
+    """
+
+    def __init__(self, size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 negative_ttl: float = USER_NEGATIVE_TTL):
+        self._users = TTLCache(size, ttl)
+        self._dm_closed = TTLCache(size, negative_ttl)
+        self.negative_ttl = negative_ttl
+        self._stats = {
+            'gateway_hits': 0,
+            'cache_hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'rest_calls': 0,
+        }
+
+    async def resolve_user(self, bot, user_id: int):
+        """Return the user, raising UserNotFound for deleted accounts."""
+        user = bot.get_user(user_id)
+        if user is not None:
+            self._stats['gateway_hits'] += 1
+            return user
+
+        cached = self._users.get(user_id)
+        if cached is NOT_FOUND:
+            self._stats['negative_hits'] += 1
+            raise UserNotFound(user_id)
+        if cached is not None:
+            self._stats['cache_hits'] += 1
+            return cached
+
+        self._stats['misses'] += 1
+        self._stats['rest_calls'] += 1
+        try:
+            user = await bot.fetch_user(user_id)
+        except discord.NotFound:
+            self._users.set(user_id, NOT_FOUND, ttl=self.negative_ttl)
+            raise UserNotFound(user_id)
+        self._users.set(user_id, user)
+        return user
+
+    async def resolve_dm_target(self, bot, user_id: int):
+        """Return a user that can be messaged, raising DMsClosed or UserNotFound."""
+        if self._dm_closed.get(user_id):
+            self._stats['negative_hits'] += 1
+            raise DMsClosed(user_id)
+        return await self.resolve_user(bot, user_id)
+
+    def mark_dm_closed(self, user_id: int):
+        """Remember that a DM to the user was rejected with 403."""
+        self._dm_closed.set(user_id, True)
+
+    def stats(self) -> dict:
+        """Return lookup counters since startup and the cache sizes."""
+        stats = dict(self._stats)
+        stats['hits'] = stats['gateway_hits'] + stats['cache_hits']
+        stats['cached_users'] = len(self._users)
+        stats['dm_closed'] = len(self._dm_closed)
+        return stats
+
+
+# Shared resolver used by the DM fan-out and the outbox
+resolver = UserResolver()
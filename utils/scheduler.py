@@ -0,0 +1,147 @@
+import heapq
+import asyncio
+import datetime
+import logging
+import itertools
+
+from utils.db import db
+
+logger = logging.getLogger(__name__)
+
+# Deadline kinds, relative to the tournament start time
+NOTIFY = 'notify'  # reminder to participants
+DEADLINE = 'deadline'  # cancel if there are not enough participants
+START = 'start'  # create the first round
+
+DEADLINE_OFFSETS = {
+    NOTIFY: datetime.timedelta(minutes=15),
+    DEADLINE: datetime.timedelta(hours=1),
+    START: datetime.timedelta(0),
+}
+
+# Upper bound for a single sleep, so clock changes are picked up
+MAX_SLEEP = 300
+
+def parse_tournament_date(value):
+    """Return tournament_date as a datetime (SQLite stores it as text)."""
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        logger.error(f"Invalid tournament_date: {value!r}")
+        return None
+
+
+class TournamentScheduler:
+    """
+    Min-heap of upcoming tournament deadlines.
+
+    Replaces minute polling: the runner sleeps until the earliest deadline
+    and only then touches the database. Entries are never removed from the
+    heap; instead every tournament has a generation number and entries from
+    an older generation are skipped when popped. Call `refresh()` whenever a
+    tournament is created, approved, rescheduled or cancelled.
+    """
+
+    def __init__(self):
+        self._heap = []  # (when, seq, kind, tournament_id, generation)
+        self._generations = {}  # tournament_id -> current generation
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return sum(1 for entry in self._heap if self._generations.get(entry[3]) == entry[4])
+
+    def _schedule(self, tournament: dict):
+        tournament_id = tournament['id']
+        generation = self._generations.get(tournament_id, 0) + 1
+        self._generations[tournament_id] = generation
+
+        start = parse_tournament_date(tournament['tournament_date'])
+        if start is None:
+            return
+
+        now = datetime.datetime.now()
+        for kind, offset in DEADLINE_OFFSETS.items():
+            # The reminder only makes sense before the start and is sent once
+            if kind == NOTIFY and (tournament.get('notification_sent') or start <= now):
+                continue
+            heapq.heappush(self._heap, (start - offset, next(self._counter), kind, tournament_id, generation))
+        self._wakeup.set()
+
+    def _unschedule(self, tournament_id: int):
+        if tournament_id in self._generations:
+            self._generations[tournament_id] += 1
+            self._wakeup.set()
+
+    async def load(self):
+        """Rebuild the heap from all approved tournaments that have not started yet."""
+        tournaments = await db.fetchall(
+            """
+            SELECT id, tournament_date, notification_sent
+            FROM tournaments
+            WHERE status = 'approved' AND started = 0
+            """
+        )
+        self._heap.clear()
+        self._generations.clear()
+        for tournament in tournaments:
+            self._schedule(tournament)
+        logger.info(f"Scheduled deadlines for {len(tournaments)} tournaments")
+
+    async def refresh(self, tournament_id: int):
+        """Re-read one tournament and replace its pending deadlines."""
+        tournament = await db.fetchone(
+            """
+            SELECT id, tournament_date, notification_sent
+            FROM tournaments
+            WHERE id = ? AND status = 'approved' AND started = 0
+            """,
+            (tournament_id,)
+        )
+        if tournament:
+            self._schedule(tournament)
+        else:
+            self._unschedule(tournament_id)
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, kind, tournament_id, generation = heapq.heappop(self._heap)
+            if self._generations.get(tournament_id) == generation:
+                due.append((kind, tournament_id))
+        return due
+
+    def _next_delay(self, now) -> float:
+        # Drop stale entries so they do not cause needless wakeups
+        while self._heap and self._generations.get(self._heap[0][3]) != self._heap[0][4]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return MAX_SLEEP
+        return min(MAX_SLEEP, max(0.0, (self._heap[0][0] - now).total_seconds()))
+
+    async def run(self, handler):
+        """
+        Call `await handler(kind, tournament_id)` for every deadline as it comes due.
+
+        Runs until cancelled. Errors in the handler are logged and do not stop
+        the scheduler.
+        """
+        while True:
+            for kind, tournament_id in self._pop_due(datetime.datetime.now()):
+                try:
+                    await handler(kind, tournament_id)
+                except Exception as e:
+                    logger.error(f"Error handling {kind} deadline of tournament {tournament_id}: {e}")
+
+            self._wakeup.clear()
+            delay = self._next_delay(datetime.datetime.now())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Shared scheduler; the Tournaments cog runs it, other cogs call refresh()
+scheduler = TournamentScheduler()
@@ -0,0 +1,100 @@
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seeding methods, stored in tournaments.seeding
+RANDOM = 'random'
+REGISTRATION = 'registration'  # in order of registration
+RECORD = 'record'  # most wins first (team captains for team tournaments)
+MANUAL = 'manual'  # seeds set by a moderator, the rest in registration order
+
+SEEDING_METHODS = {
+    RANDOM: "Случайный",
+    REGISTRATION: "По порядку регистрации",
+    RECORD: "По количеству побед",
+    MANUAL: "Ручной",
+}
+
+# Largest field a bracket is generated for
+MAX_ENTRANTS = 4096
+
+
+def order_entrants(rows, method: str = RANDOM, rng=random) -> list:
+    """
+    Return entrant ids in seed order, seed 1 first.
+
+    `rows` come in registration order and carry `id`, `seed`, `wins` and
+    `losses`. Sorts are stable, so ties keep the registration order.
+    """
+    # Повторная регистрация не дает второго места в сетке
+    rows = list({row['id']: row for row in rows}.values())
+
+    if method == RANDOM:
+        rng.shuffle(rows)
+    elif method == RECORD:
+        rows = sorted(rows, key=lambda row: (-(row['wins'] or 0), row['losses'] or 0))
+    elif method == MANUAL:
+        rows = sorted(rows, key=lambda row: (row['seed'] is None, row['seed'] or 0))
+    elif method != REGISTRATION:
+        raise ValueError(f"Unknown seeding method {method}")
+    return [row['id'] for row in rows]
+
+
+async def load_entrants(tx, tournament_id: int, is_team: bool = False) -> list:
+    """Fetch the entrants of a tournament with their seeds and records in one query."""
+    if is_team:
+        return await tx.fetchall(
+            """
+            SELECT t.id, t.seed, p.wins, p.losses
+            FROM tournament_teams t
+            LEFT JOIN players p ON p.user_id = t.captain_id
+            WHERE t.tournament_id = ?
+            ORDER BY t.id
+            """,
+            (tournament_id,)
+        )
+    return await tx.fetchall(
+        """
+        SELECT tp.user_id as id, tp.seed, p.wins, p.losses
+        FROM tournament_participants tp
+        LEFT JOIN players p ON p.user_id = tp.user_id
+        WHERE tp.tournament_id = ?
+        ORDER BY tp.id
+        """,
+        (tournament_id,)
+    )
+
+
+async def seed_entrants(tx, tournament, rng=random) -> list:
+    """Return the entrants of a tournament in seed order using its seeding method."""
+    rows = await load_entrants(tx, tournament.id, tournament.is_team)
+    entrants = order_entrants(rows, tournament.seeding, rng)
+    if len(entrants) > MAX_ENTRANTS:
+        raise ValueError(f"Tournament {tournament.id} has {len(entrants)} entrants, at most {MAX_ENTRANTS} are supported")
+    logger.info(f"Seeded {len(entrants)} entrants of tournament {tournament.id} ({tournament.seeding})")
+    return entrants
+
+
+async def set_manual_seeds(tx, tournament_id: int, entrant_ids, is_team: bool = False) -> int:
+    """
+    Switch a tournament to manual seeding with the given order, seed 1 first.
+
+    Entrants left out keep no seed and follow the seeded ones. Returns the
+    number of seeded entrants.
+    """
+    seeds = [(seed, tournament_id, entrant_id) for seed, entrant_id in enumerate(entrant_ids, 1)]
+    if is_team:
+        await tx.execute("UPDATE tournament_teams SET seed = NULL WHERE tournament_id = ?", (tournament_id,))
+        result = await tx.execute_many(
+            "UPDATE tournament_teams SET seed = ? WHERE tournament_id = ? AND id = ?",
+            seeds
+        )
+    else:
+        await tx.execute("UPDATE tournament_participants SET seed = NULL WHERE tournament_id = ?", (tournament_id,))
+        result = await tx.execute_many(
+            "UPDATE tournament_participants SET seed = ? WHERE tournament_id = ? AND user_id = ?",
+            seeds
+        )
+    await tx.execute("UPDATE tournaments SET seeding = ? WHERE id = ?", (MANUAL, tournament_id))
+    return result.rowcount
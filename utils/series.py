@@ -0,0 +1,94 @@
+import logging
+from dataclasses import dataclass, field
+
+from utils.db import db
+from utils.models import WINS_NEEDED, normalize_match_type
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesError(ValueError):
+    """A submitted score that does not fit the series (shown to the moderator)."""
+
+
+@dataclass(slots=True)
+class SeriesState:
+    """A row of match_series: running win counters of one best-of match."""
+    match_id: int
+    tournament_id: int
+    match_type: str
+    wins1: int = 0
+    wins2: int = 0
+    games: int = 0  # result submissions recorded
+    # Derived once in __post_init__
+    wins_needed: int = field(init=False)
+
+    def __post_init__(self):
+        self.match_type = normalize_match_type(self.match_type)
+        self.wins_needed = WINS_NEEDED[self.match_type]
+
+    @classmethod
+    def from_row(cls, row) -> 'SeriesState':
+        return cls(row['match_id'], row['tournament_id'], row['match_type'], row['wins1'], row['wins2'], row['games'])
+
+    @property
+    def winner_side(self) -> int:
+        """1 or 2 once a side has clinched the series, otherwise 0."""
+        if self.wins1 >= self.wins_needed:
+            return 1
+        if self.wins2 >= self.wins_needed:
+            return 2
+        return 0
+
+    @property
+    def clinched(self) -> bool:
+        return self.winner_side != 0
+
+    @property
+    def score(self) -> str:
+        return f"{self.wins1}:{self.wins2}"
+
+
+async def record_games(tx, match_id: int, tournament_id: int, match_type: str, wins1: int, wins2: int) -> SeriesState:
+    """
+    Add the games won by each side to the series of a match.
+
+    The counters are created on the first submission and incremented in
+    place afterwards, so deciding the series needs no recount of earlier
+    games. The series is over as soon as a side has the wins it needs; the
+    games that would follow are never played. Raises SeriesError, leaving
+    the transaction to roll back, if the counters would go past a clinch.
+    """
+    if wins1 + wins2 == 0:
+        raise SeriesError("Укажите хотя бы одну выигранную игру.")
+
+    await tx.execute(
+        """
+        INSERT INTO match_series (match_id, tournament_id, match_type, wins1, wins2, games)
+        VALUES (?, ?, ?, ?, ?, 1)
+        ON CONFLICT (match_id) DO UPDATE SET
+            wins1 = match_series.wins1 + excluded.wins1,
+            wins2 = match_series.wins2 + excluded.wins2,
+            games = match_series.games + 1
+        """,
+        (match_id, tournament_id, normalize_match_type(match_type), wins1, wins2)
+    )
+    series = await get_series(match_id, tx=tx)
+
+    if max(series.wins1, series.wins2) > series.wins_needed or min(series.wins1, series.wins2) >= series.wins_needed:
+        raise SeriesError(
+            f"Счет серии {series.score} невозможен в формате {series.match_type}: "
+            f"серия идет до {series.wins_needed} побед."
+        )
+    return series
+
+
+async def get_series(match_id: int, tx=None):
+    """Return the SeriesState of a match, or None before its first result."""
+    row = await (tx or db).fetchone("SELECT * FROM match_series WHERE match_id = ?", (match_id,))
+    return SeriesState.from_row(row) if row else None
+
+
+async def reset_series(tx, match_id: int):
+    """Forget the games of a match whose result is undone."""
+    await tx.execute("DELETE FROM match_series WHERE match_id = ?", (match_id,))